@@ -1,3 +1,4 @@
+import argparse
 import json
 import pandas as pd
 import numpy as np
@@ -8,34 +9,41 @@ import os
 from collections import defaultdict
 import matplotlib.pyplot as plt
 import seaborn as sns
+from columnar import EVENT_FIELDS, USER_FIELDS, CONTENT_FIELDS, read_columnar_file
+from stream_io import find_data_file
 
 class NetflixAdvancedAnalytics:
-    def __init__(self):
+    def __init__(self, start_date=None, end_date=None):
+        # Optional 'YYYY-MM-DD' bounds (inclusive) on the viewing events analysed
+        self.start_date = start_date
+        self.end_date = end_date
         self.raw_data = {}
         self.processed_data = {}
         self.insights = {}
         
     def load_data(self):
-        """Load raw data from JSON files"""
+        """Load raw data from Parquet, NDJSON or JSON files into compact columnar tables"""
         data_files = {
-            'contents': 'data/raw/contents.json',
-            'users': 'data/raw/users.json',
-            'events': 'data/raw/viewing_events.json'
+            'contents': (find_data_file('contents'), CONTENT_FIELDS),
+            'users': (find_data_file('users'), USER_FIELDS),
+            'events': (find_data_file('viewing_events'), EVENT_FIELDS)
         }
         
-        for key, filepath in data_files.items():
-            with open(filepath, 'r') as f:
-                self.raw_data[key] = json.load(f)
+        for key, (filepath, fields) in data_files.items():
+            dates = (self.start_date, self.end_date) if key == 'events' else (None, None)
+            self.raw_data[key] = read_columnar_file(filepath, fields, *dates)
+            print(f"Read {filepath}")
         
-        # Convert to pandas DataFrames
-        self.df_contents = pd.json_normalize(self.raw_data['contents'])
-        self.df_users = pd.json_normalize(self.raw_data['users'])
-        self.df_events = pd.json_normalize(self.raw_data['events'])
+        # Convert to pandas DataFrames (dictionary-encoded fields become categoricals)
+        self.df_contents = self.raw_data['contents'].to_dataframe()
+        self.df_users = self.raw_data['users'].to_dataframe()
+        self.df_events = self.raw_data['events'].to_dataframe()
         
         print("Data loaded successfully")
         print(f"Contents shape: {self.df_contents.shape}")
         print(f"Users shape: {self.df_users.shape}")
         print(f"Events shape: {self.df_events.shape}")
+        print(f"Events in memory: {self.raw_data['events'].nbytes / max(len(self.raw_data['events']), 1):.0f} bytes/event")
 
     def analyze_content_performance(self):
         """Analyze content performance metrics"""
@@ -232,5 +240,9 @@ class NetflixAdvancedAnalytics:
         print("- data/processed/visualizations/quality_metrics.png")
 
 if __name__ == "__main__":
-    analyzer = NetflixAdvancedAnalytics()
+    parser = argparse.ArgumentParser(description="Run the advanced Netflix analytics")
+    parser.add_argument('--start-date', help="First day (YYYY-MM-DD) of viewing events to analyse")
+    parser.add_argument('--end-date', help="Last day (YYYY-MM-DD) of viewing events to analyse")
+    args = parser.parse_args()
+    analyzer = NetflixAdvancedAnalytics(args.start_date, args.end_date)
     analyzer.run_analysis()
@@ -1,9 +1,56 @@
-from google.cloud import bigquery
+import argparse
+from query_backend import get_client
 from datetime import datetime
 
-def run_analysis():
-    client = bigquery.Client()
-    
+# The joined analyses read off viewing_events_wide (see wide_events.py) instead;
+# the IS NOT NULL filters keep the inner-join semantics of the originals
+WIDE_QUERIES = {
+    'top_content': """
+        SELECT 
+            content_title as title,
+            content_genre as genre,
+            COUNT(DISTINCT user_id) as unique_viewers,
+            SUM(watch_duration_seconds)/3600 as total_watch_hours,
+            AVG(watch_duration_seconds)/60 as avg_watch_minutes
+        FROM `netflix_analytics.viewing_events_wide`
+        WHERE content_title IS NOT NULL
+        GROUP BY content_title, content_genre
+        ORDER BY unique_viewers DESC
+        LIMIT 10
+    """,
+
+    'quality_metrics': """
+        SELECT 
+            content_title as title,
+            AVG(quality_metrics.buffering_events) as avg_buffering_events,
+            AVG(quality_metrics.average_bitrate) as avg_bitrate,
+            COUNT(CASE WHEN quality_metrics.playback_quality = '4K' THEN 1 END) as total_4k_plays,
+            COUNT(*) as total_plays
+        FROM `netflix_analytics.viewing_events_wide`
+        WHERE content_title IS NOT NULL
+        GROUP BY content_title
+        HAVING total_plays > 5
+        ORDER BY avg_buffering_events ASC
+        LIMIT 10
+    """,
+
+    'user_engagement': """
+        SELECT 
+            user_subscription_type as subscription_type,
+            user_age_group as age_group,
+            COUNT(DISTINCT user_id) as user_count,
+            COUNT(*) as total_sessions,
+            AVG(watch_duration_seconds)/60 as avg_session_minutes,
+            COUNT(*)/COUNT(DISTINCT user_id) as sessions_per_user
+        FROM `netflix_analytics.viewing_events_wide`
+        WHERE user_subscription_type IS NOT NULL
+        GROUP BY user_subscription_type, user_age_group
+        ORDER BY user_count DESC
+    """
+}
+
+def analysis_queries(wide=False):
+    """The analyses' queries by name; wide reads the joined ones off viewing_events_wide"""
     # Dictionary to store our queries
     queries = {
         'top_content': """
@@ -60,6 +107,13 @@ def run_analysis():
             ORDER BY user_count DESC
         """
     }
+    if wide:
+        queries.update(WIDE_QUERIES)
+    return queries
+
+def run_analysis(wide=False):
+    client = get_client()
+    queries = analysis_queries(wide)
     
     # Run each query and print results
     for analysis_name, query in queries.items():
@@ -83,5 +137,10 @@ def run_analysis():
             print(f"Error running {analysis_name} analysis: {e}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Netflix content performance analyses")
+    parser.add_argument('--wide', action='store_true',
+                        help="Read the joined analyses off viewing_events_wide instead of joining")
+    args = parser.parse_args()
+
     print("Running Netflix content performance analysis...")
-    run_analysis()
+    run_analysis(wide=args.wide)
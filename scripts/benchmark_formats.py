@@ -0,0 +1,103 @@
+"""Benchmark raw data formats: file size, write time, analytics read time and load preparation.
+
+For each format the sample data is generated with generate_data.py, then
+viewing_events is read into a ColumnarTable the way
+NetflixAdvancedAnalytics.load_data does, and split into the load chunks
+load_data_to_bigquery uploads. Every step runs in a fresh child process so
+peak RSS is per step.
+
+    python scripts/benchmark_formats.py --events 1000000 --formats json,ndjson,ndjson.gz,ndjson.zst,parquet
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from stream_io import COMPRESSIONS, find_data_file
+
+SCRIPT_PATH = os.path.abspath(__file__)
+GENERATE_PATH = os.path.join(os.path.dirname(SCRIPT_PATH), 'generate_data.py')
+
+def read_step(path):
+    """Read viewing_events into a ColumnarTable, as the analytics do"""
+    from columnar import EVENT_FIELDS, read_columnar_file
+    table = read_columnar_file(path, EVENT_FIELDS)
+    return {'records': len(table)}
+
+def load_step(path):
+    """Produce every load chunk load_data_to_bigquery would upload"""
+    from setup_bigquery import open_load_chunks
+    payload_bytes = chunks = 0
+    f, load_chunks = open_load_chunks(path, 100000)
+    with f:
+        for chunk in load_chunks:
+            payload_bytes += len(chunk)
+            chunks += 1
+    return {'payload_bytes': payload_bytes, 'chunks': chunks}
+
+STEPS = {'read': read_step, 'load': load_step}
+
+def run_child(command):
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)} failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def run_benchmark(num_events, formats, seed=42):
+    rows = []
+    suffix_compressions = {suffix: compression for compression, suffix in COMPRESSIONS.items()}
+    for fmt in formats:
+        base_format, dot, suffix = fmt.partition('.')
+        command = [sys.executable, GENERATE_PATH, '--format', base_format, '--events', str(num_events),
+                   '--seed', str(seed), '--stats-json']
+        if dot:
+            command += ['--compression', suffix_compressions['.' + suffix]]
+        with tempfile.TemporaryDirectory() as output_dir:
+            written = run_child(command + ['--output-dir', output_dir])
+            path = find_data_file('viewing_events', output_dir)
+            row = {'format': fmt, 'events': num_events, 'file_bytes': os.path.getsize(path),
+                   'write_seconds': written['seconds']}
+            for step in STEPS:
+                stats = run_child([sys.executable, SCRIPT_PATH, '--step', step, '--input', path])
+                row[f'{step}_seconds'] = stats['seconds']
+                row[f'{step}_peak_rss_mb'] = stats['peak_rss_mb']
+                row.update({k: v for k, v in stats.items() if k in ('payload_bytes', 'chunks')})
+            rows.append(row)
+
+    print(f"\n{'format':<10} {'events':>10} {'file MB':>9} {'write s':>8} {'read s':>7} {'read RSS MB':>12} "
+          f"{'load prep s':>12} {'upload MB':>10}")
+    for row in rows:
+        print(f"{row['format']:<10} {row['events']:>10,} {row['file_bytes'] / 1e6:>9,.1f} "
+              f"{row['write_seconds']:>8.1f} {row['read_seconds']:>7.1f} {row['read_peak_rss_mb']:>12,.0f} "
+              f"{row['load_seconds']:>12.1f} {row['payload_bytes'] / 1e6:>10,.1f}")
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare JSON, (compressed) NDJSON and Parquet raw data")
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--formats', default='json,ndjson,parquet')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--report', help="Write the rows to this JSON file")
+    parser.add_argument('--step', choices=sorted(STEPS), help=argparse.SUPPRESS)
+    parser.add_argument('--input', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.step:
+        start = time.perf_counter()
+        stats = STEPS[args.step](args.input)
+        stats['seconds'] = time.perf_counter() - start
+        stats['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(json.dumps(stats))
+        return stats
+
+    rows = run_benchmark(args.events, args.formats.split(','), args.seed)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(rows, f, indent=2)
+    return rows
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import random
+import time
+import numpy as np
+from process_streaming_data import generate_contents, generate_users
+from process_streaming_data import generate_realistic_sample_data, generate_columnar_sample_data
+from event_engine import encode_catalog, select_content
+from columnar import ColumnarTable, EVENT_FIELDS, USER_FIELDS, deep_sizeof
+
+def benchmark_content_selection(catalog_sizes=(200, 2000, 20000, 200000), num_users=10000,
+                                scan_events=2000, index_events=1000000, seed=42):
+    """Compare per-event catalog scans with the candidate index across catalog sizes"""
+    random.seed(seed)
+    users_data = generate_users(num_users)
+    results = []
+
+    for catalog_size in catalog_sizes:
+        contents_data = generate_contents(catalog_size)
+
+        # Original approach: rebuild the matching content list for every event
+        start = time.perf_counter()
+        for _ in range(scan_events):
+            user = random.choice(users_data)
+            matching_content = [c for c in contents_data
+                                if c["genre"] in user["preferred_genres"]
+                                or c["language"] in user["preferred_languages"]]
+            random.choice(matching_content if matching_content else contents_data)
+        scan_rate = scan_events / (time.perf_counter() - start)
+
+        # Indexed approach: build once, then sample candidates for whole batches
+        start = time.perf_counter()
+        catalog = encode_catalog(contents_data, users_data)
+        build_seconds = time.perf_counter() - start
+
+        rng = np.random.default_rng(seed)
+        user_idx = rng.integers(0, num_users, index_events)
+        start = time.perf_counter()
+        select_content(rng, catalog, user_idx)
+        index_rate = index_events / (time.perf_counter() - start)
+
+        results.append({
+            'catalog_size': catalog_size,
+            'scan_events_per_sec': scan_rate,
+            'index_build_seconds': build_seconds,
+            'index_events_per_sec': index_rate,
+            'speedup': index_rate / scan_rate
+        })
+
+    print(f"\n{'Catalog':>10} | {'Scan ev/s':>12} | {'Index build (s)':>15} | {'Index ev/s':>12} | {'Speedup':>9}")
+    print("-" * 71)
+    for r in results:
+        print(f"{r['catalog_size']:>10} | {r['scan_events_per_sec']:>12,.0f} | "
+              f"{r['index_build_seconds']:>15.3f} | {r['index_events_per_sec']:>12,.0f} | {r['speedup']:>8,.0f}x")
+
+    return results
+
+def benchmark_memory_footprint(seed=42):
+    """Report bytes per event and per user for nested dicts versus ColumnarTables"""
+    random.seed(seed)
+    contents_data, users_data, events_data = generate_realistic_sample_data()
+    _, users_table, events_table = generate_columnar_sample_data(
+        num_events=len(events_data), num_users=len(users_data), seed=seed)
+
+    rows = [
+        ('events (nested dicts)', deep_sizeof(events_data) / len(events_data)),
+        ('events (ColumnarTable from generator)', events_table.nbytes / len(events_table)),
+        ('events (ColumnarTable from dicts)',
+         ColumnarTable.from_records(events_data, EVENT_FIELDS).nbytes / len(events_data)),
+        ('users (nested dicts)', deep_sizeof(users_data) / len(users_data)),
+        ('users (ColumnarTable)',
+         ColumnarTable.from_records(users_data, USER_FIELDS).nbytes / len(users_data))
+    ]
+
+    print(f"\n{'Representation':<40} | {'Bytes/row':>10}")
+    print("-" * 53)
+    for name, per_row in rows:
+        print(f"{name:<40} | {per_row:>10,.0f}")
+
+    return dict(rows)
+
+if __name__ == "__main__":
+    print("Benchmarking content selection across catalog sizes...")
+    benchmark_content_selection()
+
+    print("\nMeasuring in-memory footprint...")
+    benchmark_memory_footprint()
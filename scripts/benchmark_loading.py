@@ -0,0 +1,143 @@
+"""Benchmark preparing viewing_events for a BigQuery load job.
+
+Compares the original path in load_data_to_bigquery (json.load the whole
+pretty-printed array, write a temporary .ndjson file, upload that file) with
+streaming the array straight into the load payload. Uploads are simulated by
+reading the payload in the client's 100 MB resumable chunks. Each run happens
+in a fresh child process so peak RSS is measured per run.
+
+    python scripts/benchmark_loading.py --events 1000000,10000000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from stream_io import ProgressReporter
+
+SCRIPT_PATH = os.path.abspath(__file__)
+UPLOAD_CHUNK_SIZE = 100 * 1024 * 1024  # google-cloud-bigquery's default resumable chunk size
+
+def write_pretty_json_array(path, batches, total=None):
+    """Write records exactly as json.dump(records, f, indent=2) would, one batch at a time"""
+    progress = ProgressReporter(os.path.basename(path), total=total)
+    with open(path, 'w') as f:
+        f.write('[')
+        first = True
+        for batch in batches:
+            pieces = []
+            for record in batch:
+                pieces.append('\n  ' if first else ',\n  ')
+                pieces.append(json.dumps(record, indent=2).replace('\n', '\n  '))
+                first = False
+            text = ''.join(pieces)
+            f.write(text)
+            progress.update(len(batch), len(text))
+        f.write('\n]' if not first else ']')
+    progress.finish()
+
+def prepare_input(path, num_events, seed=42):
+    """Generate num_events viewing events into a pretty-printed JSON array file"""
+    import random
+    from process_streaming_data import generate_contents, generate_users, iter_viewing_event_batches
+    py_rng = random.Random(seed)
+    contents_data = generate_contents(rng=py_rng)
+    users_data = generate_users(rng=py_rng)
+    batches = iter_viewing_event_batches(users_data, contents_data, num_events,
+                                         rng=np.random.default_rng(seed))
+    write_pretty_json_array(path, batches, total=num_events)
+
+def _drain(payload):
+    """Read a payload the way a resumable upload does and return its size"""
+    total = 0
+    while True:
+        chunk = payload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            return total
+        total += len(chunk)
+
+def run_old_path(path):
+    """json.load + temporary NDJSON file + upload, as load_data_to_bigquery used to do"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    newline_json_path = f"{path}.ndjson"
+    with open(newline_json_path, 'w') as f:
+        for item in data:
+            f.write(json.dumps(item) + '\n')
+    disk_bytes = os.path.getsize(newline_json_path)
+    with open(newline_json_path, 'rb') as f:
+        payload_bytes = _drain(f)
+    os.remove(newline_json_path)
+    return {'records': len(data), 'payload_bytes': payload_bytes, 'temp_file_bytes': disk_bytes}
+
+def run_new_path(path):
+    """Stream the array item by item into the load payload"""
+    from setup_bigquery import open_load_payload
+    f, payload = open_load_payload(path)
+    with f:
+        payload_bytes = _drain(payload)
+    return {'records': payload.records, 'payload_bytes': payload_bytes, 'temp_file_bytes': 0}
+
+RUNNERS = {'old': run_old_path, 'new': run_new_path}
+
+def run_child(name, path):
+    """Run one path in a fresh process; returns its stats or None if it failed (e.g. out of memory)"""
+    result = subprocess.run([sys.executable, SCRIPT_PATH, '--run', name, '--input', path],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"{name} path failed (exit code {result.returncode}): {result.stderr.strip()[-500:]}")
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def run_benchmark(event_counts, paths=('old', 'new'), work_dir=None, seed=42):
+    rows = []
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        for num_events in event_counts:
+            path = os.path.join(tmp, 'viewing_events.json')
+            prepare_input(path, num_events, seed)
+            input_bytes = os.path.getsize(path)
+            for name in paths:
+                stats = run_child(name, path)
+                if stats is None:
+                    rows.append({'path': name, 'events': num_events, 'failed': True})
+                    continue
+                stats.update({'path': name, 'events': num_events, 'input_bytes': input_bytes})
+                rows.append(stats)
+            os.remove(path)
+
+    print(f"\n{'path':<5} {'events':>12} {'seconds':>9} {'events/sec':>12} {'peak RSS MB':>12} "
+          f"{'temp file MB':>13} {'payload MB':>11}")
+    for row in rows:
+        if row.get('failed'):
+            print(f"{row['path']:<5} {row['events']:>12,} {'failed':>9}")
+            continue
+        print(f"{row['path']:<5} {row['events']:>12,} {row['seconds']:>9.1f} "
+              f"{row['events'] / row['seconds']:>12,.0f} {row['peak_rss_mb']:>12,.0f} "
+              f"{row['temp_file_bytes'] / 1e6:>13,.1f} {row['payload_bytes'] / 1e6:>11,.1f}")
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark JSON-to-NDJSON load preparation")
+    parser.add_argument('--events', default='1000000,10000000', help="Comma-separated event counts")
+    parser.add_argument('--paths', default='old,new')
+    parser.add_argument('--work-dir', help="Directory for the generated input files")
+    parser.add_argument('--run', choices=sorted(RUNNERS), help=argparse.SUPPRESS)
+    parser.add_argument('--input', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run:
+        start = time.perf_counter()
+        stats = RUNNERS[args.run](args.input)
+        stats['seconds'] = time.perf_counter() - start
+        stats['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(json.dumps(stats))
+        return stats
+
+    return run_benchmark([int(n) for n in args.events.split(',')], args.paths.split(','), args.work_dir)
+
+if __name__ == "__main__":
+    main()
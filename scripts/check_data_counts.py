@@ -1,29 +1,18 @@
-from google.cloud import bigquery
+from query_backend import get_client
 
-def check_data_distribution():
-    client = bigquery.Client()
-    dataset_id = f"{client.project}.netflix_analytics"
-    
-    print("\nData Distribution Analysis:")
-    print("=" * 50)
-    
-    # Basic counts
-    counts_query = f"""
+def distribution_queries(dataset_id):
+    """The distribution checks' queries by name"""
+    return {
+        # Basic counts
+        'counts': f"""
     SELECT 
         (SELECT COUNT(*) FROM `{dataset_id}.contents`) as content_count,
         (SELECT COUNT(*) FROM `{dataset_id}.users`) as user_count,
         (SELECT COUNT(*) FROM `{dataset_id}.viewing_events`) as event_count
-    """
-    
-    results = client.query(counts_query).result()
-    for row in results:
-        print(f"\nTotal Counts:")
-        print(f"Contents: {row.content_count}")
-        print(f"Users: {row.user_count}")
-        print(f"Viewing Events: {row.event_count}")
-    
-    # Content distribution
-    content_query = f"""
+    """,
+
+        # Content distribution
+        'content': f"""
     SELECT 
         genre,
         COUNT(*) as count,
@@ -32,16 +21,10 @@ def check_data_distribution():
     GROUP BY genre
     ORDER BY count DESC
     LIMIT 10
-    """
-    
-    print("\nContent Distribution by Genre:")
-    print("-" * 40)
-    results = client.query(content_query).result()
-    for row in results:
-        print(f"{row.genre}: {row.count} titles (avg duration: {row.avg_duration:.1f} min)")
-    
-    # User distribution
-    user_query = f"""
+    """,
+
+        # User distribution
+        'users': f"""
     SELECT 
         subscription_type,
         COUNT(*) as count,
@@ -49,16 +32,10 @@ def check_data_distribution():
     FROM `{dataset_id}.users`
     GROUP BY subscription_type
     ORDER BY count DESC
-    """
-    
-    print("\nUser Distribution by Subscription:")
-    print("-" * 40)
-    results = client.query(user_query).result()
-    for row in results:
-        print(f"{row.subscription_type}: {row.count} users across {row.countries} countries")
-    
-    # Viewing patterns
-    viewing_query = f"""
+    """,
+
+        # Viewing patterns
+        'viewing': f"""
     SELECT 
         device_type,
         COUNT(*) as event_count,
@@ -68,10 +45,38 @@ def check_data_distribution():
     GROUP BY device_type
     ORDER BY event_count DESC
     """
+    }
+
+def check_data_distribution():
+    client = get_client()
+    dataset_id = f"{client.project}.netflix_analytics"
+    queries = distribution_queries(dataset_id)
+    
+    print("\nData Distribution Analysis:")
+    print("=" * 50)
+    
+    results = client.query(queries['counts']).result()
+    for row in results:
+        print(f"\nTotal Counts:")
+        print(f"Contents: {row.content_count}")
+        print(f"Users: {row.user_count}")
+        print(f"Viewing Events: {row.event_count}")
+    
+    print("\nContent Distribution by Genre:")
+    print("-" * 40)
+    results = client.query(queries['content']).result()
+    for row in results:
+        print(f"{row.genre}: {row.count} titles (avg duration: {row.avg_duration:.1f} min)")
+    
+    print("\nUser Distribution by Subscription:")
+    print("-" * 40)
+    results = client.query(queries['users']).result()
+    for row in results:
+        print(f"{row.subscription_type}: {row.count} users across {row.countries} countries")
     
     print("\nViewing Patterns by Device:")
     print("-" * 40)
-    results = client.query(viewing_query).result()
+    results = client.query(queries['viewing']).result()
     for row in results:
         print(f"{row.device_type}:")
         print(f"  Events: {row.event_count}")
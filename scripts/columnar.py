@@ -0,0 +1,356 @@
+"""Compact struct-of-arrays representation for users, contents and events.
+
+Each field of the nested JSON layout becomes one typed NumPy array keyed by
+its dotted path (the same names pd.json_normalize produces). Low-cardinality
+strings such as device_type or event_type are dictionary-encoded, and
+REPEATED string fields are stored as offsets into one encoded value array.
+Tables convert to and from the nested dicts on demand.
+"""
+import json
+import sys
+import numpy as np
+import pandas as pd
+
+# Field kinds:
+#   category        dictionary-encoded string (None allowed)
+#   category_list   REPEATED string, stored as offsets + dictionary-encoded values
+#   hexid           "prefix-<hex>" id stored as int64 (falls back to string)
+#   string          plain Python strings (unique values such as UUIDs)
+#   timestamp       ISO timestamp stored as datetime64[us]
+#   int8..int64     integers; a trailing "?" marks NULLABLE (-1 stands for None)
+#   float64, bool
+EVENT_FIELDS = [
+    ("event_id", "hexid"),
+    ("timestamp", "timestamp"),
+    ("event_type", "category"),
+    ("content_id", "category"),
+    ("content_key", "int64?"),
+    ("user_id", "category"),
+    ("user_key", "int64?"),
+    ("device_type", "category"),
+    ("watch_duration_seconds", "int32"),
+    ("session_id", "hexid"),
+    ("quality_metrics.buffering_events", "int16"),
+    ("quality_metrics.average_bitrate", "int32"),
+    ("quality_metrics.playback_quality", "category"),
+    ("quality_metrics.connection_type", "category"),
+    ("quality_metrics.bandwidth_mbps", "float64"),
+    ("quality_metrics.startup_time_seconds", "float64"),
+    ("quality_metrics.frames_dropped_ratio", "float64"),
+    ("quality_metrics.audio_quality_score", "float64"),
+    ("user_interaction.rewind_count", "int16"),
+    ("user_interaction.forward_count", "int16"),
+    ("user_interaction.pause_count", "int16"),
+    ("user_interaction.quality_changes", "int16"),
+    ("user_interaction.subtitle_changes", "int16"),
+    ("user_interaction.volume_changes", "int16"),
+    ("recommendation_data.algorithm_type", "category"),
+    ("recommendation_data.recommendation_score", "float64"),
+    ("recommendation_data.position_in_list", "int16"),
+    ("recommendation_data.recommendation_category", "category"),
+    ("engagement_signals.completion_rate", "float64"),
+    ("engagement_signals.engagement_score", "float64"),
+    ("engagement_signals.social_sharing", "bool"),
+    ("engagement_signals.rating_given", "int8?")
+]
+
+USER_FIELDS = [
+    ("user_id", "string"),
+    ("user_key", "int64?"),
+    ("country", "category"),
+    ("subscription_type", "category"),
+    ("age_group", "category"),
+    ("join_date", "timestamp"),
+    ("preferred_genres", "category_list"),
+    ("preferred_languages", "category_list"),
+    ("has_profile_pin", "bool"),
+    ("max_stream_quality", "category")
+]
+
+CONTENT_FIELDS = [
+    ("content_id", "string"),
+    ("content_key", "int64?"),
+    ("type", "category"),
+    ("title", "string"),
+    ("genre", "category"),
+    ("release_year", "int16"),
+    ("duration_minutes", "int16"),
+    ("language", "category"),
+    ("rating", "category"),
+    ("tags", "category_list")
+]
+
+def _code_dtype(num_categories):
+    """Smallest signed integer type that can hold the category codes"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if num_categories < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+class Categorical:
+    """Dictionary-encoded strings: integer codes into a list of categories"""
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = list(categories)
+
+    @classmethod
+    def encode(cls, values):
+        index = {}
+        codes = [-1 if v is None else index.setdefault(v, len(index)) for v in values]
+        return cls(np.array(codes, dtype=_code_dtype(len(index))), index)
+
+    def decode(self):
+        lookup = np.array(self.categories + [None], dtype=object)
+        return lookup[self.codes].tolist()
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + sum(sys.getsizeof(c) for c in self.categories)
+
+class CategoricalList:
+    """REPEATED strings: per-row offsets into one dictionary-encoded array"""
+
+    def __init__(self, offsets, values):
+        self.offsets = offsets
+        self.values = values
+
+    @classmethod
+    def encode(cls, lists):
+        lengths = np.fromiter((len(l) for l in lists), dtype=np.int64, count=len(lists))
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        values = Categorical.encode([v for l in lists for v in l])
+        return cls(offsets, values)
+
+    def decode(self):
+        flat = self.values.decode()
+        bounds = self.offsets.tolist()
+        return [flat[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.values.nbytes
+
+def _merge_categoricals(parts):
+    """Concatenate Categoricals, remapping codes onto a shared category list"""
+    index = {}
+    codes = []
+    for part in parts:
+        remap = np.array([index.setdefault(c, len(index)) for c in part.categories] + [-1], dtype=np.int64)
+        codes.append(remap[part.codes])
+    return Categorical(np.concatenate(codes).astype(_code_dtype(len(index))), index)
+
+class HexIds:
+    """Ids such as evt-00a3100000000001 stored as int64 values plus their prefix"""
+
+    def __init__(self, values, prefix):
+        self.values = values
+        self.prefix = prefix
+
+    def decode(self):
+        return [f"{self.prefix}-{v:016x}" for v in self.values.tolist()]
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+def _encode_hexids(values):
+    """Parse prefixed hex ids, or return None if they don't follow that format"""
+    prefix = values[0].rsplit("-", 1)[0] if values else ""
+    try:
+        parsed = [int(v[len(prefix) + 1:], 16) for v in values
+                  if v.startswith(prefix + "-") and len(v) == len(prefix) + 17]
+    except ValueError:
+        return None
+    if len(parsed) != len(values):
+        return None
+    return HexIds(np.array(parsed, dtype=np.int64), prefix)
+
+def _encode_column(kind, values):
+    if kind == "category":
+        return Categorical.encode(values)
+    if kind == "category_list":
+        return CategoricalList.encode(values)
+    if kind == "hexid":
+        encoded = _encode_hexids(values)
+        return encoded if encoded is not None else np.array(values, dtype=object)
+    if kind == "string":
+        return np.array(values, dtype=object)
+    if kind == "timestamp":
+        return np.array(values, dtype="datetime64[us]")
+    if kind.endswith("?"):
+        return np.array([-1 if v is None else v for v in values], dtype=kind[:-1])
+    return np.array(values, dtype=kind)
+
+def _decode_column(kind, column):
+    if isinstance(column, (Categorical, CategoricalList, HexIds)):
+        return column.decode()
+    if kind == "timestamp":
+        # Match datetime.isoformat(): only show microseconds when present
+        unit = "s" if not (column.astype("datetime64[s]") != column).any() else "us"
+        return np.datetime_as_string(column, unit=unit).tolist()
+    values = column.tolist()
+    if kind.endswith("?"):
+        return [None if v == -1 else v for v in values]
+    return values
+
+def _column_nbytes(column):
+    if column.dtype == object:
+        return column.nbytes + sum(sys.getsizeof(v) for v in column.tolist())
+    return column.nbytes
+
+class ColumnarTable:
+    """Typed columns keyed by dotted field path, one entry per row"""
+
+    def __init__(self, fields, columns, num_rows):
+        self.fields = fields
+        self.columns = columns
+        self.num_rows = num_rows
+
+    def __len__(self):
+        return self.num_rows
+
+    @classmethod
+    def from_records(cls, records, fields):
+        """Build a table from nested dicts; fields missing from the data are skipped"""
+        present = []
+        columns = {}
+        first = records[0] if records else {}
+        for path, kind in fields:
+            parent, _, child = path.rpartition(".")
+            container = first.get(parent, {}) if parent else first
+            if child not in container:
+                continue
+            if parent:
+                values = [r[parent].get(child) for r in records]
+            else:
+                values = [r.get(child) for r in records]
+            columns[path] = _encode_column(kind, values)
+            present.append((path, kind))
+        return cls(present, columns, len(records))
+
+    @classmethod
+    def concat(cls, tables):
+        """Concatenate tables that share the same fields"""
+        tables = [t for t in tables if len(t)]
+        if not tables:
+            return cls([], {}, 0)
+        columns = {}
+        for path, kind in tables[0].fields:
+            parts = [t.columns[path] for t in tables]
+            if isinstance(parts[0], Categorical):
+                columns[path] = _merge_categoricals(parts)
+            elif isinstance(parts[0], CategoricalList):
+                offsets = [parts[0].offsets]
+                for part in parts[1:]:
+                    offsets.append(part.offsets[1:] + offsets[-1][-1])
+                columns[path] = CategoricalList(np.concatenate(offsets),
+                                                _merge_categoricals([p.values for p in parts]))
+            elif isinstance(parts[0], HexIds) and all(
+                    isinstance(p, HexIds) and p.prefix == parts[0].prefix for p in parts):
+                columns[path] = HexIds(np.concatenate([p.values for p in parts]), parts[0].prefix)
+            else:
+                decoded = [v for p in parts for v in _decode_column(kind, p)]
+                columns[path] = _encode_column(kind, decoded)
+        return cls(tables[0].fields, columns, sum(len(t) for t in tables))
+
+    def column(self, path):
+        """Return a field as a list of Python values"""
+        kind = dict(self.fields)[path]
+        return _decode_column(kind, self.columns[path])
+
+    def to_records(self):
+        """Rebuild the nested dicts used by the JSON files"""
+        decoded = [(path.rpartition("."), self.column(path)) for path, _ in self.fields]
+        records = []
+        for i in range(self.num_rows):
+            record = {}
+            for (parent, _, child), values in decoded:
+                if parent:
+                    record.setdefault(parent, {})[child] = values[i]
+                else:
+                    record[child] = values[i]
+            records.append(record)
+        return records
+
+    def to_dataframe(self):
+        """Flat DataFrame with dotted column names and pandas categoricals"""
+        data = {}
+        for path, kind in self.fields:
+            column = self.columns[path]
+            if isinstance(column, Categorical):
+                data[path] = pd.Categorical.from_codes(column.codes, categories=column.categories)
+            elif isinstance(column, (CategoricalList, HexIds)) or kind.endswith("?"):
+                data[path] = self.column(path)
+            else:
+                data[path] = column
+        return pd.DataFrame(data)
+
+    @property
+    def nbytes(self):
+        total = 0
+        for column in self.columns.values():
+            if isinstance(column, np.ndarray):
+                total += _column_nbytes(column)
+            else:
+                total += column.nbytes
+        return total
+
+def read_columnar_file(filepath, fields, start_date=None, end_date=None):
+    """Read one raw data file, or a date-partitioned lake directory, into a ColumnarTable
+
+    Parquet is read column by column without building any records; for JSON
+    and NDJSON only the columnar form is kept and the parsed dicts are released.
+    start_date/end_date ('YYYY-MM-DD', inclusive) keep only rows whose
+    timestamp falls on those days; a lake directory only opens the partitions
+    in that range (see lake.py).
+    """
+    from lake import is_lake, read_manifest, select_files
+    from stream_io import is_ndjson, open_ndjson
+    if is_lake(filepath):
+        parts = select_files(filepath, start_date, end_date)
+        if read_manifest(filepath)['format'] == 'parquet':
+            from parquet_io import read_parquet
+            return read_parquet(parts, fields)
+        return ColumnarTable.concat([read_columnar_file(part, fields) for part in parts])
+
+    if filepath.endswith('.parquet'):
+        from parquet_io import read_parquet, date_range_filter
+        return read_parquet(filepath, fields, date_range_filter(start_date, end_date))
+    if is_ndjson(filepath):
+        with open_ndjson(filepath) as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(filepath, 'r') as f:
+            records = json.load(f)
+    if start_date or end_date:
+        start, end = str(start_date or '')[:10], str(end_date or '9999-12-31')[:10]
+        records = [r for r in records if start <= r['timestamp'][:10] <= end]
+    return ColumnarTable.from_records(records, fields)
+
+def deep_sizeof(obj):
+    """Approximate memory held by nested dicts/lists of Python values"""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple)):
+            stack.extend(item)
+    return total
@@ -0,0 +1,227 @@
+"""Dry-run cost report for every query the pipeline runs.
+
+The registered queries are the dashboard views (what a dashboard read runs),
+the analyze_data and check_data_counts queries and the summary table and
+viewing_events_wide refreshes (full and one-day). Each is dry-run on
+BigQuery, which bills nothing and reports the bytes the query would process
+and the tables it references, and checked for:
+- full_scan: a partitioned table read without a filter on its partitioning
+  column, so every partition is scanned (the daily summary tables are left
+  out, the views read them whole by design);
+- window_full_scan: window functions evaluated over such a full scan;
+- global_window: an OVER clause without PARTITION BY, which BigQuery
+  evaluates on a single worker.
+
+The report is a CSV with one row per query, sorted by source and query so
+the reports of two commits diff cleanly; --baseline prints the change in
+bytes against an earlier report. --benchmark also runs the SELECTs and
+records their wall-clock seconds, which is all the local backend
+(NETFLIX_BACKEND=local) can report, as it has no dry runs.
+
+    python scripts/cost_report.py
+    python scripts/cost_report.py --sort bytes --baseline old_cost_report.csv
+    NETFLIX_BACKEND=local python scripts/cost_report.py --benchmark
+"""
+import argparse
+import csv
+import os
+import re
+import time
+from datetime import date
+from google.cloud import bigquery
+from query_backend import get_client, is_local
+
+REPORT_COLUMNS = ['source', 'query', 'statement', 'bytes_processed', 'referenced_tables', 'partitions',
+                  'windows', 'flags', 'seconds', 'error']
+
+_TABLE_NAME = re.compile(r'`(?:[\w-]+\.)?netflix_analytics\.(\w+)`|\bnetflix_analytics\.(\w+)')
+
+def registered_queries(dataset_id):
+    """(source, query name, SQL, query parameters) of every query the pipeline runs"""
+    from analyze_data import WIDE_QUERIES, analysis_queries
+    from check_data_counts import distribution_queries
+    from create_dashboard_views import view_queries, view_select
+    from setup_bigquery import load_schemas
+    from summary_tables import ROLLUPS, merge_sql as summary_merge_sql
+    from wide_events import WIDE_TABLE, merge_sql as wide_merge_sql
+
+    schemas = load_schemas()
+    # Incremental refreshes are costed for a single changed day
+    one_day = [date.today()]
+    day_parameters = [bigquery.ArrayQueryParameter('days', 'DATE', one_day)]
+
+    queries = [('create_dashboard_views', view_name, view_select(query), [])
+               for view_name, query in view_queries(dataset_id).items()]
+    queries += [('analyze_data', name, query, []) for name, query in analysis_queries().items()]
+    queries += [('analyze_data --wide', name, query, []) for name, query in WIDE_QUERIES.items()]
+    queries += [('check_data_counts', name, query, []) for name, query in distribution_queries(dataset_id).items()]
+    for table_name in ROLLUPS:
+        queries.append(('summary_tables', f"{table_name} full", summary_merge_sql(dataset_id, table_name, schemas), []))
+        queries.append(('summary_tables', f"{table_name} 1 day",
+                        summary_merge_sql(dataset_id, table_name, schemas, one_day), day_parameters))
+    queries.append(('wide_events', f"{WIDE_TABLE} full", wide_merge_sql(dataset_id, schemas), []))
+    queries.append(('wide_events', f"{WIDE_TABLE} 1 day", wide_merge_sql(dataset_id, schemas, one_day), day_parameters))
+    return queries
+
+def referenced_tables(query):
+    return sorted({name for match in _TABLE_NAME.finditer(query) for name in match.groups() if name})
+
+def window_clauses(query):
+    """The text inside each OVER (...) of a query"""
+    clauses = []
+    for match in re.finditer(r'\bOVER\s*\(', query, re.IGNORECASE):
+        depth, end = 1, match.end()
+        while depth and end < len(query):
+            depth += {'(': 1, ')': -1}.get(query[end], 0)
+            end += 1
+        clauses.append(query[match.end():end - 1])
+    return clauses
+
+def filters_on(query, column):
+    """Whether the query compares column (possibly inside DATE()) with anything, so partitions can be pruned"""
+    # A MERGE's UPDATE SET assignments look like comparisons but prune nothing
+    predicates = re.sub(r'\bUPDATE\s+SET\b.*?(?=\bWHEN\b|$)', '', query, flags=re.IGNORECASE | re.DOTALL)
+    # and neither do join conditions, comparing the column with another table's
+    pattern = rf'\b(?:\w+\.)?{column}\b\s*\)?\s*(?:(?:=|<|>|!=)(?!=?\s*\w+\.\w+)|\bIN\b|\bBETWEEN\b)'
+    return re.search(pattern, predicates, re.IGNORECASE) is not None
+
+def analyze_query(query, parameters, partition_fields, summary_tables):
+    """Static checks: partitions each partitioned table is read from, window functions and flags"""
+    days = next((len(parameter.values) for parameter in parameters if parameter.name == 'days'), None)
+    partitions, full_scans = [], []
+    for table_name in referenced_tables(query):
+        if table_name not in partition_fields:
+            continue
+        if filters_on(query, partition_fields[table_name]):
+            partitions.append(f"{table_name}:{days if days is not None else 'filtered'}")
+        else:
+            partitions.append(f"{table_name}:all")
+            if table_name not in summary_tables:
+                full_scans.append(table_name)
+
+    windows = window_clauses(query)
+    flags = [f"full_scan:{table_name}" for table_name in full_scans]
+    if windows and full_scans:
+        flags.append('window_full_scan')
+    if any('PARTITION BY' not in clause.upper() for clause in windows):
+        flags.append('global_window')
+    return {'partitions': ';'.join(partitions), 'windows': len(windows), 'flags': ';'.join(flags)}
+
+def dry_run(client, query, parameters):
+    job_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False, query_parameters=parameters)
+    job = client.query(query, job_config=job_config)
+    return {
+        'statement': job.statement_type,
+        'bytes_processed': job.total_bytes_processed,
+        'referenced_tables': ';'.join(sorted(table.table_id for table in job.referenced_tables))
+    }
+
+def benchmark(client, query, parameters):
+    """Wall-clock seconds of actually running a query"""
+    job_config = bigquery.QueryJobConfig(use_query_cache=False, query_parameters=parameters)
+    start = time.perf_counter()
+    client.query(query, job_config=job_config).result()
+    return round(time.perf_counter() - start, 3)
+
+def build_report(client=None, run_benchmark=False):
+    """One report row per registered query; a query that fails records its error and the rest go on"""
+    from setup_bigquery import load_schemas
+    from summary_tables import ROLLUPS
+
+    client = client or get_client()
+    dataset_id = f"{client.project}.netflix_analytics"
+    table_options = load_schemas().get('table_options', {})
+    partition_fields = {table_name: options['time_partitioning']['field']
+                        for table_name, options in table_options.items() if 'time_partitioning' in options}
+    local = is_local(client)
+
+    rows = []
+    for source, name, query, parameters in registered_queries(dataset_id):
+        statement = query.lstrip().split(None, 1)[0].upper()
+        row = {'source': source, 'query': name, 'statement': statement,
+               'referenced_tables': ';'.join(referenced_tables(query)),
+               **analyze_query(query, parameters, partition_fields, set(ROLLUPS))}
+        try:
+            # The local backend has no dry runs, and would run the refreshes for real
+            if not local:
+                row.update(dry_run(client, query, parameters))
+            if run_benchmark and statement in ('SELECT', 'WITH'):
+                row['seconds'] = benchmark(client, query, parameters)
+        except Exception as e:
+            row['error'] = str(e).splitlines()[0]
+        rows.append(row)
+    return rows
+
+def sort_report(rows, key='name'):
+    if key == 'bytes':
+        return sorted(rows, key=lambda row: -(row.get('bytes_processed') or 0))
+    if key == 'seconds':
+        return sorted(rows, key=lambda row: -(row.get('seconds') or 0))
+    return sorted(rows, key=lambda row: (row['source'], row['query']))
+
+def write_report(rows, path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({column: row.get(column) for column in REPORT_COLUMNS})
+
+def read_report(path):
+    with open(path, newline='') as f:
+        return {(row['source'], row['query']): row for row in csv.DictReader(f)}
+
+def format_bytes(value):
+    if value in (None, ''):
+        return '-'
+    return f"{int(value) / 1e6:.1f} MB"
+
+def print_report(rows):
+    header = f"{'source':24} | {'query':38} | {'bytes':>12} | {'seconds':>8} | flags"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        seconds = f"{row['seconds']:.3f}" if row.get('seconds') is not None else '-'
+        flags = row.get('error') and f"ERROR {row['error'][:60]}" or row.get('flags') or ''
+        print(f"{row['source']:24} | {row['query']:38} | {format_bytes(row.get('bytes_processed')):>12} | "
+              f"{seconds:>8} | {flags}")
+
+def print_baseline_diff(rows, baseline):
+    """Print the queries whose bytes processed changed since the baseline report, and the new and removed ones"""
+    print("\nChanges against the baseline:")
+    current = {(row['source'], row['query']): row for row in rows}
+    changed = False
+    for key in sorted(set(current) | set(baseline)):
+        label = f"{key[0]} {key[1]}"
+        if key not in baseline:
+            print(f"  new      {label}: {format_bytes(current[key].get('bytes_processed'))}")
+        elif key not in current:
+            print(f"  removed  {label}")
+        else:
+            before = int(baseline[key]['bytes_processed'] or 0)
+            after = int(current[key].get('bytes_processed') or 0)
+            if before == after:
+                continue
+            change = f" ({(after - before) / before:+.0%})" if before else ''
+            print(f"  changed  {label}: {format_bytes(before)} -> {format_bytes(after)}{change}")
+        changed = True
+    if not changed:
+        print("  none")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dry-run every registered query and report what it would scan")
+    parser.add_argument('--output', default='data/processed/cost_report.csv')
+    parser.add_argument('--sort', choices=['name', 'bytes', 'seconds'], default='name',
+                        help="Order of the printed report (the CSV is always sorted by name)")
+    parser.add_argument('--benchmark', action='store_true', help="Also run the SELECTs and time them")
+    parser.add_argument('--baseline', help="Earlier report to compare bytes processed against")
+    args = parser.parse_args()
+
+    rows = sort_report(build_report(run_benchmark=args.benchmark))
+    baseline = read_report(args.baseline) if args.baseline else None
+    write_report(rows, args.output)
+    print_report(sort_report(rows, args.sort))
+    print(f"\nReport written to {args.output}")
+    if baseline is not None:
+        print_baseline_diff(rows, baseline)
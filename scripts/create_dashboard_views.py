@@ -1,128 +1,214 @@
-from google.cloud import bigquery
+import re
+from quantile_sketch import QUANTILES, percentiles_sql
+from query_backend import get_client
+from summary_tables import refresh_summaries
 
-def create_bigquery_views():
-    client = bigquery.Client()
-    dataset_id = f"{client.project}.netflix_analytics"
+VIEW_NAMES = ['quality_metrics_view', 'engagement_metrics_view', 'ratings_analysis_view',
+              'content_performance_view', 'recommendation_analysis_view']
+
+# Sketched metrics (summary_tables.SKETCH_METRICS) whose percentiles each view reports, by column prefix
+QUALITY_PERCENTILES = {'startup_time_seconds': 'startup_time', 'buffering_events': 'buffering',
+                       'bandwidth_mbps': 'bandwidth'}
+ENGAGEMENT_PERCENTILES = {'engagement_score': 'engagement'}
+
+def percentile_columns(metrics):
+    return [f"{prefix}_p{round(q * 100)}" for prefix in metrics.values() for q in QUANTILES]
 
-    # Create materialized view for quality metrics
+def view_queries(dataset_id):
+    """The CREATE OR REPLACE VIEW statement of each dashboard view, by view name
+
+    The views keep their original columns (the quality and engagement views
+    add p50/p90/p99 columns), but read the small summary tables from
+    summary_tables.py instead of scanning viewing_events.
+    """
+    sketch_table = f"{dataset_id}.metric_sketch_daily"
+
+    # Create view for quality metrics, with startup time, buffering and
+    # bandwidth percentiles from the merged daily sketches
     quality_metrics_view = f"""
     CREATE OR REPLACE VIEW `{dataset_id}.quality_metrics_view` AS
-    WITH device_metrics AS (
-        SELECT 
+    WITH quality AS (
+        SELECT
             device_type,
-            quality_metrics.connection_type,
-            quality_metrics.buffering_events,
-            quality_metrics.bandwidth_mbps,
-            quality_metrics.startup_time_seconds,
-            quality_metrics.frames_dropped_ratio,
-            quality_metrics.audio_quality_score,
-            FIRST_VALUE(timestamp) OVER (PARTITION BY device_type ORDER BY timestamp) as first_seen,
-            COUNT(*) OVER (PARTITION BY device_type) as total_sessions
-        FROM `{dataset_id}.viewing_events`
-    )
-    SELECT 
-        device_type,
-        connection_type,
-        AVG(buffering_events) as avg_buffering,
-        AVG(bandwidth_mbps) as avg_bandwidth,
-        AVG(startup_time_seconds) as avg_startup_time,
-        AVG(frames_dropped_ratio) as avg_frames_dropped,
-        AVG(audio_quality_score) as avg_audio_quality,
-        COUNT(*) as session_count,
-        MAX(total_sessions) as total_device_sessions
-    FROM device_metrics
-    GROUP BY device_type, connection_type
+            connection_type,
+            SUM(buffering_events_sum) / SUM(session_count) as avg_buffering,
+            SUM(bandwidth_mbps_sum) / SUM(session_count) as avg_bandwidth,
+            SUM(startup_time_seconds_sum) / SUM(session_count) as avg_startup_time,
+            SUM(frames_dropped_ratio_sum) / SUM(session_count) as avg_frames_dropped,
+            SUM(audio_quality_score_sum) / SUM(session_count) as avg_audio_quality,
+            SUM(session_count) as session_count,
+            SUM(SUM(session_count)) OVER (PARTITION BY device_type) as total_device_sessions
+        FROM `{dataset_id}.quality_metrics_daily`
+        GROUP BY device_type, connection_type
+    ),
+    percentiles AS ({percentiles_sql(sketch_table, ['device_type', 'connection_type'], QUALITY_PERCENTILES)})
+    SELECT
+        q.*,
+        {', '.join(f"p.{column}" for column in percentile_columns(QUALITY_PERCENTILES))}
+    FROM quality q
+    LEFT JOIN percentiles p
+    ON q.device_type = p.device_type AND q.connection_type = p.connection_type
     """
 
-    # Create materialized view for engagement metrics
+    # Create view for engagement metrics; a session's engagement percentile
+    # within its device is that of its 0.01-wide score bucket, and the score
+    # percentiles per device and connection type come from the daily sketches
     engagement_view = f"""
     CREATE OR REPLACE VIEW `{dataset_id}.engagement_metrics_view` AS
-    WITH engagement_stats AS (
-        SELECT 
+    WITH buckets AS (
+        SELECT
             device_type,
-            quality_metrics.connection_type,
-            engagement_signals.engagement_score,
-            engagement_signals.completion_rate,
-            watch_duration_seconds,
-            PERCENT_RANK() OVER (PARTITION BY device_type ORDER BY engagement_signals.engagement_score) as engagement_percentile
-        FROM `{dataset_id}.viewing_events`
-    )
-    SELECT 
-        device_type,
-        connection_type,
-        AVG(engagement_score) as avg_engagement,
-        AVG(completion_rate) as avg_completion,
-        AVG(watch_duration_seconds) as avg_duration,
-        COUNT(*) as session_count,
-        AVG(CASE WHEN engagement_percentile >= 0.9 THEN 1 ELSE 0 END) as high_engagement_ratio
-    FROM engagement_stats
-    GROUP BY device_type, connection_type
+            connection_type,
+            engagement_bucket,
+            SUM(session_count) as sessions,
+            SUM(engagement_score_sum) as engagement_score_sum,
+            SUM(completion_rate_sum) as completion_rate_sum,
+            SUM(watch_duration_seconds_sum) as watch_duration_seconds_sum
+        FROM `{dataset_id}.engagement_metrics_daily`
+        GROUP BY device_type, connection_type, engagement_bucket
+    ),
+    device_buckets AS (
+        SELECT
+            device_type,
+            engagement_bucket,
+            COALESCE(SUM(SUM(sessions)) OVER (PARTITION BY device_type ORDER BY engagement_bucket
+                                               ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING), 0) as sessions_below,
+            SUM(SUM(sessions)) OVER (PARTITION BY device_type) as device_sessions
+        FROM buckets
+        GROUP BY device_type, engagement_bucket
+    ),
+    engagement AS (
+        SELECT
+            b.device_type,
+            b.connection_type,
+            SUM(b.engagement_score_sum) / SUM(b.sessions) as avg_engagement,
+            SUM(b.completion_rate_sum) / SUM(b.sessions) as avg_completion,
+            SUM(b.watch_duration_seconds_sum) / SUM(b.sessions) as avg_duration,
+            SUM(b.sessions) as session_count,
+            SUM(CASE WHEN d.device_sessions > 1 AND d.sessions_below / (d.device_sessions - 1) >= 0.9
+                     THEN b.sessions ELSE 0 END) / SUM(b.sessions) as high_engagement_ratio
+        FROM buckets b
+        JOIN device_buckets d
+        ON b.device_type = d.device_type AND b.engagement_bucket = d.engagement_bucket
+        GROUP BY b.device_type, b.connection_type
+    ),
+    percentiles AS ({percentiles_sql(sketch_table, ['device_type', 'connection_type'], ENGAGEMENT_PERCENTILES)})
+    SELECT
+        e.*,
+        {', '.join(f"p.{column}" for column in percentile_columns(ENGAGEMENT_PERCENTILES))}
+    FROM engagement e
+    LEFT JOIN percentiles p
+    ON e.device_type = p.device_type AND e.connection_type = p.connection_type
     """
 
-    # Create materialized view for ratings analysis
+    # Create view for ratings analysis, per type and genre off the per-content
+    # daily facts; avg_rating counts unrated views as 0
     ratings_view = f"""
     CREATE OR REPLACE VIEW `{dataset_id}.ratings_analysis_view` AS
-    WITH content_ratings AS (
-        SELECT 
-            c.content_id,
-            c.type,
-            c.genre,
-            c.title,
-            v.engagement_signals.rating_given,
-            v.engagement_signals.engagement_score,
-            COUNT(*) OVER (PARTITION BY c.content_id) as view_count,
-            AVG(v.engagement_signals.rating_given) OVER (PARTITION BY c.genre) as genre_avg_rating
-        FROM `{dataset_id}.contents` c
-        JOIN `{dataset_id}.viewing_events` v
-        ON c.content_id = v.content_id
+    WITH content_facts AS (
+        SELECT
+            content_id,
+            SUM(view_count) as view_count,
+            SUM(rating_given_sum) as rating_given_sum,
+            SUM(rating_given_count) as rating_given_count,
+            SUM(engagement_score_sum) as engagement_score_sum,
+            SUM(engagement_score_count) as engagement_score_count
+        FROM `{dataset_id}.content_daily_facts`
+        GROUP BY content_id
     )
-    SELECT 
-        type,
-        genre,
-        AVG(CASE WHEN rating_given IS NOT NULL THEN rating_given ELSE 0 END) as avg_rating,
-        COUNT(DISTINCT content_id) as content_count,
-        SUM(view_count) as total_views,
-        AVG(engagement_score) as avg_engagement,
-        AVG(genre_avg_rating) as genre_rating
-    FROM content_ratings
-    GROUP BY type, genre
+    SELECT
+        c.type,
+        c.genre,
+        SUM(f.rating_given_sum) / SUM(f.view_count) as avg_rating,
+        COUNT(DISTINCT c.content_id) as content_count,
+        SUM(f.view_count) as total_views,
+        SUM(f.engagement_score_sum) / NULLIF(SUM(f.engagement_score_count), 0) as avg_engagement,
+        SUM(SUM(f.rating_given_sum)) OVER (PARTITION BY c.genre)
+            / NULLIF(SUM(SUM(f.rating_given_count)) OVER (PARTITION BY c.genre), 0) as genre_rating
+    FROM `{dataset_id}.contents` c
+    JOIN content_facts f
+    ON c.content_id = f.content_id
+    GROUP BY c.type, c.genre
     """
 
-    # Create materialized view for recommendation analysis
+    # Create view for per-content performance off the same facts
+    content_view = f"""
+    CREATE OR REPLACE VIEW `{dataset_id}.content_performance_view` AS
+    SELECT
+        c.content_id,
+        c.title,
+        c.type,
+        c.genre,
+        SUM(f.view_count) as total_views,
+        SUM(f.watch_duration_seconds_sum) / 3600 as total_watch_hours,
+        SUM(f.watch_duration_seconds_sum) / SUM(f.view_count) / 60 as avg_watch_minutes,
+        SUM(f.rating_given_sum) / NULLIF(SUM(f.rating_given_count), 0) as avg_rating,
+        SUM(f.rating_given_count) as rating_count,
+        SUM(f.engagement_score_sum) / NULLIF(SUM(f.engagement_score_count), 0) as avg_engagement,
+        MIN(f.day) as first_view_day,
+        MAX(f.day) as last_view_day
+    FROM `{dataset_id}.contents` c
+    JOIN `{dataset_id}.content_daily_facts` f
+    ON c.content_id = f.content_id
+    GROUP BY c.content_id, c.title, c.type, c.genre
+    """
+
+    # Create view for recommendation analysis; the overall top ten sessions
+    # per algorithm are among the days' top tens
     recommendation_view = f"""
     CREATE OR REPLACE VIEW `{dataset_id}.recommendation_analysis_view` AS
-    WITH recommendation_metrics AS (
-        SELECT 
-            recommendation_data.algorithm_type,
-            recommendation_data.recommendation_category,
-            recommendation_data.recommendation_score,
-            engagement_signals.engagement_score,
-            engagement_signals.rating_given,
-            ROW_NUMBER() OVER (PARTITION BY recommendation_data.algorithm_type 
-                             ORDER BY engagement_signals.engagement_score DESC) as rank_by_engagement
-        FROM `{dataset_id}.viewing_events`
+    WITH top_sessions AS (
+        SELECT
+            algorithm_type,
+            recommendation_category
+        FROM `{dataset_id}.recommendation_top_daily`
+        WHERE TRUE
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY algorithm_type ORDER BY engagement_score DESC) <= 10
+    ),
+    top_counts AS (
+        SELECT
+            algorithm_type,
+            recommendation_category,
+            COUNT(*) as top_10_count
+        FROM top_sessions
+        GROUP BY algorithm_type, recommendation_category
     )
-    SELECT 
-        algorithm_type,
-        recommendation_category,
-        AVG(recommendation_score) as avg_rec_score,
-        AVG(engagement_score) as avg_engagement,
-        AVG(CASE WHEN rating_given IS NOT NULL THEN rating_given ELSE 0 END) as avg_rating,
-        COUNT(*) as recommendation_count,
-        AVG(CASE WHEN rank_by_engagement <= 10 THEN 1 ELSE 0 END) as top_10_engagement_rate
-    FROM recommendation_metrics
-    GROUP BY algorithm_type, recommendation_category
+    SELECT
+        d.algorithm_type,
+        d.recommendation_category,
+        SUM(d.recommendation_score_sum) / SUM(d.recommendation_count) as avg_rec_score,
+        SUM(d.engagement_score_sum) / SUM(d.recommendation_count) as avg_engagement,
+        SUM(d.rating_given_sum) / SUM(d.recommendation_count) as avg_rating,
+        SUM(d.recommendation_count) as recommendation_count,
+        COALESCE(MAX(t.top_10_count), 0) / SUM(d.recommendation_count) as top_10_engagement_rate
+    FROM `{dataset_id}.recommendation_daily` d
+    LEFT JOIN top_counts t
+    ON d.algorithm_type = t.algorithm_type AND d.recommendation_category = t.recommendation_category
+    GROUP BY d.algorithm_type, d.recommendation_category
     """
 
-    # Execute view creation queries
-    views = {
+    return {
         'quality_metrics_view': quality_metrics_view,
         'engagement_metrics_view': engagement_view,
         'ratings_analysis_view': ratings_view,
+        'content_performance_view': content_view,
         'recommendation_analysis_view': recommendation_view
     }
 
-    for view_name, query in views.items():
+def view_select(query):
+    """The SELECT a view statement stores, i.e. what every read of the view runs"""
+    return re.sub(r'^\s*CREATE OR REPLACE VIEW `[^`]+` AS', '', query)
+
+def create_bigquery_views(client=None, refresh=True):
+    """Refresh the daily summary tables and (re)create the dashboard views over them"""
+    client = client or get_client()
+    dataset_id = f"{client.project}.netflix_analytics"
+
+    if refresh:
+        refresh_summaries(client)
+
+    # Execute view creation queries
+    for view_name, query in view_queries(dataset_id).items():
         try:
             query_job = client.query(query)
             query_job.result()
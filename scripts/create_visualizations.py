@@ -1,11 +1,11 @@
-from google.cloud import bigquery
+from query_backend import get_client
 import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
 from plotly.subplots import make_subplots
 
 def get_bigquery_client():
-    return bigquery.Client()
+    return get_client()
 
 def query_quality_metrics():
     client = get_bigquery_client()
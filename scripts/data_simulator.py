@@ -1,10 +1,22 @@
+import argparse
 import json
+import math
+import os
 import random
 from datetime import datetime, timedelta
 import uuid
+from sharding import split_evenly, run_shards
+from stream_io import COMPRESSIONS, ndjson_path, write_ndjson
+from id_allocation import IdAllocator, MAX_RUN_ID, format_id
 
 class NetflixDataSimulator:
-    def __init__(self):
+    def __init__(self, seed=None, run_id=None, shard_id=0):
+        # Instance RNG so that seeded simulators (and shards) are reproducible
+        self.rng = random.Random(seed)
+        # Shards of one run share the run id; event ids embed the shard id
+        self.run_id = self.rng.randint(0, MAX_RUN_ID) if run_id is None else run_id
+        self.event_ids = IdAllocator(self.run_id, shard_id)
+        self.content_count = 0
         self.content_types = ['movie', 'series']
         self.genres = ['action', 'comedy', 'drama', 'documentary', 'thriller', 'romance', 'sci-fi', 'horror', 'family', 'anime']
         self.devices = ['smart_tv', 'mobile', 'tablet', 'laptop', 'desktop', 'gaming_console', 'streaming_stick']
@@ -12,121 +24,158 @@ class NetflixDataSimulator:
         self.countries = ['US', 'UK', 'CA', 'AU', 'FR', 'DE', 'JP', 'BR', 'IN', 'MX', 'ES', 'IT', 'NL', 'SG', 'KR']
         self.series_episodes = {}  # To track episodes for series
 
+    def generate_uuid(self):
+        """Generate a random UUID4 from the simulator's RNG"""
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
     def generate_content(self):
-        content_type = random.choice(self.content_types)
-        content_id = str(uuid.uuid4())
+        content_type = self.rng.choice(self.content_types)
+        content_id = self.generate_uuid()
         
         if content_type == 'series':
-            num_episodes = random.randint(8, 24)
+            num_episodes = self.rng.randint(8, 24)
             self.series_episodes[content_id] = num_episodes
-            episode_duration = random.randint(25, 60)
+            episode_duration = self.rng.randint(25, 60)
         else:
-            episode_duration = random.randint(90, 180)
+            episode_duration = self.rng.randint(90, 180)
 
+        self.content_count += 1
         return {
             'content_id': content_id,
+            'content_key': self.content_count,
             'type': content_type,
-            'title': f"Sample {content_type.title()} {random.randint(1, 1000)}",
-            'genre': random.choice(self.genres),
-            'release_year': random.randint(2018, 2024),
+            'title': f"Sample {content_type.title()} {self.rng.randint(1, 1000)}",
+            'genre': self.rng.choice(self.genres),
+            'release_year': self.rng.randint(2018, 2024),
             'duration_minutes': episode_duration,
-            'language': random.choice(['English', 'Spanish', 'French', 'Japanese', 'Korean', 'Hindi']),
-            'rating': random.choice(['G', 'PG', 'PG-13', 'R', 'TV-MA', 'TV-14', 'TV-PG']),
-            'tags': random.sample(['action-packed', 'emotional', 'suspenseful', 'thought-provoking', 
+            'language': self.rng.choice(['English', 'Spanish', 'French', 'Japanese', 'Korean', 'Hindi']),
+            'rating': self.rng.choice(['G', 'PG', 'PG-13', 'R', 'TV-MA', 'TV-14', 'TV-PG']),
+            'tags': self.rng.sample(['action-packed', 'emotional', 'suspenseful', 'thought-provoking', 
                                  'romantic', 'dark', 'funny', 'classic', 'award-winning'], 3)
         }
 
-    def generate_user(self, user_id):
-        join_date = datetime(2023, 1, 1) + timedelta(days=random.randint(0, 365))
+    def generate_user(self, user_id, user_key=None):
+        join_date = datetime(2023, 1, 1) + timedelta(days=self.rng.randint(0, 365))
         return {
             'user_id': user_id,
-            'country': random.choice(self.countries),
-            'subscription_type': random.choice(['basic', 'standard', 'premium']),
-            'age_group': random.choice(['18-24', '25-34', '35-44', '45-54', '55+']),
+            'user_key': user_key,
+            'country': self.rng.choice(self.countries),
+            'subscription_type': self.rng.choice(['basic', 'standard', 'premium']),
+            'age_group': self.rng.choice(['18-24', '25-34', '35-44', '45-54', '55+']),
             'join_date': join_date.isoformat(),
-            'preferred_genres': random.sample(self.genres, random.randint(2, 4)),
-            'preferred_languages': random.sample(['English', 'Spanish', 'French', 'Japanese', 'Korean', 'Hindi'], 
-                                              random.randint(1, 3)),
-            'has_profile_pin': random.choice([True, False]),
-            'max_stream_quality': random.choice(['HD', '4K', 'SD'])
+            'preferred_genres': self.rng.sample(self.genres, self.rng.randint(2, 4)),
+            'preferred_languages': self.rng.sample(['English', 'Spanish', 'French', 'Japanese', 'Korean', 'Hindi'], 
+                                              self.rng.randint(1, 3)),
+            'has_profile_pin': self.rng.choice([True, False]),
+            'max_stream_quality': self.rng.choice(['HD', '4K', 'SD'])
         }
 
     def generate_viewing_event(self, content, user, timestamp=None):
         if timestamp is None:
-            timestamp = datetime.now() - timedelta(days=random.randint(0, 30))
+            timestamp = datetime.now() - timedelta(days=self.rng.randint(0, 30))
         
-        event_type = random.choice(self.event_types)
+        event_type = self.rng.choice(self.event_types)
         max_duration = content['duration_minutes'] * 60  # Convert to seconds
         
         if event_type == 'complete':
             watch_duration = max_duration
         elif event_type == 'exit':
-            watch_duration = random.randint(1, max_duration)
+            watch_duration = self.rng.randint(1, max_duration)
         else:
-            watch_duration = random.randint(max_duration // 4, max_duration)
+            watch_duration = self.rng.randint(max_duration // 4, max_duration)
 
-        quality_issues = random.random() < 0.15  # 15% chance of quality issues
+        quality_issues = self.rng.random() < 0.15  # 15% chance of quality issues
         
         return {
-            'event_id': str(uuid.uuid4()),
+            'event_id': format_id('evt', self.event_ids.next_id()),
             'timestamp': timestamp.isoformat(),
             'event_type': event_type,
             'content_id': content['content_id'],
+            'content_key': content.get('content_key'),
             'user_id': user['user_id'],
-            'device_type': random.choice(self.devices),
+            'user_key': user.get('user_key'),
+            'device_type': self.rng.choice(self.devices),
             'watch_duration_seconds': watch_duration,
             'quality_metrics': {
-                'buffering_events': random.randint(3, 8) if quality_issues else random.randint(0, 2),
-                'average_bitrate': random.randint(2000, 8000),
-                'playback_quality': random.choice(['SD', 'HD', '4K']),
-                'connection_type': random.choice(['wifi', '4G', '5G', 'ethernet']),
-                'startup_time_seconds': random.uniform(0.5, 3.0),
-                'frames_dropped_ratio': random.uniform(0, 0.02) if quality_issues else random.uniform(0, 0.005)
+                'buffering_events': self.rng.randint(3, 8) if quality_issues else self.rng.randint(0, 2),
+                'average_bitrate': self.rng.randint(2000, 8000),
+                'playback_quality': self.rng.choice(['SD', 'HD', '4K']),
+                'connection_type': self.rng.choice(['wifi', '4G', '5G', 'ethernet']),
+                'startup_time_seconds': self.rng.uniform(0.5, 3.0),
+                'frames_dropped_ratio': self.rng.uniform(0, 0.02) if quality_issues else self.rng.uniform(0, 0.005)
             },
             'user_interaction': {
-                'rewind_count': random.randint(0, 3),
-                'forward_count': random.randint(0, 3),
-                'pause_count': random.randint(0, 5)
+                'rewind_count': self.rng.randint(0, 3),
+                'forward_count': self.rng.randint(0, 3),
+                'pause_count': self.rng.randint(0, 5)
             }
         }
 
-    def generate_batch_events(self, num_users=500, events_per_user_range=(15, 40)):
+    def generate_user_events(self, user, contents, events_per_user_range, reference_time):
+        """Generate the viewing sessions of one user"""
+        events = []
+        # Each user watches between 15-40 pieces of content
+        num_events = self.rng.randint(*events_per_user_range)
+        user_contents = self.rng.sample(contents, num_events)
+        
+        for content in user_contents:
+            # Generate 1-3 viewing sessions for each content
+            num_sessions = self.rng.randint(1, 3)
+            for _ in range(num_sessions):
+                timestamp = reference_time - timedelta(
+                    days=self.rng.randint(0, 30),
+                    hours=self.rng.randint(0, 23),
+                    minutes=self.rng.randint(0, 59)
+                )
+                events.append(self.generate_viewing_event(content, user, timestamp))
+        return events
+
+    def generate_batch_events(self, num_users=500, events_per_user_range=(15, 40),
+                              num_shards=1, processes=None, reference_time=None, num_contents=200):
+        """Generate contents, users and their viewing events
+
+        With num_shards > 1 the users and their events are split across a
+        process pool. Each shard gets its own seed drawn from this simulator's
+        RNG, so a seeded simulator with a fixed reference_time gives identical
+        output for the same shard count.
+        """
         print("Generating sample Netflix viewing data...")
+        reference_time = reference_time or datetime.now()
         
         # Generate content items (mix of movies and series)
-        contents = [self.generate_content() for _ in range(200)]  # 200 unique content items
+        contents = [self.generate_content() for _ in range(num_contents)]  # 200 unique content items by default
         print(f"Generated {len(contents)} unique content items")
 
+        if num_shards > 1:
+            tasks = [
+                (self.rng.getrandbits(64), self.run_id, shard_id, contents, start, count,
+                 events_per_user_range, reference_time)
+                for shard_id, (start, count) in enumerate(split_evenly(num_users, num_shards))
+            ]
+            results = run_shards(_generate_shard, tasks, processes)
+            users = [user for shard_users, _ in results for user in shard_users]
+            events = [event for _, shard_events in results for event in shard_events]
+            print(f"Generated {len(users)} unique users across {num_shards} shards")
+            print(f"Generated {len(events)} viewing events")
+            return {
+                'contents': contents,
+                'users': users,
+                'events': events
+            }
+
         # Generate users
         users = []
         for i in range(num_users):
-            user_id = str(uuid.uuid4())
-            users.append(self.generate_user(user_id))
+            user_id = self.generate_uuid()
+            users.append(self.generate_user(user_id, user_key=i + 1))
         print(f"Generated {len(users)} unique users")
 
         # Generate viewing events
         events = []
-        total_events = 0
-        
         for user in users:
-            # Each user watches between 15-40 pieces of content
-            num_events = random.randint(*events_per_user_range)
-            user_contents = random.sample(contents, num_events)
-            
-            for content in user_contents:
-                # Generate 1-3 viewing sessions for each content
-                num_sessions = random.randint(1, 3)
-                for _ in range(num_sessions):
-                    timestamp = datetime.now() - timedelta(
-                        days=random.randint(0, 30),
-                        hours=random.randint(0, 23),
-                        minutes=random.randint(0, 59)
-                    )
-                    event = self.generate_viewing_event(content, user, timestamp)
-                    events.append(event)
-                    total_events += 1
-
-        print(f"Generated {total_events} viewing events")
+            events.extend(self.generate_user_events(user, contents, events_per_user_range, reference_time))
+
+        print(f"Generated {len(events)} viewing events")
         
         return {
             'contents': contents,
@@ -134,22 +183,196 @@ class NetflixDataSimulator:
             'events': events
         }
 
+    def iter_batch_events(self, users, contents, events_per_user_range=(15, 40),
+                          batch_size=100000, reference_time=None):
+        """Yield the users' viewing events in batches of about batch_size records"""
+        reference_time = reference_time or datetime.now()
+        batch = []
+        for user in users:
+            batch.extend(self.generate_user_events(user, contents, events_per_user_range, reference_time))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def stream_batch_events(self, output_dir='data/raw', num_users=500, events_per_user_range=(15, 40),
+                            batch_size=100000, reference_time=None, num_contents=200):
+        """Generate data like generate_batch_events but stream events to NDJSON"""
+        contents = [self.generate_content() for _ in range(num_contents)]
+        users = [self.generate_user(self.generate_uuid(), user_key=i + 1) for i in range(num_users)]
+        save_to_ndjson([contents], f'{output_dir}/contents.ndjson')
+        save_to_ndjson([users], f'{output_dir}/users.ndjson')
+        batches = self.iter_batch_events(users, contents, events_per_user_range, batch_size, reference_time)
+        return save_to_ndjson(batches, f'{output_dir}/viewing_events.ndjson')
+
+    def init_incremental_state(self, state_dir='data/raw/incremental', num_users=500, num_contents=200,
+                               events_per_user_range=(15, 40), start_time=None):
+        """Create the persistent user/content universe for incremental runs
+
+        The watermark starts at start_time (default: now), so the first call
+        to generate_incremental() only covers events after it. Each user keeps
+        their own number of titles watched per 30 days, drawn from
+        events_per_user_range as in generate_batch_events.
+        """
+        os.makedirs(state_dir, exist_ok=True)
+        contents = [self.generate_content() for _ in range(num_contents)]
+        users = [self.generate_user(self.generate_uuid(), user_key=i + 1) for i in range(num_users)]
+        save_to_ndjson([contents], os.path.join(state_dir, 'contents.ndjson'))
+        save_to_ndjson([users], os.path.join(state_dir, 'users.ndjson'))
+        state = {
+            'seed': self.rng.getrandbits(64),
+            'run_id': self.run_id,
+            'watermark': (start_time or datetime.now()).isoformat(),
+            'next_event_sequence': self.event_ids.next_sequence,
+            'monthly_titles': [self.rng.randint(*events_per_user_range) for _ in users]
+        }
+        save_state(state, state_dir)
+        print(f"Initialized incremental state in {state_dir} with {len(users)} users, "
+              f"{len(contents)} content items, watermark {state['watermark']}")
+        return state
+
+    def generate_window_events(self, users, contents, monthly_titles, start, end):
+        """Yield viewing events with timestamps in (start, end], one user at a time
+
+        Each user watches a Poisson number of titles in proportion to the
+        window length, with 1-3 sessions per title, so the work scales with
+        the window rather than the whole history.
+        """
+        window_seconds = (end - start).total_seconds()
+        for user, titles_per_month in zip(users, monthly_titles):
+            num_titles = _poisson(self.rng, titles_per_month * window_seconds / (30 * 86400))
+            events = []
+            for content in self.rng.sample(contents, min(num_titles, len(contents))):
+                for _ in range(self.rng.randint(1, 3)):
+                    # Uniform in (start, end]: 1 - random() lies in (0, 1]
+                    offset = (1.0 - self.rng.random()) * window_seconds
+                    events.append(self.generate_viewing_event(content, user, start + timedelta(seconds=offset)))
+            yield events
+
+def _poisson(rng, lam):
+    """Draw from a Poisson distribution (Knuth's method, split for large means)"""
+    count = 0
+    while lam > 0:
+        step = min(lam, 30.0)
+        lam -= step
+        threshold, product = math.exp(-step), rng.random()
+        while product > threshold:
+            count += 1
+            product *= rng.random()
+    return count
+
+def load_state(state_dir):
+    """Load the incremental state and its persisted users and contents"""
+    with open(os.path.join(state_dir, 'state.json')) as f:
+        state = json.load(f)
+    universe = {}
+    for name in ('users', 'contents'):
+        with open(os.path.join(state_dir, f'{name}.ndjson')) as f:
+            universe[name] = [json.loads(line) for line in f if line.strip()]
+    return state, universe['users'], universe['contents']
+
+def save_state(state, state_dir):
+    """Atomically replace state.json so a failed run never advances the watermark"""
+    path = os.path.join(state_dir, 'state.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def generate_incremental(state_dir='data/raw/incremental', until=None, output_dir=None, batch_size=100000,
+                         compression=None):
+    """Generate only the events between the saved watermark and until
+
+    Events go to their own NDJSON file per window (.ndjson.gz/.ndjson.zst
+    with compression), and the watermark and event id sequence are saved
+    only after the file is complete. The window seed is derived from the
+    state seed and the window bounds, so rerunning a window reproduces it
+    exactly.
+    """
+    state, users, contents = load_state(state_dir)
+    start = datetime.fromisoformat(state['watermark'])
+    until = until or datetime.now()
+    if until <= start:
+        print(f"Nothing to generate: watermark {start.isoformat()} is not before {until.isoformat()}")
+        return None
+
+    simulator = NetflixDataSimulator(f"{state['seed']}:{start.isoformat()}:{until.isoformat()}",
+                                     run_id=state['run_id'])
+    simulator.event_ids = IdAllocator(state['run_id'], start=state['next_event_sequence'])
+
+    output_dir = output_dir or state_dir
+    os.makedirs(output_dir, exist_ok=True)
+    filename = ndjson_path(os.path.join(output_dir, f"viewing_events_{start:%Y%m%dT%H%M%S}_{until:%Y%m%dT%H%M%S}.ndjson"),
+                           compression)
+
+    def batches():
+        batch = []
+        for events in simulator.generate_window_events(users, contents, state['monthly_titles'], start, until):
+            batch.extend(events)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    stats = save_to_ndjson(batches(), filename, compression)
+    state['watermark'] = until.isoformat()
+    state['next_event_sequence'] = simulator.event_ids.next_sequence
+    save_state(state, state_dir)
+    print(f"Advanced watermark to {state['watermark']}")
+    stats['path'] = filename
+    return stats
+
+def _generate_shard(task):
+    """Generate one shard's users and their viewing events"""
+    seed, run_id, shard_id, contents, user_start, num_users, events_per_user_range, reference_time = task
+    simulator = NetflixDataSimulator(seed, run_id=run_id, shard_id=shard_id)
+    users = [simulator.generate_user(simulator.generate_uuid(), user_key=user_start + i + 1)
+             for i in range(num_users)]
+    events = []
+    for user in users:
+        events.extend(simulator.generate_user_events(user, contents, events_per_user_range, reference_time))
+    return users, events
+
 def save_to_json(data, filename):
     with open(filename, 'w') as f:
         json.dump(data, f, indent=2)
 
+def save_to_ndjson(batches, filename, compression=None):
+    """Stream batches of records to a newline-delimited JSON file"""
+    return write_ndjson(filename, batches, label=filename, compression=compression)
+
 if __name__ == "__main__":
-    simulator = NetflixDataSimulator()
-    
-    # Generate sample data with 500 users
-    data = simulator.generate_batch_events(500)
-    
-    # Save to different files for better organization
-    save_to_json(data['contents'], 'data/raw/contents.json')
-    save_to_json(data['users'], 'data/raw/users.json')
-    save_to_json(data['events'], 'data/raw/viewing_events.json')
-    
-    print(f"\nFiles saved in data/raw/ directory:")
-    print(f"- {len(data['contents'])} unique content items")
-    print(f"- {len(data['users'])} unique users")
-    print(f"- {len(data['events'])} viewing events")
+    parser = argparse.ArgumentParser(description="Simulate Netflix viewing data")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Generate only events after the saved watermark")
+    parser.add_argument('--init', action='store_true', help="Create the incremental state first")
+    parser.add_argument('--state-dir', default='data/raw/incremental')
+    parser.add_argument('--start', type=datetime.fromisoformat, help="Initial watermark (with --init)")
+    parser.add_argument('--until', type=datetime.fromisoformat, help="End of the window (default: now)")
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--contents', type=int, default=200)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--compression', choices=sorted(COMPRESSIONS),
+                        help="Compress incremental event files (.ndjson.gz/.ndjson.zst)")
+    args = parser.parse_args()
+
+    simulator = NetflixDataSimulator(args.seed)
+    if args.incremental:
+        if args.init or not os.path.exists(os.path.join(args.state_dir, 'state.json')):
+            simulator.init_incremental_state(args.state_dir, num_users=args.users, num_contents=args.contents,
+                                             start_time=args.start)
+        generate_incremental(args.state_dir, until=args.until, compression=args.compression)
+    else:
+        # Generate sample data with 500 users
+        data = simulator.generate_batch_events(args.users, num_contents=args.contents)
+
+        # Save to different files for better organization
+        save_to_json(data['contents'], 'data/raw/contents.json')
+        save_to_json(data['users'], 'data/raw/users.json')
+        save_to_json(data['events'], 'data/raw/viewing_events.json')
+
+        print(f"\nFiles saved in data/raw/ directory:")
+        print(f"- {len(data['contents'])} unique content items")
+        print(f"- {len(data['users'])} unique users")
+        print(f"- {len(data['events'])} viewing events")
@@ -1,11 +1,78 @@
+import argparse
 import random
+import string
 from datetime import datetime, timedelta
 import csv
 import json
+import numpy as np
+from stream_io import ProgressReporter
+
+FIELDNAMES = ['show_id', 'type', 'title', 'director', 'cast', 'country',
+              'date_added', 'release_year', 'rating', 'duration',
+              'listed_in', 'description']
+
+def _needs_quote(value):
+    """True if csv.writer's default QUOTE_MINIMAL dialect would quote value"""
+    return ',' in value or '"' in value or '\n' in value or '\r' in value
+
+def _quote_where(text, mask):
+    """Wrap the masked entries of an object array of escaped strings in quotes"""
+    text[mask] = '"' + text[mask] + '"'
+    return text
+
+class Choices:
+    """A list of values in their CSV-escaped forms, sampled by index"""
+
+    def __init__(self, values):
+        self.escaped = np.array([v.replace('"', '""') for v in values], dtype=object)
+        self.special = np.array([_needs_quote(v) for v in values], dtype=bool)
+
+    def __len__(self):
+        return len(self.escaped)
+
+    def take(self, idx):
+        """Values at idx, ready to drop into a CSV row"""
+        return _quote_where(self.escaped[idx], self.special[idx])
+
+def _join_samples(rng, choices, counts, sep=", "):
+    """Join a random sample of counts[i] distinct values for every row
+
+    A row's sample is the first counts[i] entries of a random permutation,
+    taken from an argsort of a random matrix. Rows with the same count are
+    joined column by column, two values at a time from a table of every
+    pre-joined ordered pair.
+    """
+    m = len(choices)
+    values = choices.escaped
+    pairs = (values[:, None] + sep + values[None, :]).ravel()
+    picks = np.argsort(rng.random((len(counts), m)), axis=1)
+    joined = np.empty(len(counts), dtype=object)
+    special = np.zeros(len(counts), dtype=bool)
+    for count in np.unique(counts):
+        rows = np.flatnonzero(counts == count)
+        rows_picks = picks[rows, :count]
+        if count == 1:
+            text = values[rows_picks[:, 0]]
+        else:
+            text = pairs[rows_picks[:, 0] * m + rows_picks[:, 1]]
+        for j in range(2, count - 1, 2):
+            text = text + sep + pairs[rows_picks[:, j] * m + rows_picks[:, j + 1]]
+        if count > 1 and count % 2:
+            text = text + sep + values[rows_picks[:, -1]]
+        joined[rows] = text
+        special[rows] = choices.special[rows_picks].any(axis=1) | (count > 1 and _needs_quote(sep))
+    return _quote_where(joined, special)
+
+def columns_to_csv(columns):
+    """Join columns from generate_columns into CSV rows, matching csv.writer's default dialect"""
+    fields = [columns[name] if name != 'release_year' else list(map(str, columns[name]))
+              for name in FIELDNAMES]
+    return ''.join([','.join(row) + '\r\n' for row in zip(*fields)])
 
 class EnhancedNetflixSimulator:
-    def __init__(self):
+    def __init__(self, seed=None):
         self.show_id_counter = 1
+        self.np_rng = np.random.default_rng(seed)
         
         self.content_types = ['Movie', 'TV Show']
         self.content_weights = [0.7, 0.3]  # 70% movies, 30% TV shows
@@ -109,6 +176,37 @@ class EnhancedNetflixSimulator:
             "overcome incredible obstacles"
         ]
 
+        self._compile_lookups()
+
+    def _compile_lookups(self):
+        """Precompute the lookup tables and template pieces used by batched generation"""
+        start_date = datetime(2020, 1, 1)
+        num_days = (datetime(2023, 12, 31) - start_date).days + 1
+        self.date_choices = Choices([(start_date + timedelta(days=d)).strftime("%B %d, %Y")
+                                     for d in range(num_days)])
+        self.movie_durations = Choices([f"{m} min" for m in range(75, 181)])
+        self.show_durations = Choices([f"{s} Seasons" for s in range(1, 9)])
+        self.type_choices = Choices(self.content_types)
+        self.rating_choices = {t: Choices(r) for t, r in self.ratings.items()}
+        self.director_choices = Choices(self.directors + [""])
+        self.country_choices = Choices(self.countries)
+        self.actor_choices = Choices(self.actors)
+        self.genre_choices = Choices(self.genres)
+        self.template_values = {
+            'genre': Choices([g.lower() for g in self.genres]),
+            'type': Choices([t.lower() for t in self.content_types]),
+            'plot_point': Choices(self.plot_points),
+            'consequence': Choices(self.actions),
+            'adjective': Choices(self.adjectives),
+            'theme': Choices(self.themes),
+            'setting': Choices(self.settings),
+            'character_desc': Choices(self.character_descriptions),
+            'action': Choices(self.actions)
+        }
+        # Each template becomes (literal, field) pieces so rows can be assembled a column at a time
+        self.template_pieces = [[(literal, field) for literal, field, _, _ in string.Formatter().parse(t)]
+                                for t in self.description_templates]
+
     def generate_show_id(self):
         show_id = f"s{self.show_id_counter}"
         self.show_id_counter += 1
@@ -176,18 +274,106 @@ class EnhancedNetflixSimulator:
             dataset.append(self.generate_entry())
         return dataset
 
+    def generate_descriptions(self, num_entries):
+        """Fill a random template for every row using the precompiled pieces"""
+        rng = self.np_rng
+        template_idx = rng.integers(0, len(self.template_pieces), num_entries)
+        descriptions = np.empty(num_entries, dtype=object)
+        special = np.zeros(num_entries, dtype=bool)
+        for t, pieces in enumerate(self.template_pieces):
+            rows = np.flatnonzero(template_idx == t)
+            text = np.full(len(rows), "", dtype=object)
+            row_special = np.zeros(len(rows), dtype=bool)
+            for literal, field in pieces:
+                if literal:
+                    text = text + literal.replace('"', '""')
+                    row_special |= _needs_quote(literal)
+                if field is not None:
+                    choices = self.template_values[field]
+                    idx = rng.integers(0, len(choices), len(rows))
+                    text = text + choices.escaped[idx]
+                    row_special |= choices.special[idx]
+            descriptions[rows] = text
+            special[rows] = row_special
+        return _quote_where(descriptions, special)
+
+    def generate_columns(self, num_entries):
+        """Generate num_entries rows as a dict of columns keyed by CSV field name
+
+        Same fields and distributions as generate_entry, but each column is
+        sampled for the whole batch at once. String values come back already
+        CSV-quoted, ready for columns_to_csv.
+        """
+        rng = self.np_rng
+        n = num_entries
+        ids = range(self.show_id_counter, self.show_id_counter + n)
+        self.show_id_counter += n
+
+        is_movie = rng.random(n) < self.content_weights[0]
+        types = self.type_choices.take(np.where(is_movie, 0, 1))
+
+        movie_ratings, show_ratings = self.rating_choices['Movie'], self.rating_choices['TV Show']
+        ratings = np.where(is_movie,
+                           movie_ratings.take(rng.integers(0, len(movie_ratings), n)),
+                           show_ratings.take(rng.integers(0, len(show_ratings), n)))
+        durations = np.where(is_movie,
+                             self.movie_durations.take(rng.integers(0, len(self.movie_durations), n)),
+                             self.show_durations.take(rng.integers(0, len(self.show_durations), n)))
+
+        director_idx = rng.integers(0, len(self.directors), n)
+        director_idx[rng.random(n) <= 0.2] = len(self.directors)
+
+        return {
+            'show_id': [f"s{i}" for i in ids],
+            'type': types.tolist(),
+            # Matches generate_entry, where the title uses the already-advanced counter
+            'title': [f"Sample Title {i + 1}" for i in ids],
+            'director': self.director_choices.take(director_idx).tolist(),
+            'cast': _join_samples(rng, self.actor_choices, rng.integers(3, 9, n)).tolist(),
+            'country': self.country_choices.take(rng.integers(0, len(self.countries), n)).tolist(),
+            'date_added': self.date_choices.take(rng.integers(0, len(self.date_choices), n)).tolist(),
+            'release_year': rng.integers(2015, 2024, n).tolist(),
+            'rating': ratings.tolist(),
+            'duration': durations.tolist(),
+            'listed_in': _join_samples(rng, self.genre_choices, rng.integers(1, 4, n)).tolist(),
+            'description': self.generate_descriptions(n).tolist()
+        }
+
+    def iter_column_chunks(self, num_entries, chunk_size=100000):
+        """Yield the dataset as column dicts of at most chunk_size rows"""
+        for start in range(0, num_entries, chunk_size):
+            yield self.generate_columns(min(chunk_size, num_entries - start))
+
     def save_to_csv(self, dataset, filename='netflix_titles.csv'):
-        fieldnames = ['show_id', 'type', 'title', 'director', 'cast', 'country',
-                     'date_added', 'release_year', 'rating', 'duration',
-                     'listed_in', 'description']
-        
         with open(filename, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
             writer.writeheader()
             writer.writerows(dataset)
 
+    def save_to_csv_streaming(self, num_entries, filename='netflix_titles.csv', chunk_size=100000):
+        """Generate and write num_entries rows chunk by chunk, keeping memory flat"""
+        progress = ProgressReporter(filename, total=num_entries)
+        with open(filename, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(FIELDNAMES)
+            for columns in self.iter_column_chunks(num_entries, chunk_size):
+                chunk = columns_to_csv(columns)
+                f.write(chunk)
+                progress.update(len(columns['show_id']), len(chunk))
+        return progress.finish()
+
 if __name__ == "__main__":
-    simulator = EnhancedNetflixSimulator()
-    dataset = simulator.generate_dataset(3000)
-    simulator.save_to_csv(dataset)
-    print(f"Generated 3000 entries and saved to netflix_titles.csv")
+    parser = argparse.ArgumentParser(description="Generate a synthetic Netflix titles catalog")
+    parser.add_argument('--entries', type=int, default=3000)
+    parser.add_argument('--output', default='netflix_titles.csv')
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--row-by-row', action='store_true',
+                        help="Use the original one-row-at-a-time generator")
+    args = parser.parse_args()
+
+    simulator = EnhancedNetflixSimulator(seed=args.seed)
+    if args.row_by_row:
+        simulator.save_to_csv(simulator.generate_dataset(args.entries), args.output)
+    else:
+        simulator.save_to_csv_streaming(args.entries, args.output, args.chunk_size)
+    print(f"Generated {args.entries} entries and saved to {args.output}")
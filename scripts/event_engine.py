@@ -0,0 +1,465 @@
+"""Vectorized NumPy engine for simulated viewing events.
+
+Instead of building events one at a time, whole columns (devices, connections,
+quality tiers, engagement multipliers, timestamps, ...) are drawn at once.
+The conditional distributions match the per-event loop in
+process_streaming_data.py, which shares the constants defined here.
+"""
+import gc
+import json
+import numpy as np
+from id_allocation import IdAllocator, MAX_RUN_ID, format_id
+from columnar import ColumnarTable, Categorical, HexIds, EVENT_FIELDS
+
+DEVICE_TYPES = ["smart_tv", "mobile", "tablet", "gaming_console", "desktop", "streaming_stick"]
+EVENT_TYPES = ["start", "pause", "resume", "complete", "exit", "seek_forward", "seek_backward"]
+CONNECTION_TYPES = ["wifi", "ethernet", "4G", "5G", "3G"]
+PLAYBACK_QUALITIES = ["SD", "HD", "FHD", "4K"]
+ALGORITHM_TYPES = ["content_based", "collaborative_filtering", "hybrid", "trending", "personalized"]
+RECOMMENDATION_CATEGORIES = ["trending", "because_you_watched", "new_releases", "top_picks", "similar_content"]
+RATINGS_GIVEN = [None, 1, 2, 3, 4, 5]
+
+# Device weights depend on the subscription: premium and family plans favour smart TVs
+PREMIUM_SUBSCRIPTIONS = ("premium", "family")
+DEVICE_WEIGHTS = {
+    "premium": [3, 1, 1, 2, 2, 2],
+    "other": [2, 2, 2, 1, 2, 1]
+}
+
+# Connection weights depend on the device: smart TVs and desktops prefer wifi/ethernet
+FIXED_LINE_DEVICES = ("smart_tv", "desktop")
+CONNECTION_WEIGHTS = {
+    "fixed_line": [5, 3, 0, 1, 0],
+    "other": [3, 0, 2, 2, 1]
+}
+
+# Quality tiers, from best to worst: (low, high) bounds for each quality metric.
+# Tier 0: ethernet/5G on a premium or family plan
+# Tier 1: 4G or a standard plan
+# Tier 2: everything else
+FAST_CONNECTIONS = ("ethernet", "5G")
+QUALITY_TIERS = [
+    {"buffering_events": (0, 2), "bandwidth_mbps": (80, 200),
+     "frames_dropped_ratio": (0.001, 0.005), "startup_time_seconds": (0.5, 2.0)},
+    {"buffering_events": (1, 4), "bandwidth_mbps": (15, 45),
+     "frames_dropped_ratio": (0.002, 0.008), "startup_time_seconds": (1.5, 3.0)},
+    {"buffering_events": (2, 7), "bandwidth_mbps": (5, 15),
+     "frames_dropped_ratio": (0.005, 0.015), "startup_time_seconds": (2.5, 4.0)}
+]
+
+# Engagement multipliers applied when the content matches the user's preferences
+GENRE_MATCH_BOOST = {"engagement_score": 1.2, "completion_rate": 1.15}
+LANGUAGE_MATCH_BOOST = {"engagement_score": 1.1, "completion_rate": 1.1}
+PREMIUM_ENGAGEMENT_BOOST = 1.1
+
+# Events are spread over 61 days (0-60) starting at this date, at minute resolution
+EVENT_START_DATE = np.datetime64("2024-01-01T00:00", "m")
+EVENT_WINDOW_MINUTES = 61 * 24 * 60
+
+
+def _cumulative_weights(weight_rows):
+    """Turn rows of weights into normalized cumulative distributions"""
+    cdf = np.cumsum(np.asarray(weight_rows, dtype=np.float64), axis=1)
+    return cdf / cdf[:, -1:]
+
+
+_DEVICE_CDF = _cumulative_weights([DEVICE_WEIGHTS["other"], DEVICE_WEIGHTS["premium"]])
+_CONNECTION_CDF = _cumulative_weights([CONNECTION_WEIGHTS["other"], CONNECTION_WEIGHTS["fixed_line"]])
+_FIXED_LINE_CODES = np.array([DEVICE_TYPES.index(d) for d in FIXED_LINE_DEVICES])
+_FAST_CONNECTION_CODES = np.array([CONNECTION_TYPES.index(c) for c in FAST_CONNECTIONS])
+_CONNECTION_4G = CONNECTION_TYPES.index("4G")
+
+
+def _tier_bounds(metric):
+    """Return (low, high) arrays indexed by quality tier for a metric"""
+    bounds = np.array([tier[metric] for tier in QUALITY_TIERS])
+    return bounds[:, 0], bounds[:, 1]
+
+
+def _choice_by_group(rng, groups, cdf):
+    """Draw one category per row from the cumulative distribution of its group"""
+    u = rng.random(len(groups))
+    return (u[:, None] >= cdf[groups]).sum(axis=1)
+
+
+def encode_catalog(contents_data, users_data):
+    """Encode contents and users as integer arrays used by the engine"""
+    genres = sorted({c["genre"] for c in contents_data}.union(
+        *(u["preferred_genres"] for u in users_data)))
+    languages = sorted({c["language"] for c in contents_data}.union(
+        *(u["preferred_languages"] for u in users_data)))
+    genre_codes = {g: i for i, g in enumerate(genres)}
+    language_codes = {l: i for i, l in enumerate(languages)}
+
+    content_genre = np.array([genre_codes[c["genre"]] for c in contents_data], dtype=np.int32)
+    content_language = np.array([language_codes[c["language"]] for c in contents_data], dtype=np.int32)
+
+    user_genre = np.zeros((len(users_data), len(genres)), dtype=bool)
+    user_language = np.zeros((len(users_data), len(languages)), dtype=bool)
+    for i, user in enumerate(users_data):
+        user_genre[i, [genre_codes[g] for g in user["preferred_genres"]]] = True
+        user_language[i, [language_codes[l] for l in user["preferred_languages"]]] = True
+
+    subscriptions = [u["subscription_type"] for u in users_data]
+    user_premium = np.array([s in PREMIUM_SUBSCRIPTIONS for s in subscriptions])
+    user_standard = np.array([s == "standard" for s in subscriptions])
+
+    # Users sharing the same preferences share one candidate profile
+    profiles, user_profile = np.unique(
+        np.concatenate([user_genre, user_language], axis=1), axis=0, return_inverse=True)
+    candidate_index = build_candidate_index(
+        content_genre, content_language,
+        profiles[:, :len(genres)], profiles[:, len(genres):])
+
+    # Integer surrogate keys carried alongside the string ids
+    user_key = np.array([u.get("user_key", i + 1) for i, u in enumerate(users_data)], dtype=np.int64)
+    content_key = np.array([c.get("content_key", i + 1) for i, c in enumerate(contents_data)], dtype=np.int64)
+
+    return {
+        "num_users": len(users_data),
+        "num_contents": len(contents_data),
+        "user_key": user_key,
+        "content_key": content_key,
+        "content_genre": content_genre,
+        "content_language": content_language,
+        "user_genre": user_genre,
+        "user_language": user_language,
+        "user_premium": user_premium,
+        "user_standard": user_standard,
+        "user_profile": user_profile.reshape(-1),
+        "candidate_index": candidate_index
+    }
+
+
+def build_candidate_index(content_genre, content_language, profile_genre, profile_language):
+    """Index candidate content by (genre, language) key for each preference profile.
+
+    Contents are grouped into disjoint (genre, language) buckets. A profile's
+    candidates are the buckets whose genre or language it prefers, stored as
+    the bucket ids and their cumulative sizes. Its size therefore depends on
+    the number of keys, not on the catalog size, and picking a candidate
+    is a lookup instead of a catalog scan.
+    """
+    num_languages = profile_language.shape[1]
+    num_keys = profile_genre.shape[1] * num_languages
+    content_key = content_genre.astype(np.int64) * num_languages + content_language
+
+    # Contents sorted by key, so each bucket is a contiguous slice
+    sorted_contents = np.argsort(content_key, kind="stable").astype(np.int32)
+    bucket_size = np.bincount(content_key, minlength=num_keys)
+    bucket_start = np.concatenate(([0], np.cumsum(bucket_size)[:-1]))
+
+    # Keys each profile matches on genre or language, skipping empty buckets
+    key_genre = np.arange(num_keys) // num_languages
+    key_language = np.arange(num_keys) % num_languages
+    matched = (profile_genre[:, key_genre] | profile_language[:, key_language]) & (bucket_size > 0)
+
+    # Pack matched bucket ids to the left, padding with zero-sized slots
+    slots = max(int(matched.sum(axis=1).max(initial=0)), 1)
+    order = np.argsort(~matched, axis=1, kind="stable")[:, :slots]
+    profile_buckets = np.take_along_axis(np.broadcast_to(np.arange(num_keys), matched.shape), order, axis=1)
+    sizes = np.where(np.take_along_axis(matched, order, axis=1), bucket_size[profile_buckets], 0)
+    profile_cumsum = np.cumsum(sizes, axis=1)
+
+    # Offset each profile row so one searchsorted call covers every profile
+    stride = len(content_key) + 1
+    search_keys = (profile_cumsum + (np.arange(len(profile_cumsum)) * stride)[:, None]).ravel()
+
+    return {
+        "sorted_contents": sorted_contents,
+        "bucket_start": bucket_start,
+        "profile_buckets": profile_buckets,
+        "profile_cumsum": profile_cumsum,
+        "profile_totals": profile_cumsum[:, -1],
+        "search_keys": search_keys,
+        "stride": stride
+    }
+
+
+def select_content(rng, catalog, user_idx):
+    """Pick a content uniformly among each user's candidates (whole catalog if none)"""
+    index = catalog["candidate_index"]
+    profile = catalog["user_profile"][user_idx]
+    totals = index["profile_totals"][profile]
+    draws = rng.random(len(user_idx))
+    content_idx = (draws * catalog["num_contents"]).astype(np.int64)
+
+    has_candidates = totals > 0
+    profile = profile[has_candidates]
+    rank = (draws[has_candidates] * totals[has_candidates]).astype(np.int64)
+
+    # Locate the bucket holding the rank-th candidate, then the content within it
+    slots = index["profile_cumsum"].shape[1]
+    position = np.searchsorted(index["search_keys"], profile * index["stride"] + rank, side="right")
+    slot = position - profile * slots
+    bucket = index["profile_buckets"][profile, slot]
+    preceding = np.where(slot > 0, index["profile_cumsum"][profile, np.maximum(slot - 1, 0)], 0)
+    content_idx[has_candidates] = index["sorted_contents"][index["bucket_start"][bucket] + rank - preceding]
+    return content_idx
+
+
+def generate_event_columns(rng, catalog, num_events, event_ids=None, session_ids=None):
+    """Generate num_events viewing events as a dict of NumPy columns.
+
+    Categorical fields hold integer codes into the module-level lists above,
+    user_idx/content_idx index into the users and contents used to build the
+    catalog, and timestamp is a datetime64[m] array. event_ids and
+    session_ids are IdAllocators; pass the same ones to every batch of a run
+    so ids stay unique across batches.
+    """
+    n = num_events
+    if event_ids is None or session_ids is None:
+        run_id = int(rng.integers(0, MAX_RUN_ID + 1))
+        event_ids = event_ids or IdAllocator(run_id)
+        session_ids = session_ids or IdAllocator(run_id)
+    user_idx = rng.integers(0, catalog["num_users"], n)
+    content_idx = select_content(rng, catalog, user_idx)
+    premium = catalog["user_premium"][user_idx]
+    standard = catalog["user_standard"][user_idx]
+
+    device_type = _choice_by_group(rng, premium.astype(np.int64), _DEVICE_CDF)
+    fixed_line = np.isin(device_type, _FIXED_LINE_CODES)
+    connection_type = _choice_by_group(rng, fixed_line.astype(np.int64), _CONNECTION_CDF)
+
+    fast = np.isin(connection_type, _FAST_CONNECTION_CODES)
+    tier = np.where(fast & premium, 0,
+                    np.where((connection_type == _CONNECTION_4G) | standard, 1, 2))
+
+    low, high = _tier_bounds("buffering_events")
+    buffering_events = rng.integers(low[tier], high[tier] + 1)
+    tiered = {}
+    for metric in ("bandwidth_mbps", "frames_dropped_ratio", "startup_time_seconds"):
+        low, high = _tier_bounds(metric)
+        tiered[metric] = rng.uniform(low[tier], high[tier])
+
+    # Engagement boosts for genre/language matches and premium plans
+    genre_match = catalog["user_genre"][user_idx, catalog["content_genre"][content_idx]]
+    language_match = catalog["user_language"][user_idx, catalog["content_language"][content_idx]]
+    completion = rng.uniform(0.1, 1.0, n)
+    engagement = rng.uniform(0.1, 0.95, n)
+    engagement *= np.where(genre_match, GENRE_MATCH_BOOST["engagement_score"], 1.0)
+    completion *= np.where(genre_match, GENRE_MATCH_BOOST["completion_rate"], 1.0)
+    engagement *= np.where(language_match, LANGUAGE_MATCH_BOOST["engagement_score"], 1.0)
+    completion *= np.where(language_match, LANGUAGE_MATCH_BOOST["completion_rate"], 1.0)
+    engagement *= np.where(premium, PREMIUM_ENGAGEMENT_BOOST, 1.0)
+
+    timestamp = EVENT_START_DATE + rng.integers(0, EVENT_WINDOW_MINUTES, n).astype("timedelta64[m]")
+
+    return {
+        "event_id": event_ids.allocate(n),
+        "timestamp": timestamp,
+        "event_type": rng.integers(0, len(EVENT_TYPES), n),
+        "content_idx": content_idx,
+        "content_key": catalog["content_key"][content_idx],
+        "user_idx": user_idx,
+        "user_key": catalog["user_key"][user_idx],
+        "device_type": device_type,
+        "watch_duration_seconds": rng.integers(300, 7201, n),
+        "session_id": session_ids.allocate(n),
+        "buffering_events": buffering_events,
+        "average_bitrate": rng.integers(2000, 8001, n),
+        "playback_quality": rng.integers(0, len(PLAYBACK_QUALITIES), n),
+        "connection_type": connection_type,
+        "bandwidth_mbps": tiered["bandwidth_mbps"],
+        "startup_time_seconds": tiered["startup_time_seconds"],
+        "frames_dropped_ratio": tiered["frames_dropped_ratio"],
+        "audio_quality_score": rng.uniform(0.8, 1.0, n),
+        "rewind_count": rng.integers(0, 6, n),
+        "forward_count": rng.integers(0, 6, n),
+        "pause_count": rng.integers(0, 9, n),
+        "quality_changes": rng.integers(0, 4, n),
+        "subtitle_changes": rng.integers(0, 3, n),
+        "volume_changes": rng.integers(0, 6, n),
+        "algorithm_type": rng.integers(0, len(ALGORITHM_TYPES), n),
+        "recommendation_score": rng.uniform(0.1, 1.0, n),
+        "position_in_list": rng.integers(1, 21, n),
+        "recommendation_category": rng.integers(0, len(RECOMMENDATION_CATEGORIES), n),
+        "completion_rate": np.minimum(completion, 1.0),
+        "engagement_score": np.minimum(engagement, 1.0),
+        "social_sharing": rng.random(n) < 0.5,
+        "rating_given": rng.integers(0, len(RATINGS_GIVEN), n)
+    }
+
+
+def _decode(codes, values, as_json=False):
+    """Map integer codes back to their values as a Python list
+
+    With as_json, the values are JSON-encoded once per category instead of
+    once per row.
+    """
+    if as_json:
+        values = [json.dumps(v) for v in values]
+    return np.array(values, dtype=object)[codes].tolist()
+
+
+def _column_values(columns, users_data, contents_data, as_json=False):
+    """Decode engine columns into per-field value lists, in record field order"""
+    def decode(name, values):
+        return _decode(columns[name], values, as_json)
+
+    timestamps = np.datetime_as_string(columns["timestamp"], unit="s")
+    return [
+        columns["event_id"].tolist(),
+        [json.dumps(t) for t in timestamps.tolist()] if as_json else timestamps.tolist(),
+        decode("event_type", EVENT_TYPES),
+        decode("content_idx", [c["content_id"] for c in contents_data]),
+        columns["content_key"].tolist(),
+        decode("user_idx", [u["user_id"] for u in users_data]),
+        columns["user_key"].tolist(),
+        decode("device_type", DEVICE_TYPES),
+        columns["watch_duration_seconds"].tolist(), columns["session_id"].tolist(),
+        columns["buffering_events"].tolist(), columns["average_bitrate"].tolist(),
+        decode("playback_quality", PLAYBACK_QUALITIES),
+        decode("connection_type", CONNECTION_TYPES),
+        columns["bandwidth_mbps"].tolist(), columns["startup_time_seconds"].tolist(),
+        columns["frames_dropped_ratio"].tolist(), columns["audio_quality_score"].tolist(),
+        columns["rewind_count"].tolist(), columns["forward_count"].tolist(),
+        columns["pause_count"].tolist(), columns["quality_changes"].tolist(),
+        columns["subtitle_changes"].tolist(), columns["volume_changes"].tolist(),
+        decode("algorithm_type", ALGORITHM_TYPES),
+        columns["recommendation_score"].tolist(), columns["position_in_list"].tolist(),
+        decode("recommendation_category", RECOMMENDATION_CATEGORIES),
+        columns["completion_rate"].tolist(), columns["engagement_score"].tolist(),
+        _decode(columns["social_sharing"].astype(np.int8), [False, True], as_json),
+        decode("rating_given", RATINGS_GIVEN)
+    ]
+
+
+# One compact NDJSON line per event, in the same field order as the records.
+# %s slots take pre-encoded JSON values, %r and %016x slots take Python numbers.
+_NDJSON_LINE = (
+    '{"event_id":"evt-%016x","timestamp":%s,"event_type":%s,"content_id":%s,"content_key":%r,'
+    '"user_id":%s,"user_key":%r,"device_type":%s,"watch_duration_seconds":%r,"session_id":"sess-%016x",'
+    '"quality_metrics":{"buffering_events":%r,"average_bitrate":%r,"playback_quality":%s,'
+    '"connection_type":%s,"bandwidth_mbps":%r,"startup_time_seconds":%r,'
+    '"frames_dropped_ratio":%r,"audio_quality_score":%r},'
+    '"user_interaction":{"rewind_count":%r,"forward_count":%r,"pause_count":%r,'
+    '"quality_changes":%r,"subtitle_changes":%r,"volume_changes":%r},'
+    '"recommendation_data":{"algorithm_type":%s,"recommendation_score":%r,'
+    '"position_in_list":%r,"recommendation_category":%s},'
+    '"engagement_signals":{"completion_rate":%r,"engagement_score":%r,'
+    '"social_sharing":%s,"rating_given":%s}}\n'
+)
+
+
+def event_columns_to_ndjson(columns, users_data, contents_data):
+    """Format engine columns straight into compact NDJSON bytes.
+
+    Produces the same output as JSON-encoding event_columns_to_records, but
+    without building the intermediate dicts.
+    """
+    rows = zip(*_column_values(columns, users_data, contents_data, as_json=True))
+    return "".join([_NDJSON_LINE % row for row in rows]).encode("utf-8")
+
+
+def event_columns_to_table(columns, users_data, contents_data):
+    """Wrap engine columns in a ColumnarTable without building any records"""
+    def categorical(name, categories):
+        return Categorical(columns[name].astype(np.int8), categories)
+
+    rating = columns["rating_given"]
+    table_columns = {
+        "event_id": HexIds(columns["event_id"], "evt"),
+        "timestamp": columns["timestamp"].astype("datetime64[us]"),
+        "event_type": categorical("event_type", EVENT_TYPES),
+        "content_id": Categorical(columns["content_idx"].astype(np.int32),
+                                  [c["content_id"] for c in contents_data]),
+        "content_key": columns["content_key"],
+        "user_id": Categorical(columns["user_idx"].astype(np.int32),
+                               [u["user_id"] for u in users_data]),
+        "user_key": columns["user_key"],
+        "device_type": categorical("device_type", DEVICE_TYPES),
+        "watch_duration_seconds": columns["watch_duration_seconds"].astype(np.int32),
+        "session_id": HexIds(columns["session_id"], "sess"),
+        "quality_metrics.buffering_events": columns["buffering_events"].astype(np.int16),
+        "quality_metrics.average_bitrate": columns["average_bitrate"].astype(np.int32),
+        "quality_metrics.playback_quality": categorical("playback_quality", PLAYBACK_QUALITIES),
+        "quality_metrics.connection_type": categorical("connection_type", CONNECTION_TYPES),
+        "quality_metrics.bandwidth_mbps": columns["bandwidth_mbps"],
+        "quality_metrics.startup_time_seconds": columns["startup_time_seconds"],
+        "quality_metrics.frames_dropped_ratio": columns["frames_dropped_ratio"],
+        "quality_metrics.audio_quality_score": columns["audio_quality_score"],
+        "recommendation_data.algorithm_type": categorical("algorithm_type", ALGORITHM_TYPES),
+        "recommendation_data.recommendation_score": columns["recommendation_score"],
+        "recommendation_data.position_in_list": columns["position_in_list"].astype(np.int16),
+        "recommendation_data.recommendation_category": categorical(
+            "recommendation_category", RECOMMENDATION_CATEGORIES),
+        "engagement_signals.completion_rate": columns["completion_rate"],
+        "engagement_signals.engagement_score": columns["engagement_score"],
+        "engagement_signals.social_sharing": columns["social_sharing"],
+        # Code 0 stands for "no rating", which the table stores as -1
+        "engagement_signals.rating_given": np.where(rating == 0, -1, rating).astype(np.int8)
+    }
+    for name in ("rewind_count", "forward_count", "pause_count",
+                 "quality_changes", "subtitle_changes", "volume_changes"):
+        table_columns[f"user_interaction.{name}"] = columns[name].astype(np.int16)
+
+    return ColumnarTable(EVENT_FIELDS, table_columns, len(columns["event_id"]))
+
+
+def event_columns_to_records(columns, users_data, contents_data):
+    """Convert engine columns into the nested event dicts used by the JSON files"""
+    rows = zip(*_column_values(columns, users_data, contents_data))
+
+    # Millions of small dicts would otherwise trigger repeated full GC passes
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _build_records(rows)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def _build_records(rows):
+    """Assemble nested event dicts from zipped column values"""
+    return [
+        {
+            "event_id": format_id("evt", event_id),
+            "timestamp": timestamp,
+            "event_type": event_type,
+            "content_id": content_id,
+            "content_key": content_key,
+            "user_id": user_id,
+            "user_key": user_key,
+            "device_type": device_type,
+            "watch_duration_seconds": watch_duration,
+            "session_id": format_id("sess", session_id),
+            "quality_metrics": {
+                "buffering_events": buffering,
+                "average_bitrate": bitrate,
+                "playback_quality": playback_quality,
+                "connection_type": connection,
+                "bandwidth_mbps": bandwidth,
+                "startup_time_seconds": startup_time,
+                "frames_dropped_ratio": frames_dropped,
+                "audio_quality_score": audio_quality
+            },
+            "user_interaction": {
+                "rewind_count": rewind,
+                "forward_count": forward,
+                "pause_count": pause,
+                "quality_changes": quality_changes,
+                "subtitle_changes": subtitle_changes,
+                "volume_changes": volume_changes
+            },
+            "recommendation_data": {
+                "algorithm_type": algorithm,
+                "recommendation_score": rec_score,
+                "position_in_list": position,
+                "recommendation_category": category
+            },
+            "engagement_signals": {
+                "completion_rate": completion,
+                "engagement_score": engagement,
+                "social_sharing": sharing,
+                "rating_given": rating
+            }
+        }
+        for (event_id, timestamp, event_type, content_id, content_key, user_id, user_key, device_type,
+             watch_duration, session_id, buffering, bitrate, playback_quality, connection,
+             bandwidth, startup_time, frames_dropped, audio_quality,
+             rewind, forward, pause, quality_changes, subtitle_changes, volume_changes,
+             algorithm, rec_score, position, category,
+             completion, engagement, sharing, rating) in rows
+    ]
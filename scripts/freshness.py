@@ -0,0 +1,102 @@
+"""Refresh bookkeeping for the tables derived from viewing_events.
+
+viewing_events_wide (wide_events.py) and the daily summary tables
+(summary_tables.py) are refreshed incrementally: only the days whose
+viewing_events partitions changed since the table's last refresh, or that
+were dropped from viewing_events, are merged. Each refresh is recorded in
+summary_freshness (refreshed_at, mode, days, rows, data_through), one row
+per refreshed table, and the next refresh of that table starts from its
+refreshed_at.
+"""
+from datetime import datetime
+from google.cloud import bigquery
+from query_backend import is_local
+from setup_bigquery import migrate_table
+
+FRESHNESS_TABLE = 'summary_freshness'
+
+def changed_event_days(client, dataset_id, since):
+    """Days (dates) whose viewing_events partition was modified after since
+
+    Returns None if a partition without a date (NULL or unpartitioned rows)
+    changed, since then only a full refresh is safe.
+    """
+    query = f"""
+    SELECT partition_id
+    FROM `{dataset_id}.INFORMATION_SCHEMA.PARTITIONS`
+    WHERE table_name = 'viewing_events' AND last_modified_time > @since
+    """
+    job_config = bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ScalarQueryParameter('since', 'TIMESTAMP', since)
+    ])
+    return partition_days(client.query(query, job_config=job_config).result())
+
+def vanished_event_days(client, dataset_id, table_name):
+    """Days (dates) table_name has rows for whose viewing_events partition is gone
+
+    A truncating or date-limited load, --recreate or a recreating migration
+    drops days from viewing_events without modifying any remaining
+    partition, so changed_event_days never reports them; merging them
+    deletes their rows. Both tables must be partitioned by day. Returns None
+    if such a partition has no date.
+    """
+    query = f"""
+    SELECT partition_id
+    FROM `{dataset_id}.INFORMATION_SCHEMA.PARTITIONS`
+    WHERE table_name = @table_name AND total_rows > 0
+    EXCEPT DISTINCT
+    SELECT partition_id
+    FROM `{dataset_id}.INFORMATION_SCHEMA.PARTITIONS`
+    WHERE table_name = 'viewing_events' AND total_rows > 0
+    """
+    job_config = bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ScalarQueryParameter('table_name', 'STRING', table_name)
+    ])
+    return partition_days(client.query(query, job_config=job_config).result())
+
+def partition_days(rows):
+    """Sorted dates of INFORMATION_SCHEMA.PARTITIONS rows, or None if one is not a day partition"""
+    days = []
+    for row in rows:
+        if not row.partition_id.isdigit():
+            return None
+        days.append(datetime.strptime(row.partition_id, '%Y%m%d').date())
+    return sorted(days)
+
+def ensure_freshness_table(client, dataset_id, schemas):
+    if is_local(client):
+        client.create_table(FRESHNESS_TABLE, schemas[f'{FRESHNESS_TABLE}_schema'], replace=False)
+    else:
+        migrate_table(client, f"{dataset_id}.{FRESHNESS_TABLE}", schemas[f'{FRESHNESS_TABLE}_schema'],
+                      schemas.get('table_options', {}).get(FRESHNESS_TABLE, {}))
+
+def read_freshness(client, dataset_id):
+    """{table name: its last summary_freshness row}"""
+    rows = client.query(f"SELECT * FROM `{dataset_id}.{FRESHNESS_TABLE}`").result()
+    return {row.summary_table: row for row in rows}
+
+def save_freshness(client, dataset_id, refreshed_at, results, day_column='day'):
+    """Record the refreshed tables in summary_freshness, in one MERGE
+
+    results is {table name: {'mode', 'days', 'rows'}}; day_column is the SQL
+    of each row's day in those tables, whose maximum is data_through.
+    """
+    rows = ' UNION ALL '.join(
+        f"SELECT '{table_name}' AS summary_table, '{result['mode']}' AS mode, "
+        f"{len(result['days'])} AS days_refreshed, {result['rows']} AS rows_affected, "
+        f"(SELECT MAX({day_column}) FROM `{dataset_id}.{table_name}`) AS data_through"
+        for table_name, result in results.items())
+    job_config = bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ScalarQueryParameter('refreshed_at', 'TIMESTAMP', refreshed_at)
+    ])
+    client.query(f"""
+    MERGE INTO `{dataset_id}.{FRESHNESS_TABLE}` t
+    USING ({rows}) s
+    ON t.summary_table = s.summary_table
+    WHEN MATCHED THEN
+        UPDATE SET refreshed_at = @refreshed_at, mode = s.mode, days_refreshed = s.days_refreshed,
+                   rows_affected = s.rows_affected, data_through = s.data_through
+    WHEN NOT MATCHED THEN
+        INSERT (summary_table, refreshed_at, mode, days_refreshed, rows_affected, data_through)
+        VALUES (s.summary_table, @refreshed_at, s.mode, s.days_refreshed, s.rows_affected, s.data_through)
+    """, job_config=job_config).result()
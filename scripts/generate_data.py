@@ -0,0 +1,169 @@
+"""Generate sample data at any scale, or benchmark the generator across scales.
+
+Examples:
+    python scripts/generate_data.py --users 50000 --contents 2000 --events 5000000 --format ndjson
+    python scripts/generate_data.py --events 10000000 --format ndjson --compression gzip
+    python scripts/generate_data.py --benchmark --sizes 10000,100000,1000000,10000000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from process_streaming_data import save_lake_data, save_parquet_data, save_sample_data, stream_sample_data
+from stream_io import COMPRESSIONS
+
+SCRIPT_PATH = os.path.abspath(__file__)
+
+def write_json(args, output_dir):
+    """Pretty-printed JSON arrays, the layout setup_bigquery.py loads"""
+    save_sample_data(args.shards, args.seed, args.processes, num_contents=args.contents,
+                     num_users=args.users, num_events=args.events, output_dir=output_dir)
+
+def write_parts(args, output_dir):
+    """One users and one viewing_events JSON part per shard"""
+    save_sample_data(args.shards, args.seed, args.processes, split_output=True, num_contents=args.contents,
+                     num_users=args.users, num_events=args.events, output_dir=output_dir)
+
+def write_ndjson(args, output_dir):
+    """Streamed NDJSON in bounded batches (single process), optionally gzip/zstd-compressed"""
+    if args.layout == 'lake':
+        save_lake_data(args.events, args.users, args.contents, args.batch_size, args.seed, output_dir, 'ndjson',
+                       args.compression)
+        return
+    stream_sample_data(args.events, args.users, args.contents, args.batch_size, args.seed, output_dir,
+                       args.compression)
+
+def write_parquet(args, output_dir):
+    """zstd-compressed Parquet, one row group per batch (single process)"""
+    if args.layout == 'lake':
+        save_lake_data(args.events, args.users, args.contents, args.batch_size, args.seed, output_dir, 'parquet')
+        return
+    save_parquet_data(args.events, args.users, args.contents, args.batch_size, args.seed, output_dir)
+
+# Output format name -> writer(args, output_dir)
+FORMATS = {
+    'json': write_json,
+    'parts': write_parts,
+    'ndjson': write_ndjson,
+    'parquet': write_parquet
+}
+
+def directory_size(path):
+    """Total size in bytes of the files under path"""
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, files in os.walk(path) for name in files)
+
+def peak_rss_mb():
+    """Peak resident set size in MB of this process or its largest worker (ru_maxrss is KB on Linux)"""
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024
+
+def generate(args):
+    """Generate one dataset and return its stats"""
+    os.makedirs(args.output_dir, exist_ok=True)
+    start = time.perf_counter()
+    FORMATS[args.format](args, args.output_dir)
+    seconds = time.perf_counter() - start
+    return {
+        'format': args.format,
+        'compression': args.compression,
+        'events': args.events,
+        'users': args.users,
+        'contents': args.contents,
+        'seconds': seconds,
+        'events_per_sec': args.events / seconds if seconds else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+        'bytes': directory_size(args.output_dir)
+    }
+
+def run_benchmark_point(args, fmt, num_events):
+    """Generate one sweep point in a fresh child process so peak RSS is per point"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        command = [sys.executable, SCRIPT_PATH, '--format', fmt, '--events', str(num_events),
+                   '--users', str(args.users), '--contents', str(args.contents),
+                   '--shards', str(args.shards), '--batch-size', str(args.batch_size),
+                   '--layout', args.layout, '--output-dir', output_dir, '--stats-json']
+        if args.seed is not None:
+            command += ['--seed', str(args.seed)]
+        if args.processes:
+            command += ['--processes', str(args.processes)]
+        if args.compression and fmt == 'ndjson':
+            command += ['--compression', args.compression]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"{fmt} at {num_events:,} events failed:\n{result.stderr}")
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+def run_benchmark(args):
+    """Sweep event counts and formats, printing a table and returning the rows"""
+    sizes = [int(size) for size in args.sizes.split(',')]
+    formats = args.formats.split(',')
+    rows = []
+    print(f"{'format':<8} {'events':>12} {'seconds':>9} {'events/sec':>12} {'peak RSS MB':>12} "
+          f"{'MB written':>11} {'bytes/event':>12}")
+    for num_events in sizes:
+        for fmt in formats:
+            if fmt in ('json', 'parts') and num_events > args.max_json_events:
+                # Pretty JSON holds every event dict in memory; skip sizes that can't fit
+                print(f"{fmt:<8} {num_events:>12,} {'skipped (over --max-json-events)':>58}")
+                continue
+            row = run_benchmark_point(args, fmt, num_events)
+            rows.append(row)
+            print(f"{fmt:<8} {num_events:>12,} {row['seconds']:>9.1f} {row['events_per_sec']:>12,.0f} "
+                  f"{row['peak_rss_mb']:>12,.0f} {row['bytes'] / 1e6:>11,.1f} "
+                  f"{row['bytes'] / max(num_events, 1):>12,.0f}")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(rows, f, indent=2)
+        print(f"Benchmark report saved to {args.report}")
+    return rows
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate Netflix sample data at a chosen scale")
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--contents', type=int, default=200)
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--shards', type=int, default=1, help="Process-pool shards (json/parts formats)")
+    parser.add_argument('--processes', type=int, help="Worker processes (default: one per shard, up to the CPU count)")
+    parser.add_argument('--batch-size', type=int, default=100000, help="Events per streamed batch (ndjson, parquet)")
+    parser.add_argument('--format', choices=sorted(FORMATS), default='json')
+    parser.add_argument('--layout', choices=['file', 'lake'], default='file',
+                        help="lake: date=YYYY-MM-DD/part-N viewing_events partitions with a manifest (ndjson, parquet)")
+    parser.add_argument('--compression', choices=sorted(COMPRESSIONS),
+                        help="Compress NDJSON output (.ndjson.gz/.ndjson.zst); gzip uploads to BigQuery as it is")
+    parser.add_argument('--output-dir', default='data/raw')
+    parser.add_argument('--stats-json', action='store_true', help="Print the run's stats as a JSON line")
+    parser.add_argument('--benchmark', action='store_true', help="Run a sweep over --sizes and --formats")
+    parser.add_argument('--sizes', default='10000,100000,1000000,10000000')
+    parser.add_argument('--formats', default='ndjson,json')
+    parser.add_argument('--max-json-events', type=int, default=1000000,
+                        help="Largest event count to benchmark for the in-memory JSON formats")
+    parser.add_argument('--report', help="Write the benchmark rows to this JSON file")
+    args = parser.parse_args(argv)
+    if args.layout == 'lake' and args.format not in ('ndjson', 'parquet'):
+        parser.error("--layout lake needs --format ndjson or parquet")
+    if args.compression and not args.benchmark and args.format != 'ndjson':
+        parser.error("--compression needs --format ndjson")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.benchmark:
+        return run_benchmark(args)
+
+    stats = generate(args)
+    if args.stats_json:
+        print(json.dumps(stats))
+    else:
+        print(f"Generated {stats['events']:,} events in {stats['seconds']:.1f}s "
+              f"({stats['events_per_sec']:,.0f} events/sec), peak RSS {stats['peak_rss_mb']:,.0f} MB, "
+              f"{stats['bytes'] / 1e6:,.1f} MB written to {args.output_dir}")
+    return stats
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Collision-free 64-bit identifiers for generated data.
+
+An id packs the run, the shard and a per-shard sequence number:
+
+    | 0 | run (15 bits) | shard (12 bits) | sequence (36 bits) |
+
+The top bit stays clear so ids fit BigQuery's signed INT64. Ids grow
+monotonically within a shard, never collide across shards of the same run,
+and the 36-bit sequence leaves room for ~68 billion ids per shard.
+"""
+import secrets
+import numpy as np
+
+RUN_BITS = 15
+SHARD_BITS = 12
+SEQUENCE_BITS = 36
+
+MAX_RUN_ID = (1 << RUN_BITS) - 1
+MAX_SHARD_ID = (1 << SHARD_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+def run_id_for_seed(seed=None):
+    """Derive a run id from a seed, or pick a random one for unseeded runs"""
+    if seed is None:
+        return secrets.randbelow(MAX_RUN_ID + 1)
+    return int(np.random.SeedSequence(seed).generate_state(1)[0]) & MAX_RUN_ID
+
+class IdAllocator:
+    """Hand out monotonic 64-bit ids for one shard of one run"""
+
+    def __init__(self, run_id, shard_id=0, start=0):
+        if not 0 <= run_id <= MAX_RUN_ID:
+            raise ValueError(f"run_id must be between 0 and {MAX_RUN_ID}")
+        if not 0 <= shard_id <= MAX_SHARD_ID:
+            raise ValueError(f"shard_id must be between 0 and {MAX_SHARD_ID}")
+        self.prefix = (run_id << (SHARD_BITS + SEQUENCE_BITS)) | (shard_id << SEQUENCE_BITS)
+        self.next_sequence = start
+
+    def allocate(self, count):
+        """Return the next count ids as an int64 array"""
+        if self.next_sequence + count - 1 > MAX_SEQUENCE:
+            raise OverflowError("id sequence exhausted for this shard")
+        ids = self.prefix + np.arange(self.next_sequence, self.next_sequence + count, dtype=np.int64)
+        self.next_sequence += count
+        return ids
+
+    def next_id(self):
+        """Return a single id as a Python int"""
+        return int(self.allocate(1)[0])
+
+def format_id(prefix, value):
+    """Format an id as a compact, fixed-width string such as evt-00a3100000000001"""
+    return f"{prefix}-{value:016x}"
@@ -0,0 +1,166 @@
+"""Date-partitioned raw data lake layout for viewing events.
+
+Events are written as data/raw/viewing_events/date=YYYY-MM-DD/part-NNNNN.<ext>
+(.parquet, or .ndjson optionally gzip/zstd-compressed),
+sorted by timestamp inside each part, with a _manifest.json next to the
+partitions listing every part's row count, size and min/max timestamp.
+Readers use the manifest to open only the partitions in the date range they
+need, and parts can be read or loaded in parallel.
+"""
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from stream_io import COMPRESSIONS, compression_of, open_ndjson
+
+MANIFEST_NAME = '_manifest.json'
+
+# Part file extension for each supported format
+EXTENSIONS = {'ndjson': 'ndjson', 'parquet': 'parquet'}
+
+def partition_dir(table_dir, day):
+    return os.path.join(table_dir, f'date={day}')
+
+def manifest_path(table_dir):
+    return os.path.join(table_dir, MANIFEST_NAME)
+
+def is_lake(path):
+    """Whether path is a lake table directory (it has a manifest)"""
+    return os.path.isdir(path) and os.path.exists(manifest_path(path))
+
+def read_manifest(table_dir):
+    with open(manifest_path(table_dir), 'r') as f:
+        return json.load(f)
+
+def save_manifest(table_dir, manifest):
+    """Write the manifest atomically so readers never see a half-written one"""
+    temp_path = manifest_path(table_dir) + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, manifest_path(table_dir))
+
+def new_manifest(table_name, fmt, compression=None):
+    return {'table': table_name, 'format': fmt, 'compression': compression, 'partitions': {}}
+
+def split_columns_by_day(columns):
+    """Sort engine columns by timestamp and split them into {YYYY-MM-DD: columns}"""
+    order = np.argsort(columns['timestamp'], kind='stable')
+    days = columns['timestamp'][order].astype('datetime64[D]')
+    bounds = np.flatnonzero(days[1:] != days[:-1]) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(order)]))
+    return {
+        str(days[start]): {name: values[order[start:end]] for name, values in columns.items()}
+        for start, end in zip(starts.tolist(), ends.tolist())
+    }
+
+class LakeWriter:
+    """Append event batches to a lake table, one new part per day per batch
+
+    encode(columns) must return the part file's bytes for a slice of engine
+    columns (NDJSON or Parquet, already compressed as compression says).
+    Call close() to write the manifest.
+    """
+
+    def __init__(self, table_dir, table_name, fmt, encode, compression=None):
+        self.table_dir = table_dir
+        self.extension = EXTENSIONS[fmt] + (COMPRESSIONS[compression] if compression else '')
+        self.encode = encode
+        os.makedirs(table_dir, exist_ok=True)
+        if is_lake(table_dir):
+            self.manifest = read_manifest(table_dir)
+        else:
+            self.manifest = new_manifest(table_name, fmt, compression)
+        if (self.manifest['format'], self.manifest.get('compression')) != (fmt, compression):
+            raise ValueError(f"{table_dir} holds {self.manifest['format']} parts "
+                             f"compressed with {self.manifest.get('compression')}, not {fmt}/{compression}")
+
+    def write_batch(self, columns):
+        """Write one batch of engine columns and return the bytes written"""
+        written = 0
+        for day, day_columns in split_columns_by_day(columns).items():
+            partition = self.manifest['partitions'].setdefault(day, {'rows': 0, 'files': []})
+            os.makedirs(partition_dir(self.table_dir, day), exist_ok=True)
+            relative_path = f"date={day}/part-{len(partition['files']):05d}.{self.extension}"
+            data = self.encode(day_columns)
+            with open(os.path.join(self.table_dir, relative_path), 'wb') as f:
+                f.write(data)
+
+            timestamps = day_columns['timestamp']
+            part = {
+                'path': relative_path,
+                'rows': len(timestamps),
+                'bytes': len(data),
+                'min_timestamp': str(timestamps[0].astype('datetime64[s]')),
+                'max_timestamp': str(timestamps[-1].astype('datetime64[s]'))
+            }
+            partition['files'].append(part)
+            partition['rows'] += part['rows']
+            partition['min_timestamp'] = min(partition.get('min_timestamp', part['min_timestamp']),
+                                             part['min_timestamp'])
+            partition['max_timestamp'] = max(partition.get('max_timestamp', part['max_timestamp']),
+                                             part['max_timestamp'])
+            written += len(data)
+        return written
+
+    def close(self):
+        self.manifest['partitions'] = dict(sorted(self.manifest['partitions'].items()))
+        self.manifest['rows'] = sum(p['rows'] for p in self.manifest['partitions'].values())
+        save_manifest(self.table_dir, self.manifest)
+        return self.manifest
+
+def select_partitions(manifest, start_date=None, end_date=None):
+    """Partitions (day -> entry) whose date is within [start_date, end_date]
+
+    Dates are 'YYYY-MM-DD' strings (or anything whose str() is), inclusive.
+    """
+    start_date = str(start_date)[:10] if start_date else None
+    end_date = str(end_date)[:10] if end_date else None
+    return {
+        day: partition for day, partition in manifest['partitions'].items()
+        if (start_date is None or day >= start_date) and (end_date is None or day <= end_date)
+    }
+
+def select_files(table_dir, start_date=None, end_date=None):
+    """Part file paths in the date range, in date then part order"""
+    partitions = select_partitions(read_manifest(table_dir), start_date, end_date)
+    return [os.path.join(table_dir, part['path'])
+            for partition in partitions.values() for part in partition['files']]
+
+def partition_spools(table_dir, start_date=None, end_date=None, validator=None):
+    """Concatenate each selected day's parts into one temporary file
+
+    NDJSON parts are copied byte for byte (gzip parts make one multi-member
+    gzip file, which BigQuery loads as it is; zstd parts are decompressed);
+    Parquet parts are merged into one file with their row groups. Returns
+    {YYYYMMDD: temporary file at offset 0}. With a SchemaValidator, each
+    part's invalid rows are quarantined and left out.
+    """
+    manifest = read_manifest(table_dir)
+    spools = {}
+    try:
+        for day, partition in select_partitions(manifest, start_date, end_date).items():
+            spool = spools[day.replace('-', '')] = tempfile.TemporaryFile()
+            paths = [os.path.join(table_dir, part['path']) for part in partition['files']]
+            if manifest['format'] == 'parquet':
+                import pyarrow.parquet as pq
+                with pq.ParquetWriter(spool, pq.read_schema(paths[0]), compression='zstd') as writer:
+                    for path in paths:
+                        table = pq.read_table(path)
+                        if validator is not None:
+                            table = validator.check_arrow(table, source=path)
+                        writer.write_table(table)
+            else:
+                for path in paths:
+                    with open_ndjson(path) if compression_of(path) == 'zstd' else open(path, 'rb') as f:
+                        if validator is None:
+                            shutil.copyfileobj(f, spool)
+                        else:
+                            spool.write(validator.check_ndjson(f.read(), source=path)[0])
+            spool.seek(0)
+    except Exception:
+        for spool in spools.values():
+            spool.close()
+        raise
+    return spools
@@ -0,0 +1,101 @@
+"""Local manifest of the chunks loaded into each BigQuery table.
+
+setup_bigquery.py splits each data file into fixed-size NDJSON chunks and
+records every chunk here with its SHA-256 content hash, record count and load
+status. A rerun skips chunks that are already loaded and unchanged, and picks
+up where an interrupted load stopped. If a loaded chunk changed, or the table
+no longer holds the rows the manifest recorded, the table is reloaded from
+chunk 0. There is one JSON file per table, so tables loading concurrently
+never write the same file; an 'append' load keeps one per source file (and
+date range), so appending the same file again is a no-op.
+"""
+import json
+import os
+import time
+
+class LoadManifest:
+    """Chunk load state for one table, saved as {manifest_dir}/{table_name}.json
+
+    Chunks are loaded in order, so the entries with status 'loaded' always
+    form a prefix of the chunk list. An entry is saved as 'pending' with its
+    job id before its upload starts, so after a crash the job can be looked up
+    to see whether it finished.
+    """
+
+    def __init__(self, path, state=None):
+        self.path = path
+        state = state or {}
+        self.source = state.get('source')
+        self.chunk_records = state.get('chunk_records')
+        self.complete = state.get('complete', False)
+        self.chunks = state.get('chunks', [])
+
+    @classmethod
+    def load(cls, manifest_dir, table_name):
+        path = os.path.join(manifest_dir, f"{table_name}.json")
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, 'r') as f:
+            return cls(path, json.load(f))
+
+    def save(self):
+        """Write the manifest atomically so a crash never leaves it half written"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({
+                'source': self.source,
+                'chunk_records': self.chunk_records,
+                'complete': self.complete,
+                'chunks': self.chunks
+            }, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def reset(self):
+        """Forget every chunk, e.g. when the table no longer holds what was loaded"""
+        self.source = None
+        self.complete = False
+        self.chunks = []
+        self.save()
+
+    def chunk(self, index):
+        return self.chunks[index] if index < len(self.chunks) else None
+
+    def start_chunk(self, index, sha256, records, size, job_id, quarantined=0):
+        """Record a chunk as pending before its upload and drop any stale entries after it
+
+        records counts the rows uploaded; quarantined the invalid rows left out.
+        """
+        entry = {
+            'index': index,
+            'sha256': sha256,
+            'records': records,
+            'quarantined': quarantined,
+            'bytes': size,
+            'status': 'pending',
+            'job_id': job_id
+        }
+        self.chunks[index:] = [entry]
+        self.complete = False
+        self.save()
+        return entry
+
+    def finish_chunk(self, entry):
+        entry['status'] = 'loaded'
+        entry['loaded_at'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        self.save()
+
+    def loaded_chunks(self):
+        return [entry for entry in self.chunks if entry['status'] == 'loaded']
+
+    def loaded_records(self):
+        return sum(entry['records'] for entry in self.loaded_chunks())
+
+def source_fingerprint(file_path):
+    """Cheap identity of a data file, used to skip rehashing an unchanged, fully loaded file
+
+    A lake directory is identified by its _manifest.json, which is rewritten
+    whenever parts are added.
+    """
+    stat = os.stat(os.path.join(file_path, '_manifest.json') if os.path.isdir(file_path) else file_path)
+    return {'path': os.path.abspath(file_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
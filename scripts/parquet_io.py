@@ -0,0 +1,204 @@
+"""Parquet files for the raw tables, built from and read into ColumnarTables.
+
+The Arrow schema is derived from schemas/bigquery_schemas.json: RECORD
+fields become structs (quality_metrics, engagement_signals, ...), REPEATED
+fields become lists, TIMESTAMP becomes a UTC timestamp and REQUIRED fields
+are non-nullable, so BigQuery loads the files into the existing tables as
+they are. Dictionary-encoded and id columns are converted column by column,
+without building any records.
+"""
+import json
+import tempfile
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from columnar import ColumnarTable, Categorical, CategoricalList, HexIds, _code_dtype, _encode_hexids
+
+SCHEMA_KEYS = {
+    'contents': 'contents_schema',
+    'users': 'users_schema',
+    'viewing_events': 'viewing_events_schema'
+}
+
+_ARROW_TYPES = {
+    'STRING': pa.string(),
+    'INTEGER': pa.int64(),
+    'FLOAT': pa.float64(),
+    'BOOLEAN': pa.bool_(),
+    'TIMESTAMP': pa.timestamp('us', tz='UTC')
+}
+
+def load_bigquery_fields(table_name, path='schemas/bigquery_schemas.json'):
+    with open(path, 'r') as f:
+        return json.load(f)[SCHEMA_KEYS[table_name]]
+
+def arrow_field(field_def):
+    """Arrow field for one BigQuery schema field definition"""
+    if field_def['field_type'] == 'RECORD':
+        arrow_type = pa.struct([arrow_field(child) for child in field_def['fields']])
+    else:
+        arrow_type = _ARROW_TYPES[field_def['field_type']]
+    if field_def['mode'] == 'REPEATED':
+        return pa.field(field_def['name'], pa.list_(arrow_type), nullable=False)
+    return pa.field(field_def['name'], arrow_type, nullable=field_def['mode'] != 'REQUIRED')
+
+def arrow_schema(bigquery_fields):
+    return pa.schema([arrow_field(field_def) for field_def in bigquery_fields])
+
+def _strings(column):
+    """Arrow strings from a Categorical, HexIds or object column"""
+    if isinstance(column, Categorical):
+        codes = np.asarray(column.codes)
+        indices = pa.array(codes.astype(np.int32), mask=codes < 0)
+        return pa.DictionaryArray.from_arrays(indices, pa.array(column.categories, pa.string())).cast(pa.string())
+    if isinstance(column, HexIds):
+        return pa.array(column.decode(), pa.string())
+    return pa.array(column.tolist(), pa.string())
+
+def _to_arrow_array(kind, column, arrow_type):
+    if isinstance(column, CategoricalList):
+        return pa.ListArray.from_arrays(pa.array(column.offsets, pa.int32()), _strings(column.values),
+                                        type=arrow_type)
+    if pa.types.is_string(arrow_type):
+        return _strings(column)
+    if kind == 'timestamp':
+        return pa.array(column.astype('datetime64[us]')).cast(arrow_type)
+    if kind.endswith('?'):
+        return pa.array(column.astype(arrow_type.to_pandas_dtype()), mask=column == -1)
+    return pa.array(column).cast(arrow_type)
+
+def _build_column(table, kinds, field, prefix=''):
+    path = prefix + field.name
+    if pa.types.is_struct(field.type):
+        children = [_build_column(table, kinds, field.type.field(i), path + '.')
+                    for i in range(field.type.num_fields)]
+        return pa.StructArray.from_arrays(children, fields=list(field.type))
+    if path not in table.columns:
+        return pa.nulls(table.num_rows, field.type)
+    return _to_arrow_array(kinds[path], table.columns[path], field.type)
+
+def columnar_to_arrow(table, schema):
+    """Convert a ColumnarTable to an Arrow table with the given schema
+
+    Fields the table doesn't have are written as nulls.
+    """
+    kinds = dict(table.fields)
+    arrays = [_build_column(table, kinds, field) for field in schema]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+def write_parquet(path, tables, schema, compression='zstd'):
+    """Write ColumnarTables to one Parquet file, each table as its own row group(s)
+
+    tables can be a generator, so events can be written batch by batch with
+    memory bounded by one batch. Returns the number of rows written.
+    """
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression=compression) as writer:
+        for table in tables:
+            writer.write_table(columnar_to_arrow(table, schema))
+            rows += len(table)
+    return rows
+
+def parquet_bytes(arrow_table, compression='zstd'):
+    """Encode an Arrow table as the bytes of a standalone Parquet file"""
+    sink = pa.BufferOutputStream()
+    pq.write_table(arrow_table, sink, compression=compression)
+    return sink.getvalue().to_pybytes()
+
+def _from_arrow_column(kind, column):
+    column = column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column
+    if kind == 'category':
+        encoded = column.dictionary_encode()
+        codes = encoded.indices.fill_null(-1).to_numpy(zero_copy_only=False)
+        return Categorical(codes.astype(_code_dtype(len(encoded.dictionary))), encoded.dictionary.to_pylist())
+    if kind == 'category_list':
+        offsets = column.offsets.to_numpy().astype(np.int64)
+        offsets = offsets - offsets[0]
+        return CategoricalList(offsets, _from_arrow_column('category', column.flatten()))
+    if kind == 'hexid':
+        values = column.to_pylist()
+        encoded = _encode_hexids(values)
+        return encoded if encoded is not None else np.array(values, dtype=object)
+    if kind == 'string':
+        return np.array(column.to_pylist(), dtype=object)
+    if kind == 'timestamp':
+        return column.cast(pa.timestamp('us')).to_numpy(zero_copy_only=False).astype('datetime64[us]')
+    if kind.endswith('?'):
+        return column.fill_null(-1).to_numpy(zero_copy_only=False).astype(kind[:-1])
+    return column.to_numpy(zero_copy_only=False).astype(kind)
+
+def arrow_to_columnar(arrow_table, fields):
+    """Build a ColumnarTable from an Arrow table; fields missing from it are skipped"""
+    flat = arrow_table.flatten()
+    while any(pa.types.is_struct(field.type) for field in flat.schema):
+        flat = flat.flatten()
+    present = [(path, kind) for path, kind in fields if path in flat.column_names]
+    columns = {path: _from_arrow_column(kind, flat.column(path)) for path, kind in present}
+    return ColumnarTable(present, columns, arrow_table.num_rows)
+
+def date_range_filter(start_date=None, end_date=None, field='timestamp'):
+    """pyarrow row filter for rows whose field falls on [start_date, end_date] (UTC days)"""
+    filters = []
+    if start_date:
+        start = datetime.fromisoformat(str(start_date)[:10]).replace(tzinfo=timezone.utc)
+        filters.append((field, '>=', start))
+    if end_date:
+        end = datetime.fromisoformat(str(end_date)[:10]).replace(tzinfo=timezone.utc)
+        filters.append((field, '<', end + timedelta(days=1)))
+    return filters or None
+
+def read_parquet(paths, fields, filters=None):
+    """Read one Parquet file, or a list of them, (optionally row-filtered) into a ColumnarTable"""
+    paths = [paths] if isinstance(paths, str) else list(paths)
+    if not paths:
+        return ColumnarTable([], {}, 0)
+    top_level = sorted({path.split('.')[0] for path, _ in fields})
+    schema_names = set(pq.read_schema(paths[0]).names)
+    columns = [name for name in top_level if name in schema_names]
+    arrow_table = pa.concat_tables([pq.read_table(path, columns=columns, filters=filters) for path in paths])
+    return arrow_to_columnar(arrow_table, fields)
+
+def parquet_file_chunks(f, batch_size=100000):
+    """Re-encode a Parquet file as standalone Parquet byte chunks of batch_size rows
+
+    Mirrors the NDJSON chunking for the chunked, resumable loads; the same
+    file and batch_size always give the same chunks.
+    """
+    parquet_file = pq.ParquetFile(f)
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        yield parquet_bytes(pa.Table.from_batches([batch], schema=parquet_file.schema_arrow))
+
+def split_parquet_by_day(f, field, batch_size=100000, validator=None):
+    """Split a Parquet file's rows into one temporary Parquet file per UTC date of field
+
+    Returns {YYYYMMDD: open temporary file positioned at the start}. With a
+    SchemaValidator, invalid rows are quarantined instead of spooled.
+    """
+    parquet_file = pq.ParquetFile(f)
+    schema = parquet_file.schema_arrow
+    writers, spools = {}, {}
+    try:
+        for batch in parquet_file.iter_batches(batch_size=batch_size):
+            table = pa.Table.from_batches([batch], schema=schema)
+            if validator is not None:
+                table = validator.check_arrow(table)
+            days = pc.strftime(table.column(field), format='%Y%m%d')
+            for day in pc.unique(days).to_pylist():
+                if day is None:
+                    raise ValueError(f"Row without a {field} date")
+                if day not in writers:
+                    spools[day] = tempfile.TemporaryFile()
+                    writers[day] = pq.ParquetWriter(spools[day], schema, compression='zstd')
+                writers[day].write_table(table.filter(pc.equal(days, day)))
+    except Exception:
+        for spool in spools.values():
+            spool.close()
+        raise
+    finally:
+        for writer in writers.values():
+            writer.close()
+    for spool in spools.values():
+        spool.seek(0)
+    return spools
@@ -3,60 +3,89 @@ from google.cloud import bigquery
 import os
 import random
 from datetime import datetime, timedelta
+import numpy as np
 from create_dashboard_views import create_bigquery_views
+from event_engine import (
+    DEVICE_TYPES, EVENT_TYPES, CONNECTION_TYPES, PLAYBACK_QUALITIES, ALGORITHM_TYPES,
+    RECOMMENDATION_CATEGORIES, RATINGS_GIVEN, PREMIUM_SUBSCRIPTIONS, DEVICE_WEIGHTS,
+    FIXED_LINE_DEVICES, CONNECTION_WEIGHTS, FAST_CONNECTIONS, QUALITY_TIERS,
+    GENRE_MATCH_BOOST, LANGUAGE_MATCH_BOOST, PREMIUM_ENGAGEMENT_BOOST,
+    encode_catalog, generate_event_columns, event_columns_to_records, event_columns_to_ndjson,
+    event_columns_to_table
+)
+from columnar import ColumnarTable, USER_FIELDS, CONTENT_FIELDS
+from stream_io import ProgressReporter, compress_ndjson, ndjson_path, write_ndjson
+from id_allocation import IdAllocator, run_id_for_seed, format_id
+from sharding import shard_seeds, python_seed, split_evenly, split_proportionally, run_shards
 
-def generate_realistic_sample_data():
-    """Generate realistic sample data with proper variations"""
-    
-    # Helper function to generate realistic timestamps
-    def generate_timestamp():
-        start_date = datetime(2024, 1, 1)
-        days = random.randint(0, 60)  # Last 60 days
-        hours = random.randint(0, 23)
-        minutes = random.randint(0, 59)
-        return (start_date + timedelta(days=days, hours=hours, minutes=minutes)).isoformat()
-
-    # Content generation data
-    genres = ["Action", "Drama", "Comedy", "Sci-Fi", "Romance", "Documentary", "Thriller", 
-             "Horror", "Adventure", "Animation", "Crime", "Fantasy", "Mystery", "Family"]
-    languages = ["English", "Spanish", "French", "Japanese", "Korean", "Hindi", "German", 
-                "Italian", "Mandarin", "Portuguese", "Russian", "Arabic"]
-    ratings = ["G", "PG", "PG-13", "R", "TV-MA", "TV-14", "TV-PG", "TV-Y7", "TV-Y"]
-    
-    # Generate 200 diverse content items (increased from 50)
+def generate_timestamp():
+    """Generate a realistic event timestamp within the 60 days after 2024-01-01"""
+    start_date = datetime(2024, 1, 1)
+    days = random.randint(0, 60)  # Last 60 days
+    hours = random.randint(0, 23)
+    minutes = random.randint(0, 59)
+    return (start_date + timedelta(days=days, hours=hours, minutes=minutes)).isoformat()
+
+# Content and user generation data
+GENRES = ["Action", "Drama", "Comedy", "Sci-Fi", "Romance", "Documentary", "Thriller", 
+          "Horror", "Adventure", "Animation", "Crime", "Fantasy", "Mystery", "Family"]
+LANGUAGES = ["English", "Spanish", "French", "Japanese", "Korean", "Hindi", "German", 
+             "Italian", "Mandarin", "Portuguese", "Russian", "Arabic"]
+CONTENT_RATINGS = ["G", "PG", "PG-13", "R", "TV-MA", "TV-14", "TV-PG", "TV-Y7", "TV-Y"]
+COUNTRIES = ["United States", "Canada", "United Kingdom", "France", "Germany", "Japan", 
+             "South Korea", "Australia", "Brazil", "India", "Mexico", "Spain", "Italy", 
+             "Netherlands", "Sweden", "Singapore", "UAE", "South Africa", "Argentina", "China"]
+AGE_GROUPS = ["13-17", "18-24", "25-34", "35-44", "45-54", "55-64", "65+"]
+LOCAL_LANGUAGES = {
+    "United States": ["English", "Spanish"],
+    "Canada": ["English", "French"],
+    "France": ["French", "English"],
+    "Germany": ["German", "English"],
+    "Japan": ["Japanese", "English"],
+    "South Korea": ["Korean", "English"],
+    "Brazil": ["Portuguese", "English", "Spanish"],
+    "India": ["Hindi", "English"],
+    "China": ["Mandarin", "English"]
+}
+
+def generate_contents(num_contents=200, rng=random):
+    """Generate diverse content items
+
+    rng can be a seeded random.Random instance for reproducible output.
+    """
     contents_data = []
-    for i in range(200):
-        genre = random.choice(genres)
-        content_type = random.choice(["movie", "series"])
-        duration = random.randint(25, 60) if content_type == "series" else random.randint(85, 180)
+    for i in range(num_contents):
+        genre = rng.choice(GENRES)
+        content_type = rng.choice(["movie", "series"])
+        duration = rng.randint(25, 60) if content_type == "series" else rng.randint(85, 180)
         
         content = {
             "content_id": f"content-{i+1:04d}",
+            "content_key": i + 1,
             "type": content_type,
-            "title": f"The {genre} {random.choice(['Adventure', 'Story', 'Tale', 'Journey', 'Experience', 'Mystery', 'Chronicles'])} {i+1}",
+            "title": f"The {genre} {rng.choice(['Adventure', 'Story', 'Tale', 'Journey', 'Experience', 'Mystery', 'Chronicles'])} {i+1}",
             "genre": genre,
-            "release_year": random.randint(2020, 2024),
+            "release_year": rng.randint(2020, 2024),
             "duration_minutes": duration,
-            "language": random.choice(languages),
-            "rating": random.choice(ratings),
-            "tags": random.sample(["action", "adventure", "drama", "comedy", "romance", "thriller", 
+            "language": rng.choice(LANGUAGES),
+            "rating": rng.choice(CONTENT_RATINGS),
+            "tags": rng.sample(["action", "adventure", "drama", "comedy", "romance", "thriller", 
                                  "mystery", "sci-fi", "fantasy", "documentary", "crime", "family",
                                  "animation", "horror", "musical", "biography", "sport", "history"], 3)
         }
         contents_data.append(content)
+    return contents_data
 
-    # Generate 10000 diverse users (increased from 1000)
-    countries = ["United States", "Canada", "United Kingdom", "France", "Germany", "Japan", 
-                "South Korea", "Australia", "Brazil", "India", "Mexico", "Spain", "Italy", 
-                "Netherlands", "Sweden", "Singapore", "UAE", "South Africa", "Argentina", "China"]
-    age_groups = ["13-17", "18-24", "25-34", "35-44", "45-54", "55-64", "65+"]
-    subscription_types = ["basic", "standard", "premium", "student", "family"]
-    
+def generate_users(num_users=10000, rng=random, start_index=0):
+    """Generate diverse users with realistic preferences
+
+    start_index offsets the user ids so shards can generate disjoint ranges.
+    """
     users_data = []
-    for i in range(10000):
+    for i in range(start_index, start_index + num_users):
         # Generate realistic user preferences
-        country = random.choice(countries)
-        age_group = random.choice(age_groups)
+        country = rng.choice(COUNTRIES)
+        age_group = rng.choice(AGE_GROUPS)
         
         # Adjust subscription type probabilities based on age and country
         sub_probs = {"basic": 0.3, "standard": 0.4, "premium": 0.2, "student": 0.05, "family": 0.05}
@@ -67,31 +96,19 @@ def generate_realistic_sample_data():
             sub_probs["family"] = 0.2
             sub_probs["basic"] = 0.2
         
-        subscription = random.choices(
+        subscription = rng.choices(
             list(sub_probs.keys()),
             weights=list(sub_probs.values())
         )[0]
         
         # Generate language preferences based on country
-        local_languages = {
-            "United States": ["English", "Spanish"],
-            "Canada": ["English", "French"],
-            "France": ["French", "English"],
-            "Germany": ["German", "English"],
-            "Japan": ["Japanese", "English"],
-            "South Korea": ["Korean", "English"],
-            "Brazil": ["Portuguese", "English", "Spanish"],
-            "India": ["Hindi", "English"],
-            "China": ["Mandarin", "English"]
-        }
-        
-        base_languages = local_languages.get(country, ["English"])
-        additional_languages = random.sample([l for l in languages if l not in base_languages], 
-                                          random.randint(0, 2))
+        base_languages = LOCAL_LANGUAGES.get(country, ["English"])
+        additional_languages = rng.sample([l for l in LANGUAGES if l not in base_languages], 
+                                          rng.randint(0, 2))
         preferred_languages = base_languages + additional_languages
         
         # Generate genre preferences based on age and other factors
-        genre_weights = {genre: random.random() for genre in genres}
+        genre_weights = {genre: rng.random() for genre in GENRES}
         if age_group in ["13-17", "18-24"]:
             genre_weights["Action"] *= 1.5
             genre_weights["Sci-Fi"] *= 1.5
@@ -101,36 +118,56 @@ def generate_realistic_sample_data():
             genre_weights["Thriller"] *= 1.3
             genre_weights["Comedy"] *= 1.3
         
-        preferred_genres = random.sample(
-            genres,
-            k=random.randint(3, 6),
-            counts=[int(genre_weights[g] * 10) for g in genres]
+        preferred_genres = rng.sample(
+            GENRES,
+            k=rng.randint(3, 6),
+            counts=[int(genre_weights[g] * 10) for g in GENRES]
         )
         
         user = {
             "user_id": f"user-{i+1:04d}",
+            "user_key": i + 1,
             "country": country,
             "subscription_type": subscription,
             "age_group": age_group,
-            "join_date": (datetime(2024, 1, 1) - timedelta(days=random.randint(0, 730))).isoformat(),
+            "join_date": (datetime(2024, 1, 1) - timedelta(days=rng.randint(0, 730))).isoformat(),
             "preferred_genres": preferred_genres,
             "preferred_languages": preferred_languages,
-            "has_profile_pin": random.choice([True, False]),
+            "has_profile_pin": rng.choice([True, False]),
             "max_stream_quality": "4K" if subscription == "premium" else ("HD" if subscription in ["standard", "family"] else "SD")
         }
         users_data.append(user)
+    return users_data
+
+def generate_realistic_sample_data(engine="numpy", num_contents=200, num_users=10000, num_events=100000):
+    """Generate realistic sample data with proper variations
+
+    Viewing events are drawn in columns by event_engine; pass engine="python"
+    to use the original per-event loop instead.
+    """
+    # Generate diverse content items (200 by default, increased from 50)
+    contents_data = generate_contents(num_contents)
+
+    # Generate diverse users (10000 by default, increased from 1000)
+    users_data = generate_users(num_users)
 
-    # Generate 100000 viewing events (increased from 10000)
-    device_types = ["smart_tv", "mobile", "tablet", "gaming_console", "desktop", "streaming_stick"]
-    event_types = ["start", "pause", "resume", "complete", "exit", "seek_forward", "seek_backward"]
-    connection_types = ["wifi", "ethernet", "4G", "5G", "3G"]
-    playback_qualities = ["SD", "HD", "FHD", "4K"]
-    algorithm_types = ["content_based", "collaborative_filtering", "hybrid", "trending", "personalized"]
-    recommendation_categories = ["trending", "because_you_watched", "new_releases", "top_picks", "similar_content"]
+    # Generate viewing events (100000 by default, increased from 10000)
+    if engine == "python":
+        viewing_events_data = generate_viewing_events_loop(users_data, contents_data, num_events)
+    else:
+        # One batch holds every event; with no events the generator yields no batch at all
+        viewing_events_data = next(iter_viewing_event_batches(users_data, contents_data, num_events,
+                                                              batch_size=max(num_events, 1)), [])
 
+    return contents_data, users_data, viewing_events_data
+
+def generate_viewing_events_loop(users_data, contents_data, num_events):
+    """Generate viewing events one at a time (reference for the vectorized engine)"""
+    run_id = run_id_for_seed()
+    event_ids, session_ids = IdAllocator(run_id), IdAllocator(run_id)
     viewing_events_data = []
     
-    for _ in range(100000):
+    for _ in range(num_events):
         user = random.choice(users_data)
         
         # Select content based on user preferences
@@ -141,37 +178,26 @@ def generate_realistic_sample_data():
         content = random.choice(matching_content if matching_content else contents_data)
         
         # Device selection based on user characteristics
-        if user["subscription_type"] in ["premium", "family"]:
-            device_weights = [3, 1, 1, 2, 2, 2]  # Higher weight for smart_tv
-        else:
-            device_weights = [2, 2, 2, 1, 2, 1]  # More balanced
+        is_premium = user["subscription_type"] in PREMIUM_SUBSCRIPTIONS
+        device_weights = DEVICE_WEIGHTS["premium" if is_premium else "other"]
+        device_type = random.choices(DEVICE_TYPES, weights=device_weights)[0]
         
-        device_type = random.choices(device_types, weights=device_weights)[0]
-        
-        # Connection type based on device and country
-        if device_type in ["smart_tv", "desktop"]:
-            conn_weights = [5, 3, 0, 1, 0]  # Prefer wifi/ethernet
-        else:
-            conn_weights = [3, 0, 2, 2, 1]  # More mobile connections
-        
-        connection = random.choices(connection_types, weights=conn_weights)[0]
+        # Connection type based on device
+        fixed_line = device_type in FIXED_LINE_DEVICES
+        conn_weights = CONNECTION_WEIGHTS["fixed_line" if fixed_line else "other"]
+        connection = random.choices(CONNECTION_TYPES, weights=conn_weights)[0]
         
         # Quality metrics based on connection and subscription
-        if connection in ["ethernet", "5G"] and user["subscription_type"] in ["premium", "family"]:
-            buffering_events = random.randint(0, 2)
-            bandwidth = random.uniform(80, 200)
-            frames_dropped = random.uniform(0.001, 0.005)
-            startup_time = random.uniform(0.5, 2.0)
+        if connection in FAST_CONNECTIONS and is_premium:
+            tier = QUALITY_TIERS[0]
         elif connection == "4G" or user["subscription_type"] == "standard":
-            buffering_events = random.randint(1, 4)
-            bandwidth = random.uniform(15, 45)
-            frames_dropped = random.uniform(0.002, 0.008)
-            startup_time = random.uniform(1.5, 3.0)
+            tier = QUALITY_TIERS[1]
         else:
-            buffering_events = random.randint(2, 7)
-            bandwidth = random.uniform(5, 15)
-            frames_dropped = random.uniform(0.005, 0.015)
-            startup_time = random.uniform(2.5, 4.0)
+            tier = QUALITY_TIERS[2]
+        buffering_events = random.randint(*tier["buffering_events"])
+        bandwidth = random.uniform(*tier["bandwidth_mbps"])
+        frames_dropped = random.uniform(*tier["frames_dropped_ratio"])
+        startup_time = random.uniform(*tier["startup_time_seconds"])
 
         # Generate engagement metrics based on content and user match
         base_completion = random.uniform(0.1, 1.0)
@@ -179,31 +205,33 @@ def generate_realistic_sample_data():
         
         # Adjust engagement based on various factors
         if content["genre"] in user["preferred_genres"]:
-            base_engagement *= 1.2
-            base_completion *= 1.15
+            base_engagement *= GENRE_MATCH_BOOST["engagement_score"]
+            base_completion *= GENRE_MATCH_BOOST["completion_rate"]
         if content["language"] in user["preferred_languages"]:
-            base_engagement *= 1.1
-            base_completion *= 1.1
-        if user["subscription_type"] in ["premium", "family"]:
-            base_engagement *= 1.1
+            base_engagement *= LANGUAGE_MATCH_BOOST["engagement_score"]
+            base_completion *= LANGUAGE_MATCH_BOOST["completion_rate"]
+        if is_premium:
+            base_engagement *= PREMIUM_ENGAGEMENT_BOOST
         
         # Cap the metrics at 1.0
         completion_rate = min(base_completion, 1.0)
         engagement_score = min(base_engagement, 1.0)
 
         event = {
-            "event_id": f"evt-{random.randint(100000, 999999)}",
+            "event_id": format_id("evt", event_ids.next_id()),
             "timestamp": generate_timestamp(),
-            "event_type": random.choice(event_types),
+            "event_type": random.choice(EVENT_TYPES),
             "content_id": content["content_id"],
+            "content_key": content["content_key"],
             "user_id": user["user_id"],
+            "user_key": user["user_key"],
             "device_type": device_type,
             "watch_duration_seconds": random.randint(300, 7200),
-            "session_id": f"sess-{random.randint(100000, 999999)}",
+            "session_id": format_id("sess", session_ids.next_id()),
             "quality_metrics": {
                 "buffering_events": buffering_events,
                 "average_bitrate": random.randint(2000, 8000),
-                "playback_quality": random.choice(playback_qualities),
+                "playback_quality": random.choice(PLAYBACK_QUALITIES),
                 "connection_type": connection,
                 "bandwidth_mbps": bandwidth,
                 "startup_time_seconds": startup_time,
@@ -219,52 +247,290 @@ def generate_realistic_sample_data():
                 "volume_changes": random.randint(0, 5)
             },
             "recommendation_data": {
-                "algorithm_type": random.choice(algorithm_types),
+                "algorithm_type": random.choice(ALGORITHM_TYPES),
                 "recommendation_score": random.uniform(0.1, 1.0),
                 "position_in_list": random.randint(1, 20),
-                "recommendation_category": random.choice(recommendation_categories)
+                "recommendation_category": random.choice(RECOMMENDATION_CATEGORIES)
             },
             "engagement_signals": {
                 "completion_rate": completion_rate,
                 "engagement_score": engagement_score,
                 "social_sharing": random.choice([True, False]),
-                "rating_given": random.choice([None, 1, 2, 3, 4, 5])
+                "rating_given": random.choice(RATINGS_GIVEN)
             }
         }
         viewing_events_data.append(event)
 
+    return viewing_events_data
+
+def iter_event_columns(users_data, contents_data, num_events, batch_size=100000, seed=None,
+                       rng=None, run_id=None, shard_id=0):
+    """Yield the engine's event columns in batches of at most batch_size events
+
+    rng and run_id default to ones derived from seed. Event and session ids
+    are unique across all batches and across shards of the same run_id.
+    """
+    rng = rng or np.random.default_rng(seed)
+    run_id = run_id_for_seed(seed) if run_id is None else run_id
+    event_ids, session_ids = IdAllocator(run_id, shard_id), IdAllocator(run_id, shard_id)
+    catalog = encode_catalog(contents_data, users_data)
+    for start in range(0, num_events, batch_size):
+        yield generate_event_columns(rng, catalog, min(batch_size, num_events - start),
+                                     event_ids, session_ids)
+
+def iter_viewing_event_batches(users_data, contents_data, num_events, batch_size=100000,
+                               rng=None, encoded=False, run_id=None, shard_id=0):
+    """Yield viewing events in batches of at most batch_size records
+
+    With encoded=True each batch is yielded as NDJSON bytes, skipping the
+    intermediate event dicts.
+    """
+    to_batch = event_columns_to_ndjson if encoded else event_columns_to_records
+    for columns in iter_event_columns(users_data, contents_data, num_events, batch_size,
+                                      rng=rng, run_id=run_id, shard_id=shard_id):
+        yield to_batch(columns, users_data, contents_data)
+
+def generate_columnar_sample_data(num_events=100000, num_users=10000, num_contents=200,
+                                  batch_size=1000000, seed=None):
+    """Generate sample data as ColumnarTables instead of lists of nested dicts
+
+    Events go straight from the engine's columns into the table, so no event
+    dicts are ever built. Use ColumnarTable.to_records() for the JSON layout.
+    """
+    py_rng = random.Random(seed) if seed is not None else random
+    contents_data = generate_contents(num_contents, rng=py_rng)
+    users_data = generate_users(num_users, rng=py_rng)
+
+    batches = [event_columns_to_table(columns, users_data, contents_data)
+               for columns in iter_event_columns(users_data, contents_data, num_events, batch_size, seed)]
+
+    return (ColumnarTable.from_records(contents_data, CONTENT_FIELDS),
+            ColumnarTable.from_records(users_data, USER_FIELDS),
+            ColumnarTable.concat(batches))
+
+def stream_sample_data(num_events=100000, num_users=10000, num_contents=200,
+                       batch_size=100000, seed=None, output_dir='data/raw', compression=None):
+    """Stream the sample data to NDJSON files
+
+    Only the users, contents and one batch of events are held in memory, so
+    peak memory does not grow with num_events. Progress and throughput are
+    reported while the events are written. compression ('gzip' or 'zstd')
+    writes .ndjson.gz/.ndjson.zst files, one gzip member or zstd frame per
+    batch, which setup_bigquery.py loads without rewriting them.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    py_rng = random.Random(seed) if seed is not None else random
+    contents_data = generate_contents(num_contents, rng=py_rng)
+    users_data = generate_users(num_users, rng=py_rng)
+
+    def path(table_name):
+        return ndjson_path(os.path.join(output_dir, f'{table_name}.ndjson'), compression)
+
+    write_ndjson(path('contents'), [contents_data], label='contents', compression=compression)
+    write_ndjson(path('users'), [users_data], label='users', compression=compression)
+    batches = iter_viewing_event_batches(users_data, contents_data, num_events, batch_size,
+                                         rng=np.random.default_rng(seed), encoded=True,
+                                         run_id=run_id_for_seed(seed))
+    return write_ndjson(path('viewing_events'), batches, total=num_events, label='viewing_events',
+                        compression=compression)
+
+def save_parquet_data(num_events=100000, num_users=10000, num_contents=200,
+                      batch_size=1000000, seed=None, output_dir='data/raw', compression='zstd'):
+    """Write the sample data as compressed Parquet files
+
+    Nested records stay structs and REPEATED fields stay lists (see
+    parquet_io.py). Events go from the engine's columns to one row group per
+    batch, so no event dicts are built and memory is bounded by batch_size.
+    """
+    from parquet_io import arrow_schema, load_bigquery_fields, write_parquet
+    os.makedirs(output_dir, exist_ok=True)
+    py_rng = random.Random(seed) if seed is not None else random
+    contents_data = generate_contents(num_contents, rng=py_rng)
+    users_data = generate_users(num_users, rng=py_rng)
+
+    def write(table_name, tables):
+        path = os.path.join(output_dir, f'{table_name}.parquet')
+        return write_parquet(path, tables, arrow_schema(load_bigquery_fields(table_name)), compression)
+
+    write('contents', [ColumnarTable.from_records(contents_data, CONTENT_FIELDS)])
+    write('users', [ColumnarTable.from_records(users_data, USER_FIELDS)])
+
+    progress = ProgressReporter('viewing_events', total=num_events)
+
+    def event_batches():
+        for columns in iter_event_columns(users_data, contents_data, num_events, batch_size, seed):
+            table = event_columns_to_table(columns, users_data, contents_data)
+            yield table
+            progress.update(len(table))
+
+    write('viewing_events', event_batches())
+    return progress.finish()
+
+def save_lake_data(num_events=100000, num_users=10000, num_contents=200,
+                   batch_size=1000000, seed=None, output_dir='data/raw', fmt='parquet', compression=None):
+    """Write the sample data with viewing events in the date-partitioned lake layout
+
+    Events go to {output_dir}/viewing_events/date=YYYY-MM-DD/part-N.<fmt>,
+    sorted by timestamp within each part, plus a _manifest.json (see lake.py).
+    Contents and users are written as single files in the same format. Any
+    existing lake for viewing_events is replaced. NDJSON can be compressed
+    ('gzip' or 'zstd').
+    """
+    import shutil
+    from lake import LakeWriter, is_lake
+    os.makedirs(output_dir, exist_ok=True)
+    py_rng = random.Random(seed) if seed is not None else random
+    contents_data = generate_contents(num_contents, rng=py_rng)
+    users_data = generate_users(num_users, rng=py_rng)
+
+    if fmt == 'parquet':
+        from parquet_io import arrow_schema, columnar_to_arrow, load_bigquery_fields, parquet_bytes, write_parquet
+        for table_name, records, fields in (('contents', contents_data, CONTENT_FIELDS),
+                                            ('users', users_data, USER_FIELDS)):
+            write_parquet(os.path.join(output_dir, f'{table_name}.parquet'),
+                          [ColumnarTable.from_records(records, fields)],
+                          arrow_schema(load_bigquery_fields(table_name)))
+        event_schema = arrow_schema(load_bigquery_fields('viewing_events'))
+
+        def encode(columns):
+            table = event_columns_to_table(columns, users_data, contents_data)
+            return parquet_bytes(columnar_to_arrow(table, event_schema))
+    else:
+        for table_name, records in (('contents', contents_data), ('users', users_data)):
+            write_ndjson(ndjson_path(os.path.join(output_dir, f'{table_name}.ndjson'), compression),
+                         [records], label=table_name, compression=compression)
+
+        def encode(columns):
+            return compress_ndjson(event_columns_to_ndjson(columns, users_data, contents_data), compression)
+
+    table_dir = os.path.join(output_dir, 'viewing_events')
+    if is_lake(table_dir):
+        shutil.rmtree(table_dir)
+    writer = LakeWriter(table_dir, 'viewing_events', fmt, encode, compression)
+
+    progress = ProgressReporter('viewing_events', total=num_events)
+    for columns in iter_event_columns(users_data, contents_data, num_events, batch_size, seed):
+        progress.update(len(columns['event_id']), writer.write_batch(columns))
+    manifest = writer.close()
+    print(f"Wrote {len(manifest['partitions'])} date partitions to {table_dir}/")
+    return progress.finish()
+
+def _generate_shard(task):
+    """Generate the users and viewing events owned by one shard"""
+    seed_sequence, contents_data, user_start, num_users, num_events, output_dir, shard_index, run_id = task
+    users_data = generate_users(num_users, rng=random.Random(python_seed(seed_sequence)),
+                                start_index=user_start)
+    catalog = encode_catalog(contents_data, users_data)
+    event_ids, session_ids = IdAllocator(run_id, shard_index), IdAllocator(run_id, shard_index)
+    columns = generate_event_columns(np.random.default_rng(seed_sequence), catalog, num_events,
+                                     event_ids, session_ids)
+    viewing_events_data = event_columns_to_records(columns, users_data, contents_data)
+
+    if output_dir is None:
+        return users_data, viewing_events_data
+
+    # Write this shard's part files directly instead of shipping rows back
+    with open(os.path.join(output_dir, f'users-{shard_index:05d}.json'), 'w') as f:
+        json.dump(users_data, f, indent=2)
+    with open(os.path.join(output_dir, f'viewing_events-{shard_index:05d}.json'), 'w') as f:
+        json.dump(viewing_events_data, f, indent=2)
+    return len(users_data), len(viewing_events_data)
+
+def generate_sharded_sample_data(num_shards, seed, processes=None, num_contents=200,
+                                 num_users=10000, num_events=100000, output_dir=None):
+    """Generate sample data across a process pool with one reproducible seed per shard
+
+    Contents are generated once from the run seed and shared by every shard.
+    Users are split into contiguous ranges, and each shard generates the
+    events for its own users, in proportion to its share of the users. Event
+    and session ids embed the shard number, so they never collide across
+    shards. The same seed and shard count always give identical output. When output_dir
+    is set, each shard writes its own part files and only counts are
+    returned.
+    """
+    root_seed, *seeds = shard_seeds(seed, num_shards + 1)
+    run_id = run_id_for_seed(seed)
+    contents_data = generate_contents(num_contents, rng=random.Random(python_seed(root_seed)))
+
+    user_ranges = split_evenly(num_users, num_shards)
+    event_counts = split_proportionally(num_events, [count for _, count in user_ranges])
+    tasks = [
+        (seeds[i], contents_data, start, count, event_counts[i], output_dir, i, run_id)
+        for i, (start, count) in enumerate(user_ranges)
+    ]
+    results = run_shards(_generate_shard, tasks, processes)
+
+    if output_dir is not None:
+        return contents_data, results
+
+    # Merge shard results in shard order
+    users_data = [user for shard_users, _ in results for user in shard_users]
+    viewing_events_data = [event for _, shard_events in results for event in shard_events]
     return contents_data, users_data, viewing_events_data
 
-def save_sample_data():
-    """Save the sample data to JSON files"""
+def save_sample_data(num_shards=1, seed=None, processes=None, split_output=False,
+                     num_contents=200, num_users=10000, num_events=100000, output_dir='data/raw'):
+    """Save the sample data to JSON files
+
+    With a seed or more than one shard, generation runs in a process pool
+    (see generate_sharded_sample_data). split_output writes one users and one
+    viewing_events part per shard under data/raw/parts/ instead of merging.
+    """
     # Ensure the data/raw directory exists
-    os.makedirs('data/raw', exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
+    sizes = dict(num_contents=num_contents, num_users=num_users, num_events=num_events)
+    
+    if split_output:
+        parts_dir = os.path.join(output_dir, 'parts')
+        os.makedirs(parts_dir, exist_ok=True)
+        contents_data, part_counts = generate_sharded_sample_data(
+            num_shards, seed, processes, output_dir=parts_dir, **sizes)
+        with open(os.path.join(output_dir, 'contents.json'), 'w') as f:
+            json.dump(contents_data, f, indent=2)
+        print(f"Sample data saved to {output_dir}/ ({len(part_counts)} parts in {parts_dir}/)")
+        return
     
     # Generate realistic sample data
-    contents_data, users_data, viewing_events_data = generate_realistic_sample_data()
+    if num_shards > 1 or seed is not None:
+        contents_data, users_data, viewing_events_data = generate_sharded_sample_data(
+            num_shards, seed, processes, **sizes)
+    else:
+        contents_data, users_data, viewing_events_data = generate_realistic_sample_data(**sizes)
     
     # Save the data to files
-    with open('data/raw/contents.json', 'w') as f:
+    with open(os.path.join(output_dir, 'contents.json'), 'w') as f:
         json.dump(contents_data, f, indent=2)
     
-    with open('data/raw/users.json', 'w') as f:
+    with open(os.path.join(output_dir, 'users.json'), 'w') as f:
         json.dump(users_data, f, indent=2)
     
-    with open('data/raw/viewing_events.json', 'w') as f:
+    with open(os.path.join(output_dir, 'viewing_events.json'), 'w') as f:
         json.dump(viewing_events_data, f, indent=2)
     
-    print("Sample data saved to data/raw/")
+    print(f"Sample data saved to {output_dir}/")
 
 def setup_bigquery():
-    """Set up BigQuery tables and load data"""
+    """Set up BigQuery tables and load data (or the local database, with NETFLIX_BACKEND=local)"""
+    from query_backend import get_client, load_local, local_backend
+
+    if local_backend():
+        print("Loading data into the local database...")
+        client = get_client()
+        load_local(client)
+        client.close()
+        return
+
     # Import and run the BigQuery setup script
     from setup_bigquery import create_dataset_and_tables, load_data_to_bigquery
     
+    # One client shared by table creation and the concurrent loads
+    client = bigquery.Client()
+
     print("Setting up BigQuery tables...")
-    create_dataset_and_tables()
+    create_dataset_and_tables(client)
     
     print("Loading data into BigQuery...")
-    load_data_to_bigquery()
+    load_data_to_bigquery(client)
 
 def create_views():
     """Create BigQuery views for data processing"""
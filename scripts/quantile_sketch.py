@@ -0,0 +1,63 @@
+"""Mergeable quantile sketches of nonnegative metrics, as SQL.
+
+A sketch is a histogram over logarithmic buckets, as in DDSketch: a value
+x > 0 falls in bucket CEIL(LN(x) / LN(GAMMA)), zero in ZERO_BUCKET, and every
+value of a bucket is within RELATIVE_ACCURACY of the bucket's representative
+value. Sketches are stored as (bucket, value_count) rows, so the sketches of
+any days or groups merge by summing the counts per bucket, and a quantile
+read off merged counts is within RELATIVE_ACCURACY of the exact one.
+"""
+import math
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+ZERO_BUCKET = -100000
+# Values at or below this are counted as zero
+MIN_VALUE = 1e-9
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+def bucket_sql(value):
+    """SQL expression of the bucket a value falls in"""
+    return (f"CASE WHEN {value} <= {MIN_VALUE} THEN {ZERO_BUCKET} "
+            f"ELSE CAST(CEIL(LN({value}) / {math.log(GAMMA)!r}) AS INT64) END")
+
+def bucket_value_sql(bucket):
+    """SQL expression of a bucket's representative value"""
+    return f"CASE WHEN {bucket} = {ZERO_BUCKET} THEN 0 ELSE 2 * POW({GAMMA!r}, {bucket}) / {GAMMA + 1!r} END"
+
+def percentiles_sql(sketch_table, keys, metrics, quantiles=QUANTILES):
+    """SELECT of the keys and a <prefix>_p<NN> column per metric and quantile
+
+    sketch_table has the keys, metric, bucket and value_count columns;
+    metrics maps the metric names to read to their column prefix. The rows of
+    every day are merged, so the percentiles are over the table's whole range.
+    """
+    keys_sql = ', '.join(keys)
+    percent = {q: round(q * 100) for q in quantiles}
+    bucket_columns = ', '.join(
+        f"MIN(CASE WHEN cumulative_count > {q} * (total_count - 1) THEN bucket END) as p{percent[q]}_bucket"
+        for q in quantiles)
+    value_columns = ', '.join(
+        f"MAX(CASE WHEN metric = '{metric}' THEN {bucket_value_sql(f'p{percent[q]}_bucket')} END) as {prefix}_p{percent[q]}"
+        for metric, prefix in metrics.items() for q in quantiles)
+    return f"""
+        SELECT {keys_sql}, {value_columns}
+        FROM (
+            SELECT {keys_sql}, metric, {bucket_columns}
+            FROM (
+                SELECT
+                    {keys_sql},
+                    metric,
+                    bucket,
+                    SUM(SUM(value_count)) OVER (PARTITION BY {keys_sql}, metric ORDER BY bucket
+                                                ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) as cumulative_count,
+                    SUM(SUM(value_count)) OVER (PARTITION BY {keys_sql}, metric) as total_count
+                FROM `{sketch_table}`
+                WHERE metric IN ({', '.join(f"'{metric}'" for metric in metrics)})
+                GROUP BY {keys_sql}, metric, bucket
+            )
+            GROUP BY {keys_sql}, metric
+        )
+        GROUP BY {keys_sql}
+    """
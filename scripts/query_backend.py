@@ -0,0 +1,289 @@
+"""Pluggable query backend: BigQuery, or an embedded DuckDB database for local runs.
+
+The downstream scripts (create_dashboard_views, create_visualizations,
+analyze_data, check_data_counts, verify_setup) get their client from
+get_client(). By default that is bigquery.Client(); with
+
+    NETFLIX_BACKEND=local
+
+it is a LocalClient over a DuckDB file (NETFLIX_LOCAL_DB, default
+data/local/netflix_analytics.duckdb) that answers the same client.query()
+calls: the BigQuery table names (`project.netflix_analytics.table`,
+netflix_analytics.table) map onto a netflix_analytics schema, @name query
+parameters onto DuckDB's, and results come back as BigQuery Rows or
+DataFrames. The tables are created from schemas/bigquery_schemas.json
+(RECORDs become STRUCTs, REPEATED fields lists) and filled from the data/raw
+files with the same readers setup_bigquery.py loads from:
+
+    python scripts/query_backend.py                  # load data/raw and create the views
+    NETFLIX_BACKEND=local python scripts/create_visualizations.py
+"""
+import argparse
+import gzip
+import io
+import os
+import re
+import time
+import pyarrow as pa
+import pyarrow.json as pj
+import pyarrow.parquet as pq
+from google.cloud import bigquery
+from google.cloud.bigquery.table import Row
+
+DATASET = 'netflix_analytics'
+DEFAULT_DB_PATH = 'data/local/netflix_analytics.duckdb'
+
+_DUCKDB_TYPES = {
+    'STRING': 'VARCHAR',
+    'INTEGER': 'BIGINT',
+    'FLOAT': 'DOUBLE',
+    'BOOLEAN': 'BOOLEAN',
+    'TIMESTAMP': 'TIMESTAMP',
+    'DATE': 'DATE'
+}
+
+_QUOTED_NAME = re.compile(r'`([^`]+)`')
+_PARAMETER = re.compile(r'@(\w+)')
+_IN_UNNEST = re.compile(r'\bIN\s+UNNEST\((\$\w+)\)', re.IGNORECASE)
+_DML = ('INSERT', 'UPDATE', 'DELETE', 'MERGE')
+
+def local_backend():
+    """Whether the scripts should run against the local DuckDB database"""
+    return os.environ.get('NETFLIX_BACKEND', 'bigquery').lower() in ('local', 'duckdb')
+
+def is_local(client):
+    """Whether client is a LocalClient (by marker, as this module may also run as __main__)"""
+    return getattr(client, 'local', False)
+
+def get_client():
+    """bigquery.Client(), or a LocalClient if NETFLIX_BACKEND=local"""
+    if local_backend():
+        return LocalClient(os.environ.get('NETFLIX_LOCAL_DB', DEFAULT_DB_PATH))
+    return bigquery.Client()
+
+def duckdb_type(field_def):
+    """DuckDB column type for one BigQuery schema field definition"""
+    if field_def['field_type'] == 'RECORD':
+        column_type = f"STRUCT({', '.join(column_definition(child) for child in field_def['fields'])})"
+    else:
+        column_type = _DUCKDB_TYPES[field_def['field_type']]
+    return f"{column_type}[]" if field_def['mode'] == 'REPEATED' else column_type
+
+def column_definition(field_def):
+    return f'"{field_def["name"]}" {duckdb_type(field_def)}'
+
+def _local_name(match):
+    # project.dataset.table -> "dataset"."table"; the local database has no projects
+    parts = match.group(1).split('.')
+    if len(parts) == 3:
+        parts = parts[1:]
+    return '.'.join(f'"{part}"' for part in parts)
+
+def translate_sql(query):
+    """BigQuery SQL as DuckDB SQL: table names, query parameters and IN UNNEST(@array)
+
+    Everything else the pipeline's queries use (struct field access, window
+    functions, DATE(), CREATE OR REPLACE VIEW) is the same in both dialects.
+    """
+    query = _PARAMETER.sub(r'$\1', _QUOTED_NAME.sub(_local_name, query))
+    return _IN_UNNEST.sub(r'IN (SELECT UNNEST(\1))', query)
+
+def _parameter_values(job_config):
+    values = {}
+    for parameter in getattr(job_config, 'query_parameters', None) or []:
+        values[parameter.name] = parameter.values if hasattr(parameter, 'values') else parameter.value
+    return values
+
+def bigquery_field(arrow_field):
+    """SchemaField describing a result column, as BigQuery would report it"""
+    arrow_type, mode = arrow_field.type, 'NULLABLE'
+    if pa.types.is_list(arrow_type):
+        arrow_type, mode = arrow_type.value_type, 'REPEATED'
+    if pa.types.is_struct(arrow_type):
+        return bigquery.SchemaField(arrow_field.name, 'RECORD', mode=mode,
+                                    fields=[bigquery_field(child) for child in arrow_type])
+    if pa.types.is_integer(arrow_type):
+        field_type = 'INTEGER'
+    elif pa.types.is_floating(arrow_type):
+        field_type = 'FLOAT'
+    elif pa.types.is_boolean(arrow_type):
+        field_type = 'BOOLEAN'
+    elif pa.types.is_timestamp(arrow_type):
+        field_type = 'TIMESTAMP'
+    elif pa.types.is_date(arrow_type):
+        field_type = 'DATE'
+    else:
+        field_type = 'STRING'
+    return bigquery.SchemaField(arrow_field.name, field_type, mode=mode)
+
+def bigquery_result_types(arrow_table):
+    """Cast DuckDB's wider result types to what BigQuery returns
+
+    DuckDB sums integers into HUGEINTs, which arrive as decimals; BigQuery
+    gives INT64 (and FLOAT64 for the rest of its numeric results).
+    """
+    fields = []
+    for field in arrow_table.schema:
+        if pa.types.is_decimal(field.type):
+            field = field.with_type(pa.int64() if field.type.scale == 0 else pa.float64())
+        fields.append(field)
+    return arrow_table.cast(pa.schema(fields))
+
+class LocalRowIterator:
+    """The rows of a local query, shaped like a BigQuery RowIterator"""
+
+    def __init__(self, arrow_table):
+        self.arrow_table = bigquery_result_types(arrow_table)
+        self.schema = [bigquery_field(field) for field in self.arrow_table.schema]
+        self.total_rows = arrow_table.num_rows
+
+    def __iter__(self):
+        field_to_index = {field.name: index for index, field in enumerate(self.schema)}
+        columns = [column.to_pylist() for column in self.arrow_table.columns]
+        for values in zip(*columns):
+            yield Row(values, field_to_index)
+
+    def to_dataframe(self):
+        return self.arrow_table.to_pandas()
+
+class LocalQueryJob:
+    """A finished local query, shaped like a BigQuery QueryJob"""
+
+    def __init__(self, arrow_table, num_dml_affected_rows=None):
+        self._rows = LocalRowIterator(arrow_table)
+        self.num_dml_affected_rows = num_dml_affected_rows
+
+    def result(self):
+        return self._rows
+
+    def to_dataframe(self):
+        return self._rows.to_dataframe()
+
+class LocalClient:
+    """client.query() over an embedded DuckDB database holding the netflix_analytics tables and views"""
+
+    project = 'local'
+    local = True
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        import duckdb
+
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        # Attached under a fixed name, since a catalog named like the file
+        # (e.g. netflix_analytics.duckdb) would clash with the schema
+        self.connection = duckdb.connect()
+        self.connection.execute(f"ATTACH '{db_path}' AS warehouse")
+        self._cursor().execute(f"CREATE SCHEMA IF NOT EXISTS {DATASET}")
+
+    def _cursor(self):
+        # A cursor per query, so threads can share the client; cursors don't
+        # inherit session settings
+        cursor = self.connection.cursor()
+        cursor.execute("USE warehouse")
+        # Timestamps are stored as UTC, like BigQuery's
+        cursor.execute("SET TimeZone = 'UTC'")
+        return cursor
+
+    def close(self):
+        self.connection.close()
+
+    def query(self, query, job_config=None):
+        cursor = self._cursor()
+        cursor.execute(translate_sql(query), _parameter_values(job_config))
+        arrow_table = cursor.arrow().read_all()
+        statement = query.lstrip().split(None, 1)[0].upper()
+        if statement in _DML:
+            return LocalQueryJob(arrow_table.slice(0, 0), arrow_table.column(0)[0].as_py())
+        if arrow_table.schema.names == ['Count'] and statement != 'SELECT':
+            # DDL reports a row count; BigQuery returns no rows for it
+            arrow_table = arrow_table.slice(0, 0)
+        return LocalQueryJob(arrow_table)
+
+    def create_table(self, table_name, fields, replace=True):
+        columns = ', '.join(column_definition(field_def) for field_def in fields)
+        create = 'CREATE OR REPLACE TABLE' if replace else 'CREATE TABLE IF NOT EXISTS'
+        self._cursor().execute(f'{create} {DATASET}."{table_name}" ({columns})')
+
+    def insert_arrow(self, table_name, arrow_table):
+        cursor = self._cursor()
+        cursor.register('chunk', arrow_table)
+        cursor.execute(f'INSERT INTO {DATASET}."{table_name}" BY NAME SELECT * FROM chunk')
+        cursor.unregister('chunk')
+
+def chunk_to_arrow(chunk, parse_options):
+    """Arrow table for one load chunk: Parquet bytes, or (gzip) NDJSON bytes"""
+    if chunk[:4] == b'PAR1':
+        return pq.read_table(io.BytesIO(chunk))
+    if chunk[:2] == b'\x1f\x8b':
+        chunk = gzip.decompress(chunk)
+    return pj.read_json(io.BytesIO(chunk), parse_options=parse_options,
+                        read_options=pj.ReadOptions(block_size=1 << 26))
+
+def load_local(client, data_dir='data/raw', chunk_records=100000, start_date=None, end_date=None):
+    """Create the local tables from the schema file and fill them from data_dir
+
+    start_date/end_date limit viewing_events to those days, if its data is a
+    lake directory. Returns {table_name: {'rows', 'seconds'}}.
+    """
+    from parquet_io import SCHEMA_KEYS, arrow_schema
+    from setup_bigquery import load_schemas, open_load_chunks
+    from stream_io import find_data_file
+
+    schemas = load_schemas()
+    results = {}
+    for table_name, schema_key in SCHEMA_KEYS.items():
+        started = time.time()
+        fields = schemas[schema_key]
+        parse_options = pj.ParseOptions(explicit_schema=arrow_schema(fields), unexpected_field_behavior='ignore')
+        client.create_table(table_name, fields)
+
+        file_path = find_data_file(table_name, data_dir)
+        dates = (start_date, end_date) if table_name == 'viewing_events' else (None, None)
+        rows = 0
+        source, chunks = open_load_chunks(file_path, chunk_records, *dates)
+        with source:
+            for chunk in chunks:
+                arrow_table = chunk_to_arrow(chunk, parse_options)
+                client.insert_arrow(table_name, arrow_table)
+                rows += arrow_table.num_rows
+        results[table_name] = {'rows': rows, 'seconds': time.time() - started}
+        print(f"Loaded {rows} rows into local {table_name} from {file_path} "
+              f"in {results[table_name]['seconds']:.2f}s")
+    return results
+
+def build_local_wide(client):
+    """Rebuild viewing_events_wide (see wide_events.py) from the local tables; returns its row count"""
+    from setup_bigquery import load_schemas
+    from wide_events import WIDE_TABLE, wide_select_sql
+
+    started = time.time()
+    client.query(f"CREATE OR REPLACE TABLE `{DATASET}.{WIDE_TABLE}` AS "
+                 f"{wide_select_sql(DATASET, load_schemas())}")
+    rows = next(iter(client.query(f"SELECT COUNT(*) AS n FROM `{DATASET}.{WIDE_TABLE}`").result())).n
+    print(f"Built local {WIDE_TABLE} ({rows} rows) in {time.time() - started:.2f}s")
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load data/raw into the local DuckDB database and create the views")
+    parser.add_argument('--db', default=os.environ.get('NETFLIX_LOCAL_DB', DEFAULT_DB_PATH))
+    parser.add_argument('--data-dir', default='data/raw')
+    parser.add_argument('--start-date', help="First day (YYYY-MM-DD) of viewing_events to load")
+    parser.add_argument('--end-date', help="Last day (YYYY-MM-DD) of viewing_events to load")
+    parser.add_argument('--wide', action='store_true', help="Also build viewing_events_wide")
+    args = parser.parse_args()
+
+    from create_dashboard_views import VIEW_NAMES, create_bigquery_views
+
+    client = LocalClient(args.db)
+    load_local(client, data_dir=args.data_dir, start_date=args.start_date, end_date=args.end_date)
+    if args.wide:
+        build_local_wide(client)
+    create_bigquery_views(client)
+
+    # A baseline for the dashboard queries
+    for view_name in VIEW_NAMES:
+        started = time.time()
+        rows = client.query(f"SELECT * FROM {DATASET}.{view_name}").result().total_rows
+        print(f"Queried {view_name}: {rows} rows in {time.time() - started:.3f}s")
@@ -0,0 +1,241 @@
+"""Replay simulated viewing events as a time-ordered stream at a controlled rate.
+
+Events come from JSON/NDJSON files, plain or .gz/.zst compressed (sorted in
+memory, or merged lazily when each file is already time-ordered) or straight
+from the generator, and are written to stdout, a file that can be followed
+with `tail -f`, or a TCP socket. Pacing is either a fixed events/sec rate or a speed-up factor
+applied to the gaps between event timestamps.
+
+Example:
+    python scripts/replay_events.py --input data/raw/viewing_events.ndjson \
+        --rate 5000 --output tcp:localhost:9999
+"""
+import argparse
+import heapq
+import itertools
+import json
+import math
+import random
+import re
+import socket
+import sys
+import time
+from datetime import datetime
+import numpy as np
+from stream_io import open_ndjson
+
+_TIMESTAMP = re.compile(rb'"timestamp":\s*"([^"]+)"')
+
+def _line_timestamp(line):
+    """Pull the event timestamp out of an NDJSON line without a full parse"""
+    match = _TIMESTAMP.search(line)
+    return match.group(1).decode() if match else json.loads(line)['timestamp']
+
+def _read_events(path):
+    """Yield (timestamp, ndjson_line) pairs from a JSON array or NDJSON file (optionally .gz/.zst)"""
+    with open_ndjson(path) as f:
+        # Compressed streams can't seek back, so the sniffed byte is put back in front
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        if first == b'[':
+            for event in json.loads(first + f.read()):
+                yield event['timestamp'], (json.dumps(event, separators=(',', ':')) + '\n').encode()
+        elif first:
+            for line in itertools.chain([first + f.readline()], f):
+                if line.strip():
+                    yield _line_timestamp(line), line if line.endswith(b'\n') else line + b'\n'
+
+def iter_sorted_events(paths, presorted=False):
+    """Yield events from all files in timestamp order
+
+    ISO timestamps sort correctly as strings. With presorted=True each file
+    must already be time-ordered and the files are k-way merged lazily, so
+    memory stays constant; otherwise all events are loaded and sorted.
+    """
+    streams = [_read_events(path) for path in paths]
+    if presorted:
+        yield from heapq.merge(*streams, key=lambda event: event[0])
+    else:
+        events = [event for stream in streams for event in stream]
+        events.sort(key=lambda event: event[0])
+        yield from events
+
+def iter_generated_events(num_events, seed=None):
+    """Generate events with the vectorized engine and yield them in timestamp order
+
+    Columns are sorted with a stable argsort on timestamp and encoded to
+    NDJSON in one pass, so no event dicts are built.
+    """
+    from event_engine import encode_catalog, generate_event_columns, event_columns_to_ndjson
+    from id_allocation import IdAllocator, run_id_for_seed
+    from process_streaming_data import generate_contents, generate_users
+    py_rng = random.Random(seed) if seed is not None else random
+    contents_data = generate_contents(rng=py_rng)
+    users_data = generate_users(rng=py_rng)
+
+    run_id = run_id_for_seed(seed)
+    columns = generate_event_columns(np.random.default_rng(seed), encode_catalog(contents_data, users_data),
+                                     num_events, IdAllocator(run_id), IdAllocator(run_id))
+    order = np.argsort(columns["timestamp"], kind="stable")
+    columns = {name: values[order] for name, values in columns.items()}
+    timestamps = np.datetime_as_string(columns["timestamp"], unit="s").tolist()
+    lines = event_columns_to_ndjson(columns, users_data, contents_data).splitlines(keepends=True)
+    yield from zip(timestamps, lines)
+
+def iter_schedule(events, rate=None, speedup=None):
+    """Attach a target emit offset (seconds from the start) to each event"""
+    if rate:
+        for i, (_, line) in enumerate(events):
+            yield i / rate, line
+        return
+
+    start = None
+    for timestamp, line in events:
+        event_time = datetime.fromisoformat(timestamp).timestamp()
+        if start is None:
+            start = event_time
+        yield (event_time - start) / (speedup or 1.0), line
+
+def open_sink(spec):
+    """Open an output sink: '-' for stdout, 'file:PATH' or 'tcp:HOST:PORT'"""
+    if spec in (None, '-', 'stdout'):
+        out = sys.stdout.buffer
+        return out.write, out.flush, lambda: out.flush()
+    if spec.startswith('file:'):
+        f = open(spec[len('file:'):], 'ab')
+        return f.write, f.flush, f.close
+    if spec.startswith('tcp:'):
+        host, port = spec[len('tcp:'):].rsplit(':', 1)
+        conn = socket.create_connection((host, int(port)))
+        return conn.sendall, (lambda: None), conn.close
+    raise ValueError(f"Unknown output {spec!r}; use '-', 'file:PATH' or 'tcp:HOST:PORT'")
+
+class LagStats:
+    """Running lag statistics with a bounded reservoir for percentiles"""
+
+    def __init__(self, reservoir_size=100000, seed=0):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.max = 0.0
+        self.reservoir = []
+        self.reservoir_size = reservoir_size
+        self.rng = random.Random(seed)
+
+    def add(self, lag):
+        self.count += 1
+        delta = lag - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (lag - self.mean)
+        self.max = max(self.max, lag)
+        if len(self.reservoir) < self.reservoir_size:
+            self.reservoir.append(lag)
+        else:
+            slot = self.rng.randrange(self.count)
+            if slot < self.reservoir_size:
+                self.reservoir[slot] = lag
+
+    def percentile(self, q):
+        if not self.reservoir:
+            return 0.0
+        ordered = sorted(self.reservoir)
+        return ordered[min(len(ordered) - 1, int(math.ceil(q * len(ordered))) - 1)]
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.m2 / self.count) if self.count else 0.0
+
+def _report(label, emitted, elapsed, lags):
+    print(f"[replay] {label}: {emitted:,} events in {elapsed:.1f}s "
+          f"({emitted / max(elapsed, 1e-9):,.0f} events/sec), "
+          f"lag p50={lags.percentile(0.5) * 1000:.1f}ms p99={lags.percentile(0.99) * 1000:.1f}ms "
+          f"max={lags.max * 1000:.1f}ms, jitter={lags.stdev * 1000:.1f}ms", file=sys.stderr)
+
+def replay(scheduled, write, flush, max_batch=1000, report_interval=5.0):
+    """Emit scheduled (offset, line) pairs on time and return throughput and lag stats
+
+    Events that are due are written in batches of up to max_batch, so high
+    rates don't pay for one sleep per event. Lag is how late each event was
+    written relative to its target time, and jitter is the standard deviation
+    of that lag.
+    """
+    lags = LagStats()
+    emitted = 0
+    pending = []
+    start = None
+
+    for offset, line in scheduled:
+        now = time.perf_counter()
+        if start is None:
+            # Start the clock once the first event is ready, not while inputs load
+            start = now
+            next_report = start + report_interval
+        due = start + offset
+        if due > now or len(pending) >= max_batch:
+            if pending:
+                write(b''.join(line for _, line in pending))
+                flush()
+                written_at = time.perf_counter()
+                for target, _ in pending:
+                    lags.add(max(written_at - target, 0.0))
+                emitted += len(pending)
+                pending = []
+            now = time.perf_counter()
+            if due > now:
+                time.sleep(due - now)
+        pending.append((due, line))
+
+        if now >= next_report:
+            _report("progress", emitted, now - start, lags)
+            next_report = now + report_interval
+
+    if pending:
+        write(b''.join(line for _, line in pending))
+        flush()
+        written_at = time.perf_counter()
+        for target, _ in pending:
+            lags.add(max(written_at - target, 0.0))
+        emitted += len(pending)
+
+    elapsed = time.perf_counter() - start if start is not None else 0.0
+    _report("done", emitted, elapsed, lags)
+    return {
+        'events': emitted,
+        'seconds': elapsed,
+        'events_per_sec': emitted / elapsed if elapsed else 0.0,
+        'lag_p50_ms': lags.percentile(0.5) * 1000,
+        'lag_p99_ms': lags.percentile(0.99) * 1000,
+        'lag_max_ms': lags.max * 1000,
+        'jitter_ms': lags.stdev * 1000
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay viewing events as a rate-controlled stream")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input', nargs='+', help="JSON array or NDJSON event files (.gz/.zst too)")
+    source.add_argument('--generate', type=int, metavar='N', help="Generate N events instead of reading files")
+    pacing = parser.add_mutually_exclusive_group(required=True)
+    pacing.add_argument('--rate', type=float, help="Target events per second")
+    pacing.add_argument('--speedup', type=float, help="Replay event-time gaps this many times faster")
+    parser.add_argument('--presorted', action='store_true',
+                        help="Input files are already time-ordered; merge them lazily")
+    parser.add_argument('--output', default='-', help="'-' (stdout), 'file:PATH' or 'tcp:HOST:PORT'")
+    parser.add_argument('--seed', type=int, help="Seed for --generate")
+    parser.add_argument('--max-batch', type=int, default=1000, help="Most events written per write call")
+    args = parser.parse_args(argv)
+
+    if args.generate is not None:
+        events = iter_generated_events(args.generate, args.seed)
+    else:
+        events = iter_sorted_events(args.input, presorted=args.presorted)
+
+    write, flush, close = open_sink(args.output)
+    try:
+        return replay(iter_schedule(events, rate=args.rate, speedup=args.speedup),
+                      write, flush, max_batch=args.max_batch)
+    finally:
+        close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Migrate live BigQuery tables to schemas/bigquery_schemas.json without dropping them.
+
+The wanted schema is compared field by field (recursing into RECORDs) with
+the live table's schema:
+- unchanged tables are left alone;
+- additive changes are applied in place with update_table: new NULLABLE or
+  REPEATED fields (top level or nested) and REQUIRED fields relaxed to
+  NULLABLE. Clustering changes are applied in place too;
+- anything else (a type change, a mode tightened or changed to/from
+  REPEATED, a removed field, a new REQUIRED field, different partitioning)
+  can't be done in place, so the table is recreated and must be reloaded.
+"""
+
+# Standard SQL type names BigQuery may report for a field, as the schema file spells them
+TYPE_ALIASES = {'INT64': 'INTEGER', 'FLOAT64': 'FLOAT', 'BOOL': 'BOOLEAN', 'STRUCT': 'RECORD'}
+
+def schema_field_def(field):
+    """A live SchemaField as a schema-file field definition"""
+    field_def = {
+        'name': field.name,
+        'field_type': TYPE_ALIASES.get(field.field_type, field.field_type),
+        'mode': field.mode or 'NULLABLE'
+    }
+    if field.fields:
+        field_def['fields'] = [schema_field_def(child) for child in field.fields]
+    return field_def
+
+class SchemaDiff:
+    """Differences between a live and a wanted schema, and the in-place result
+
+    merged is the schema to apply with update_table: the live fields in their
+    order (relaxed where asked), followed by the new fields.
+    """
+
+    def __init__(self):
+        self.added = []
+        self.relaxed = []
+        self.incompatible = []
+        self.merged = []
+
+    @property
+    def changed(self):
+        return bool(self.added or self.relaxed or self.incompatible)
+
+    @property
+    def in_place(self):
+        """Whether every change can be applied without recreating the table"""
+        return not self.incompatible
+
+    def changes(self):
+        return ([f"add {path}" for path in self.added] + [f"relax {path} to NULLABLE" for path in self.relaxed]
+                + self.incompatible)
+
+def _diff_fields(live_fields, wanted_fields, prefix, diff):
+    """Compare one level of fields, recording changes on diff; returns the merged fields"""
+    # BigQuery column names are case-insensitive
+    wanted_by_name = {field_def['name'].lower(): field_def for field_def in wanted_fields}
+    live_names = {field_def['name'].lower() for field_def in live_fields}
+    merged = []
+    for live in live_fields:
+        path = prefix + live['name']
+        wanted = wanted_by_name.get(live['name'].lower())
+        if wanted is None:
+            diff.incompatible.append(f"{path} was removed")
+            merged.append(live)
+            continue
+
+        field_def = dict(live)
+        if wanted['field_type'] != live['field_type']:
+            diff.incompatible.append(f"{path} changed type from {live['field_type']} to {wanted['field_type']}")
+        if wanted['mode'] != live['mode']:
+            if (live['mode'], wanted['mode']) == ('REQUIRED', 'NULLABLE'):
+                diff.relaxed.append(path)
+                field_def['mode'] = 'NULLABLE'
+            else:
+                diff.incompatible.append(f"{path} changed mode from {live['mode']} to {wanted['mode']}")
+        if live['field_type'] == 'RECORD' and wanted['field_type'] == 'RECORD':
+            field_def['fields'] = _diff_fields(live.get('fields', []), wanted.get('fields', []), path + '.', diff)
+        merged.append(field_def)
+
+    for wanted in wanted_fields:
+        if wanted['name'].lower() in live_names:
+            continue
+        path = prefix + wanted['name']
+        if wanted['mode'] == 'REQUIRED':
+            diff.incompatible.append(f"{path} is a new REQUIRED field (existing rows have no value)")
+        else:
+            diff.added.append(path)
+        merged.append(wanted)
+    return merged
+
+def diff_schema(live_schema, wanted_fields):
+    """Diff a live table's SchemaFields against the schema file's field definitions"""
+    diff = SchemaDiff()
+    diff.merged = _diff_fields([schema_field_def(field) for field in live_schema], wanted_fields, '', diff)
+    return diff
+
+def same_partitioning(existing, table):
+    """Whether an existing table is partitioned the way table is (or both aren't)"""
+    current, wanted = existing.time_partitioning, table.time_partitioning
+    if current is None or wanted is None:
+        return current is None and wanted is None
+    return current.type_ == wanted.type_ and current.field == wanted.field
+
+def plan_migration(existing, table, wanted_fields):
+    """Decide how to bring an existing table (or None) to table's schema and options
+
+    Returns (action, diff, changes) where action is 'create', 'unchanged',
+    'update' (in place) or 'recreate', and changes lists what differs.
+    """
+    if existing is None:
+        return 'create', None, []
+    diff = diff_schema(existing.schema, wanted_fields)
+    changes = diff.changes()
+    if not same_partitioning(existing, table):
+        changes.append("partitioning changed")
+        return 'recreate', diff, changes
+    if not diff.in_place:
+        return 'recreate', diff, changes
+    if (existing.clustering_fields or None) != (table.clustering_fields or None):
+        changes.append(f"clustering {existing.clustering_fields} -> {table.clustering_fields}")
+    return ('update' if changes else 'unchanged'), diff, changes
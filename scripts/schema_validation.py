@@ -0,0 +1,295 @@
+"""Validate rows against schemas/bigquery_schemas.json before they are loaded.
+
+Each table's schema is compiled once into:
+- a record validator, generated Python code that checks one decoded row's
+  types, REQUIRED modes, nested RECORDs and REPEATED fields the way a
+  BigQuery JSON load would, and names every problem it finds;
+- a strict Arrow schema (REQUIRED fields and repeated elements non-nullable,
+  unknown fields rejected) used to parse whole NDJSON chunks at once. A chunk
+  that parses is valid as a whole; one that doesn't is bisected until the bad
+  rows are isolated and checked one by one;
+- vectorized null checks for Parquet chunks, which already carry types.
+
+Invalid rows are appended to a quarantine NDJSON file with their errors, so
+the rest of the chunk still loads.
+"""
+import gzip
+import io
+import json
+import os
+import re
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.json as pj
+import pyarrow.parquet as pq
+from parquet_io import _ARROW_TYPES, parquet_bytes
+from stream_io import compress_ndjson
+
+# Values BigQuery accepts in JSON for each type besides the native JSON ones
+_INTEGER = re.compile(r'[+-]?\d+')
+_FLOAT = re.compile(r'[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?|[+-]?(inf|infinity|nan)', re.IGNORECASE)
+_TIMESTAMP = re.compile(r'\d{4}-\d{1,2}-\d{1,2}([ T]\d{1,2}:\d{1,2}(:\d{1,2}(\.\d{1,6})?)?)?'
+                        r'\s*(Z|UTC|[+-]\d{1,2}(:?\d{2})?)?', re.IGNORECASE)
+
+# field_type -> expression that is true when `value` (not None) is valid
+_TYPE_CHECKS = {
+    'STRING': "value.__class__ is str",
+    'INTEGER': "value.__class__ is int or (value.__class__ is str and _INTEGER.fullmatch(value) is not None)",
+    'FLOAT': "value.__class__ in (float, int) or (value.__class__ is str and _FLOAT.fullmatch(value) is not None)",
+    'BOOLEAN': "value.__class__ is bool or (value.__class__ is str and value.lower() in ('true', 'false'))",
+    'TIMESTAMP': "value.__class__ in (int, float) or (value.__class__ is str and _TIMESTAMP.fullmatch(value) is not None)",
+    'RECORD': "value.__class__ is dict"
+}
+
+# Arrow chunks larger than this many rows that fail to parse are split in two
+# and retried; smaller ones are checked row by row
+_BISECT_ROWS = 256
+
+class _CodeWriter:
+    def __init__(self):
+        self.lines = []
+        self.constants = {}
+
+    def emit(self, indent, line):
+        self.lines.append('    ' * indent + line)
+
+    def constant(self, value):
+        name = f"_C{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+def _emit_value_checks(code, field_def, value, path, indent):
+    """Emit the type check of one non-None value, recursing into RECORDs"""
+    check = _TYPE_CHECKS[field_def['field_type']].replace('value', value)
+    code.emit(indent, f"if not ({check}):")
+    code.emit(indent + 1, f"errors.append({path!r} + ': expected {field_def['field_type']}, got ' + {value}.__class__.__name__)")
+    if field_def['field_type'] == 'RECORD':
+        code.emit(indent, "else:")
+        _emit_record_checks(code, field_def['fields'], value, path + '.', indent + 1)
+
+def _emit_record_checks(code, fields, record, prefix, indent):
+    """Emit the checks of every field of one decoded record (a dict named `record`)"""
+    known = code.constant(frozenset(field_def['name'] for field_def in fields))
+    code.emit(indent, f"if not {known}.issuperset({record}):")
+    code.emit(indent + 1, f"errors.append({prefix!r} + 'unknown fields ' + ', '.join(sorted(set({record}) - {known})))")
+    for field_def in fields:
+        path = prefix + field_def['name']
+        value = f"v{len(code.lines)}"
+        code.emit(indent, f"{value} = {record}.get({field_def['name']!r})")
+        if field_def['mode'] == 'REPEATED':
+            item = f"i{len(code.lines)}"
+            code.emit(indent, f"if {value} is not None:")
+            code.emit(indent + 1, f"if {value}.__class__ is not list:")
+            code.emit(indent + 2, f"errors.append({path!r} + ': expected a list, got ' + {value}.__class__.__name__)")
+            code.emit(indent + 1, "else:")
+            code.emit(indent + 2, f"for {item} in {value}:")
+            code.emit(indent + 3, f"if {item} is None:")
+            code.emit(indent + 4, f"errors.append({path!r} + ': null element in REPEATED field')")
+            code.emit(indent + 3, "else:")
+            _emit_value_checks(code, field_def, item, path + '[]', indent + 4)
+        else:
+            code.emit(indent, f"if {value} is None:")
+            if field_def['mode'] == 'REQUIRED':
+                code.emit(indent + 1, f"errors.append({path!r} + ': missing REQUIRED value')")
+            else:
+                code.emit(indent + 1, "pass")
+            code.emit(indent, "else:")
+            _emit_value_checks(code, field_def, value, path, indent + 1)
+
+def compile_record_validator(fields):
+    """Compile BigQuery schema fields into validate(record) -> list of error messages
+
+    The checks are generated as straight-line Python once per schema, so a
+    valid record costs one dict lookup and one class check per field. An
+    empty list means BigQuery would accept the record.
+    """
+    code = _CodeWriter()
+    code.emit(0, "def validate(record):")
+    code.emit(1, "errors = []")
+    code.emit(1, "if record.__class__ is not dict:")
+    code.emit(2, "return ['row: expected an object, got ' + record.__class__.__name__]")
+    _emit_record_checks(code, fields, 'record', '', 1)
+    code.emit(1, "return errors")
+    namespace = dict(code.constants, _INTEGER=_INTEGER, _FLOAT=_FLOAT, _TIMESTAMP=_TIMESTAMP)
+    exec(compile('\n'.join(code.lines), f"<validator {len(fields)} fields>", 'exec'), namespace)
+    return namespace['validate']
+
+def strict_arrow_field(field_def):
+    """Arrow field that only parses values valid for the BigQuery field"""
+    if field_def['field_type'] == 'RECORD':
+        arrow_type = pa.struct([strict_arrow_field(child) for child in field_def['fields']])
+    else:
+        arrow_type = _ARROW_TYPES[field_def['field_type']]
+    if field_def['mode'] == 'REPEATED':
+        return pa.field(field_def['name'], pa.list_(pa.field('item', arrow_type, nullable=False)))
+    return pa.field(field_def['name'], arrow_type, nullable=field_def['mode'] != 'REQUIRED')
+
+def _null_rows(array, parent_rows):
+    """Table rows (through parent_rows, None for identity) where array is null"""
+    nulls = np.flatnonzero(array.is_null().to_numpy(zero_copy_only=False))
+    return nulls if parent_rows is None else parent_rows[nulls]
+
+def _arrow_violations(array, field_def, path, rows, violations):
+    """Record REQUIRED and REPEATED violations of one (flattened) Arrow column"""
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    if field_def['mode'] == 'REPEATED':
+        elements = array.flatten()
+        parents = pc.list_parent_indices(array).to_numpy(zero_copy_only=False)
+        element_rows = parents if rows is None else rows[parents]
+        for row in _null_rows(elements, element_rows):
+            violations.setdefault(int(row), []).append(f"{path}: null element in REPEATED field")
+        if field_def['field_type'] == 'RECORD':
+            for child_def, child in zip(field_def['fields'], elements.flatten()):
+                _arrow_violations(child, child_def, f"{path}[].{child_def['name']}", element_rows, violations)
+        return
+
+    if field_def['mode'] == 'REQUIRED':
+        for row in _null_rows(array, rows):
+            violations.setdefault(int(row), []).append(f"{path}: missing REQUIRED value")
+    if field_def['field_type'] == 'RECORD':
+        # flatten() nulls the children of null structs, so only look where the struct is set
+        present = np.flatnonzero(array.is_valid().to_numpy(zero_copy_only=False))
+        present_rows = present if rows is None else rows[present]
+        for child_def, child in zip(field_def['fields'], array.flatten()):
+            _arrow_violations(child.take(present), child_def, f"{path}.{child_def['name']}", present_rows, violations)
+
+def _decoded_row(line):
+    """(row, None) for an NDJSON line holding a JSON object, else (None, the line's text)"""
+    text = line.decode('utf-8', 'replace').rstrip('\n')
+    try:
+        row = json.loads(text)
+    except ValueError:
+        row = None
+    return (row, None) if isinstance(row, dict) else (None, text)
+
+class SchemaValidator:
+    """Compiled validators for one table, plus its quarantine file
+
+    check_ndjson(), check_parquet() and check_arrow() return their input with
+    the invalid rows removed (the very same object when every row is valid)
+    and append the removed rows to quarantine_path, if given, as
+    {"table", "source", "errors", "row"} lines, "row" being the decoded row.
+    An NDJSON line that isn't a JSON object has a null "row" and its text in
+    "raw_line". `quarantined` counts them.
+    """
+
+    def __init__(self, table_name, fields, quarantine_path=None):
+        self.table_name = table_name
+        self.fields = fields
+        self.quarantine_path = quarantine_path
+        self.quarantined = 0
+        self.validate_record = compile_record_validator(fields)
+        self.strict_schema = pa.schema([strict_arrow_field(field_def) for field_def in fields])
+        self.parse_options = pj.ParseOptions(explicit_schema=self.strict_schema, unexpected_field_behavior='error')
+
+    def reset_quarantine(self):
+        """Drop quarantined rows from earlier loads, e.g. when the table is reloaded from scratch"""
+        if self.quarantine_path and os.path.exists(self.quarantine_path):
+            os.remove(self.quarantine_path)
+
+    def quarantine(self, rows, source):
+        """Append (row, errors, raw line or None) triples to the quarantine file"""
+        self.quarantined += len(rows)
+        if not self.quarantine_path or not rows:
+            return
+        os.makedirs(os.path.dirname(self.quarantine_path), exist_ok=True)
+        with open(self.quarantine_path, 'a') as f:
+            for row, errors, raw_line in rows:
+                entry = {'table': self.table_name, 'source': source, 'errors': errors, 'row': row}
+                if raw_line is not None:
+                    entry['raw_line'] = raw_line
+                f.write(json.dumps(entry, default=str) + '\n')
+
+    def arrow_errors(self, table):
+        """{row index: errors} for an Arrow table, vectorized over its columns
+
+        Types are already fixed by the table's schema, so only REQUIRED values
+        and REPEATED elements are checked.
+        """
+        violations = {}
+        for field_def in self.fields:
+            if field_def['name'] in table.column_names:
+                _arrow_violations(table.column(field_def['name']), field_def, field_def['name'], None, violations)
+            elif field_def['mode'] == 'REQUIRED':
+                for row in range(table.num_rows):
+                    violations.setdefault(row, []).append(f"{field_def['name']}: missing REQUIRED value")
+        return violations
+
+    def check_arrow(self, table, source=None):
+        violations = self.arrow_errors(table)
+        if not violations:
+            return table
+        bad = sorted(violations)
+        self.quarantine([(row, violations[index], None) for index, row in zip(bad, table.take(bad).to_pylist())],
+                        source)
+        keep = np.ones(table.num_rows, dtype=bool)
+        keep[bad] = False
+        return table.filter(pa.array(keep))
+
+    def check_parquet(self, chunk, source=None):
+        """Validate a standalone Parquet chunk; returns (payload, valid rows)"""
+        table = pq.read_table(pa.BufferReader(chunk))
+        valid = self.check_arrow(table, source)
+        return (chunk if valid is table else parquet_bytes(valid)), valid.num_rows
+
+    def _parsed_rows(self, data):
+        """Rows in NDJSON bytes if they all parse with the strict schema, else None"""
+        try:
+            return pj.read_json(io.BytesIO(data), parse_options=self.parse_options,
+                                read_options=pj.ReadOptions(use_threads=False, block_size=1 << 30)).num_rows
+        except pa.ArrowInvalid:
+            return None
+
+    def _row_errors(self, line):
+        try:
+            return self.validate_record(json.loads(line))
+        except ValueError as e:
+            return [f"row: invalid JSON ({e})"]
+
+    def _find_bad_lines(self, lines, start, bad):
+        """Add (index, errors) of the invalid lines in lines[start:] to bad, bisecting on Arrow parses"""
+        if len(lines) > _BISECT_ROWS:
+            if self._parsed_rows(b''.join(lines)) is not None:
+                return
+            middle = len(lines) // 2
+            self._find_bad_lines(lines[:middle], start, bad)
+            self._find_bad_lines(lines[middle:], start + middle, bad)
+            return
+        # Arrow is stricter than BigQuery for a few encodings (quoted numbers,
+        # epoch timestamps), so small pieces get the record validator's verdict
+        for offset, line in enumerate(lines):
+            errors = self._row_errors(line)
+            if errors:
+                bad.append((start + offset, errors))
+
+    def check_ndjson(self, chunk, source=None):
+        """Validate an NDJSON chunk (gzip or not); returns (payload, valid rows)
+
+        A fully valid chunk is returned as it is, still compressed; otherwise
+        the valid lines are returned, gzipped again if the chunk was.
+        """
+        compressed = chunk[:2] == b'\x1f\x8b'
+        data = gzip.decompress(chunk) if compressed else chunk
+        rows = self._parsed_rows(data)
+        if rows is not None:
+            return chunk, rows
+        lines = [line if line.endswith(b'\n') else line + b'\n'
+                 for line in data.splitlines(keepends=True) if line.strip()]
+        bad = []
+        self._find_bad_lines(lines, 0, bad)
+        if not bad:
+            return chunk, len(lines)
+        quarantined = []
+        for index, errors in bad:
+            row, raw_line = _decoded_row(lines[index])
+            quarantined.append((row, errors, raw_line))
+        self.quarantine(quarantined, source)
+        for index, _ in reversed(bad):
+            del lines[index]
+        return compress_ndjson(b''.join(lines), 'gzip' if compressed else None), len(lines)
+
+    def check_chunk(self, chunk, parquet=False, source=None):
+        """check_parquet() or check_ndjson(), by chunk format"""
+        return self.check_parquet(chunk, source) if parquet else self.check_ndjson(chunk, source)
@@ -1,6 +1,26 @@
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+from google.api_core.exceptions import NotFound
 from google.cloud import bigquery
+import argparse
+import hashlib
+import io
 import json
 import os
+import re
+import tempfile
+import time
+import uuid
+from lake import is_lake, partition_spools, read_manifest, select_files
+from load_manifest import LoadManifest, source_fingerprint
+from schema_migrations import plan_migration
+from stream_io import (NDJSONStream, compression_of, find_data_file, gzip_member_chunks, is_ndjson,
+                       json_array_to_ndjson_chunks, ndjson_file_chunks, ndjson_records, open_ndjson)
+
+TABLE_NAMES = ['contents', 'users', 'viewing_events']
+
+# How partitioned tables are loaded; unpartitioned tables are always truncated and reloaded
+LOAD_MODES = ['truncate', 'append', 'partition-overwrite']
 
 def create_schema_field(field_def):
     """Create a SchemaField, handling nested fields for RECORD types."""
@@ -17,10 +37,108 @@ def create_schema_field(field_def):
     
     return bigquery.SchemaField(**field_args)
 
-def create_dataset_and_tables():
+def load_schemas(path='schemas/bigquery_schemas.json'):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def apply_table_options(target, options):
+    """Set the partitioning and clustering from a "table_options" entry on a Table or LoadJobConfig"""
+    partitioning = options.get('time_partitioning')
+    if partitioning:
+        target.time_partitioning = bigquery.TimePartitioning(
+            type_=partitioning.get('type', 'DAY'),
+            field=partitioning.get('field')
+        )
+    if options.get('clustering_fields'):
+        target.clustering_fields = options['clustering_fields']
+    return target
+
+def run_table_tasks(worker, table_names, max_workers=None):
+    """Run worker(table_name) for every table on a thread pool
+
+    Returns {table_name: result} where each result has the table's wall-clock
+    seconds, the exception it raised (or None) and whatever dict the worker
+    returned. One table failing doesn't stop the others.
+    """
+    def timed(table_name):
+        start = time.perf_counter()
+        try:
+            detail, error = worker(table_name) or {}, None
+        except Exception as e:
+            detail, error = {}, e
+        return {'table': table_name, 'seconds': time.perf_counter() - start, 'error': error, **detail}
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(table_names)) as executor:
+        return {result['table']: result for result in executor.map(timed, table_names)}
+
+def print_table_results(action, results):
+    """Print one line per table with its timing, or its error details"""
+    for table_name, result in results.items():
+        error = result['error']
+        if error is None:
+            rows = f", {result['rows']} rows" if result.get('rows') is not None else ""
+            if result.get('chunks_skipped'):
+                rows += f" ({result['chunks_skipped']} unchanged chunks skipped)"
+            if result.get('quarantined'):
+                rows += f", {result['quarantined']} invalid rows quarantined"
+            if result.get('partitions'):
+                rows += f" into {result['partitions']} partitions"
+            if result.get('migration'):
+                rows += f": {result['migration']}"
+                if result.get('changes'):
+                    rows += f" ({'; '.join(result['changes'])})"
+            print(f"{action} {table_name} in {result['seconds']:.1f}s{rows}")
+            continue
+        print(f"Error for {table_name} after {result['seconds']:.1f}s: {error}")
+        if hasattr(error, 'errors'):
+            for detail in error.errors:
+                print(f"Error details: {detail}")
+
+def migrate_table(client, table_id, fields, options, recreate=False):
+    """Create table_id with the schema-file fields and options, or migrate it in place
+
+    Returns {'migration': 'create' | 'unchanged' | 'update' | 'recreate',
+    'changes': [...]}; see schema_migrations.py. A recreated table is empty.
+    """
+    # Create schema fields, handling nested structures
+    schema = [create_schema_field(field) for field in fields]
+    table = apply_table_options(bigquery.Table(table_id, schema=schema), options)
+
+    if recreate:
+        action, diff, changes = 'recreate', None, []
+    else:
+        try:
+            existing = client.get_table(table_id)
+        except NotFound:
+            existing = None
+        action, diff, changes = plan_migration(existing, table, fields)
+
+    if action == 'update':
+        updated = []
+        if diff.added or diff.relaxed:
+            existing.schema = [create_schema_field(field) for field in diff.merged]
+            updated.append('schema')
+        if (existing.clustering_fields or None) != (table.clustering_fields or None):
+            existing.clustering_fields = table.clustering_fields
+            updated.append('clustering_fields')
+        client.update_table(existing, updated)
+    elif action != 'unchanged':
+        # Delete existing table if it exists
+        client.delete_table(table_id, not_found_ok=True)
+
+        # Create the table
+        client.create_table(table)
+    return {'migration': action, 'changes': changes}
+
+def create_dataset_and_tables(client=None, max_workers=None, recreate=False):
+    """Create the dataset and migrate every table to the schema file concurrently
+
+    Tables keep their data unless a change is incompatible (see
+    schema_migrations.py); recreate=True drops and recreates every table.
+    """
     # Initialize BigQuery client
-    client = bigquery.Client()
-    
+    client = client or bigquery.Client()
+
     # Create dataset
     dataset_id = f"{client.project}.netflix_analytics"
     dataset = bigquery.Dataset(dataset_id)
@@ -30,111 +148,460 @@ def create_dataset_and_tables():
         print(f"Dataset {dataset_id} created or already exists.")
     except Exception as e:
         print(f"Error creating dataset: {e}")
-        return
+        return None
 
     # Load schema definitions
-    with open('schemas/bigquery_schemas.json', 'r') as f:
-        schemas = json.load(f)
-    
+    schemas = load_schemas()
+    table_options = schemas.get('table_options', {})
+
     # Create tables with schemas
     table_schemas = {
         'contents': schemas['contents_schema'],
         'users': schemas['users_schema'],
         'viewing_events': schemas['viewing_events_schema']
     }
-    
-    for table_name, schema_def in table_schemas.items():
-        table_id = f"{dataset_id}.{table_name}"
-        
-        # Delete existing table if it exists
-        try:
-            client.delete_table(table_id)
-            print(f"Deleted existing table {table_id}")
-        except Exception:
-            pass  # Table doesn't exist
-            
-        # Create schema fields, handling nested structures
-        schema = [create_schema_field(field) for field in schema_def]
-        
-        # Create the table
-        table = bigquery.Table(table_id, schema=schema)
-        try:
-            table = client.create_table(table)
-            print(f"Created table {table_id}")
-        except Exception as e:
-            print(f"Error creating table {table_name}: {e}")
 
-def load_data_to_bigquery():
-    client = bigquery.Client()
+    def migrate(table_name):
+        return migrate_table(client, f"{dataset_id}.{table_name}", table_schemas[table_name],
+                             table_options.get(table_name, {}), recreate)
+
+    results = run_table_tasks(migrate, list(table_schemas), max_workers)
+    print_table_results("Migrated table", results)
+    return results
+
+def open_load_payload(file_path):
+    """Open a data file as an NDJSON byte stream for load_table_from_file
+
+    NDJSON and gzip-compressed NDJSON files are uploaded as they are
+    (BigQuery reads gzip JSON itself). JSON arrays are streamed item by
+    item onto single lines as the upload reads, and zstd NDJSON is
+    decompressed as it is read, so memory stays bounded and nothing is
+    written to a temporary file.
+    """
+    if compression_of(file_path) == 'zstd':
+        f = open_ndjson(file_path)
+        return f, NDJSONStream(ndjson_file_chunks(f))
+    f = open(file_path, 'rb')
+    if is_ndjson(file_path):
+        return f, f
+    return f, NDJSONStream(json_array_to_ndjson_chunks(f))
+
+def is_parquet_source(file_path):
+    """Whether a data file, or a lake directory's parts, are Parquet"""
+    if is_lake(file_path):
+        return read_manifest(file_path)['format'] == 'parquet'
+    return file_path.endswith('.parquet')
+
+def read_part_bytes(path):
+    """A lake part's bytes as uploaded: as they are, except zstd, which BigQuery can't read"""
+    with open_ndjson(path) if compression_of(path) == 'zstd' else open(path, 'rb') as f:
+        return f.read()
+
+def open_ndjson_chunks(file_path, chunk_records):
+    """Open a JSON array or (compressed) NDJSON file as plain NDJSON chunks of chunk_records records"""
+    if is_ndjson(file_path):
+        f = open_ndjson(file_path)
+        return f, ndjson_file_chunks(f, chunk_records)
+    f = open(file_path, 'rb')
+    return f, json_array_to_ndjson_chunks(f, chunk_records)
+
+def open_load_chunks(file_path, chunk_records, start_date=None, end_date=None):
+    """Open a data file as byte chunks of chunk_records records each
+
+    Parquet files give standalone Parquet chunks and gzip NDJSON gives its
+    compressed members, grouped, without recompressing (BigQuery loads gzip
+    JSON directly); everything else gives plain NDJSON. A lake directory
+    gives its part files in the date range as they are, one chunk per part,
+    in date order.
+    """
+    if is_lake(file_path):
+        return contextlib.nullcontext(), map(read_part_bytes, select_files(file_path, start_date, end_date))
+    if start_date or end_date:
+        raise ValueError(f"Date ranges need a lake directory or mode 'partition-overwrite', not {file_path}")
+    if file_path.endswith('.parquet'):
+        from parquet_io import parquet_file_chunks
+        f = open(file_path, 'rb')
+        return f, parquet_file_chunks(f, chunk_records)
+    if compression_of(file_path) == 'gzip':
+        f = open(file_path, 'rb')
+        return f, gzip_member_chunks(f, chunk_records)
+    return open_ndjson_chunks(file_path, chunk_records)
+
+def load_job_config(write_disposition, options=None, parquet=False):
+    """NDJSON or Parquet load job config; partitioned tables repeat their layout so loads keep it"""
+    if parquet:
+        # List inference maps Parquet lists straight onto REPEATED fields
+        parquet_options = bigquery.ParquetOptions()
+        parquet_options.enable_list_inference = True
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.PARQUET,
+            parquet_options=parquet_options,
+            write_disposition=write_disposition
+        )
+    else:
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+            write_disposition=write_disposition
+        )
+    return apply_table_options(job_config, options or {})
+
+class ChunkChanged(Exception):
+    """A chunk that is already in the table no longer matches the data file"""
+
+def chunk_job_finished(client, entry):
+    """Whether the load job of a chunk left pending by an interrupted run actually succeeded"""
+    try:
+        client.get_job(entry['job_id']).result()
+        return True
+    except Exception:
+        return False
+
+def table_matches_manifest(client, table_id, manifest):
+    """Whether the table still holds exactly the rows the manifest says were loaded
+
+    Catches tables that were recreated, truncated or dropped since the last run.
+    """
+    try:
+        return client.get_table(table_id).num_rows == manifest.loaded_records()
+    except Exception:
+        return False
+
+def load_chunks(client, table_id, file_path, manifest, chunk_records, options=None, append=False,
+                start_date=None, end_date=None, validator=None):
+    """Load the chunks of file_path the manifest doesn't have as loaded, in order
+
+    Chunk 0 is loaded with WRITE_TRUNCATE and every later chunk is appended,
+    so the table always holds exactly the loaded prefix of chunks. With
+    append=True every chunk is appended to what the table already has.
+    Raises ChunkChanged if a chunk that is already loaded has a different
+    hash now. With a SchemaValidator each chunk's invalid rows are
+    quarantined and the rest is loaded; hashes are of the chunk as read.
+    """
+    job_prefix = table_id.split('.')[-1]
+    parquet = is_parquet_source(file_path)
+    loaded = skipped = rows = 0
+    f, chunks = open_load_chunks(file_path, chunk_records, start_date, end_date)
+    with f:
+        for index, chunk in enumerate(chunks):
+            digest = hashlib.sha256(chunk).hexdigest()
+            entry = manifest.chunk(index)
+            if entry and entry['status'] == 'loaded':
+                if entry['sha256'] != digest:
+                    raise ChunkChanged(f"chunk {index} changed since it was loaded")
+                skipped += 1
+                continue
+
+            if validator is not None:
+                if index == 0 and not append:
+                    validator.reset_quarantine()
+                quarantined = validator.quarantined
+                chunk, records = validator.check_chunk(chunk, parquet, source=f"{file_path} chunk {index}")
+                quarantined = validator.quarantined - quarantined
+            else:
+                records = parquet_num_rows(chunk) if parquet else ndjson_records(chunk)
+                quarantined = 0
+            entry = manifest.start_chunk(index, digest, records, len(chunk),
+                                         f"{job_prefix}_chunk{index}_{uuid.uuid4().hex}", quarantined)
+            job_config = load_job_config(
+                bigquery.WriteDisposition.WRITE_TRUNCATE if index == 0 and not append
+                else bigquery.WriteDisposition.WRITE_APPEND,
+                options,
+                parquet
+            )
+            load_job = client.load_table_from_file(
+                io.BytesIO(chunk),
+                table_id,
+                job_id=entry['job_id'],
+                job_config=job_config
+            )
+            load_job.result()  # Wait for the job to complete
+            manifest.finish_chunk(entry)
+            loaded += 1
+            rows += load_job.output_rows
+
+    if len(manifest.loaded_chunks()) > loaded + skipped:
+        raise ChunkChanged("the data file has fewer chunks than were loaded")
+    return {'rows': rows, 'chunks_loaded': loaded, 'chunks_skipped': skipped,
+            'quarantined': validator.quarantined if validator is not None else 0}
+
+def parquet_num_rows(data):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(pa.BufferReader(data)).metadata.num_rows
+
+def partition_key_pattern(options):
+    """Regex pulling the partitioning column's date (YYYY-MM-DD) out of an NDJSON line"""
+    partitioning = options.get('time_partitioning') or {}
+    if partitioning.get('type', 'DAY') != 'DAY' or not partitioning.get('field'):
+        raise ValueError("partition-overwrite loads need DAY partitioning on a column")
+    return re.compile(rb'"%s":\s*"(\d{4})-(\d{2})-(\d{2})' % re.escape(partitioning['field'].encode()))
+
+def split_ndjson_by_day(file_path, options, chunk_records, validator=None):
+    """Spool a JSON/NDJSON file's (valid) rows into one temporary NDJSON file per YYYYMMDD"""
+    pattern = partition_key_pattern(options)
+    spools = {}
+    try:
+        f, chunks = open_ndjson_chunks(file_path, chunk_records)
+        with f:
+            for index, chunk in enumerate(chunks):
+                if validator is not None:
+                    chunk, _ = validator.check_ndjson(chunk, source=f"{file_path} chunk {index}")
+                days = {}
+                for line in chunk.splitlines(keepends=True):
+                    match = pattern.search(line)
+                    if match is None:
+                        raise ValueError(f"Row without a {options['time_partitioning']['field']} date: {line[:200]!r}")
+                    days.setdefault(b''.join(match.groups()).decode(), []).append(line)
+                for day, lines in days.items():
+                    if day not in spools:
+                        spools[day] = tempfile.TemporaryFile()
+                    spools[day].write(b''.join(lines))
+    except Exception:
+        for spool in spools.values():
+            spool.close()
+        raise
+    for spool in spools.values():
+        spool.seek(0)
+    return spools
+
+def quarantined_day(row, options):
+    """YYYYMMDD of a quarantined row's partitioning column, or None if it has no readable date"""
+    match = re.match(r'(\d{4})-(\d{2})-(\d{2})', str((row or {}).get(options['time_partitioning']['field'])))
+    return ''.join(match.groups()) if match else None
+
+def replace_quarantined_days(quarantine_path, pending_path, options, days, file_path):
+    """Make the quarantine file hold, for the overwritten days, only the rows rejected from them this time
+
+    Entries of earlier loads are dropped for those days (their partitions
+    were replaced) and, if undated, for the same source file; the pending
+    entries of this load are kept for those days and undated, each tagged
+    with its "day" and "file".
+    """
+    if not os.path.exists(quarantine_path) and not os.path.exists(pending_path):
+        return
+    days = set(days)
+    kept = []
+    if os.path.exists(quarantine_path):
+        with open(quarantine_path, 'r') as f:
+            for line in f:
+                entry = json.loads(line)
+                day = entry.get('day')
+                if day in days or (day is None and entry.get('file') == file_path):
+                    continue
+                kept.append(line)
+    if os.path.exists(pending_path):
+        with open(pending_path, 'r') as f:
+            for line in f:
+                entry = json.loads(line)
+                entry['day'] = quarantined_day(entry['row'], options)
+                if entry['day'] is None or entry['day'] in days:
+                    entry['file'] = file_path
+                    kept.append(json.dumps(entry, default=str) + '\n')
+        os.remove(pending_path)
+    os.makedirs(os.path.dirname(quarantine_path), exist_ok=True)
+    temp_path = f"{quarantine_path}.tmp"
+    with open(temp_path, 'w') as f:
+        f.writelines(kept)
+    os.replace(temp_path, quarantine_path)
+
+def load_partitions(client, table_id, file_path, options, chunk_records, start_date=None, end_date=None,
+                    validator=None, quarantine_path=None):
+    """Replace the table$YYYYMMDD partitions of the days in file_path (within start_date/end_date)
+
+    The validator's rejected rows then replace those days' entries in
+    quarantine_path (see replace_quarantined_days).
+    """
+    if validator is not None:
+        validator.reset_quarantine()
+    parquet = is_parquet_source(file_path)
+    if is_lake(file_path):
+        partition_key_pattern(options)  # Same DAY-partitioning check as for NDJSON
+        spools = partition_spools(file_path, start_date, end_date, validator)
+    elif parquet:
+        from parquet_io import split_parquet_by_day
+        partition_key_pattern(options)  # Same DAY-partitioning check as for NDJSON
+        with open(file_path, 'rb') as f:
+            spools = split_parquet_by_day(f, options['time_partitioning']['field'], chunk_records, validator)
+    else:
+        spools = split_ndjson_by_day(file_path, options, chunk_records, validator)
+    first_day = str(start_date)[:10].replace('-', '') if start_date else '0'
+    last_day = str(end_date)[:10].replace('-', '') if end_date else '9'
+    for day in [day for day in spools if not first_day <= day <= last_day]:
+        spools.pop(day).close()
+
+    try:
+        jobs = []
+        for day, spool in sorted(spools.items()):
+            jobs.append(client.load_table_from_file(
+                spool,
+                f"{table_id}${day}",
+                job_config=load_job_config(bigquery.WriteDisposition.WRITE_TRUNCATE, options, parquet)
+            ))
+        rows = sum(job.result().output_rows for job in jobs)  # Wait for every day's job
+    finally:
+        for spool in spools.values():
+            spool.close()
+    if validator is not None and quarantine_path:
+        replace_quarantined_days(quarantine_path, validator.quarantine_path, options, list(spools), file_path)
+    return {'rows': rows, 'partitions': len(spools),
+            'quarantined': validator.quarantined if validator is not None else 0}
+
+class LoadOptions:
+    """How load_data_to_bigquery loads partitioned tables: a LOAD_MODES mode (see the README) and a date range
+
+    start_date/end_date are 'YYYY-MM-DD', inclusive. validate quarantines
+    invalid rows instead of uploading them (see schema_validation.py).
+    """
+
+    def __init__(self, mode='truncate', start_date=None, end_date=None, validate=True):
+        if mode not in LOAD_MODES:
+            raise ValueError(f"mode must be one of {LOAD_MODES}")
+        self.mode = mode
+        self.start_date = start_date
+        self.end_date = end_date
+        self.validate = validate
+
+    def for_table(self, options):
+        """(mode, (start_date, end_date)) for a table; unpartitioned tables are always replaced whole"""
+        if options.get('time_partitioning'):
+            return self.mode, (self.start_date, self.end_date)
+        return 'truncate', (None, None)
+
+def load_data_to_bigquery(client=None, data_dir='data/raw', max_workers=None, chunk_records=100000,
+                          manifest_dir=None, tables=None, sources=None, load_options=None):
+    """Upload every table's data file in chunks, resuming from the load manifest (see load_manifest.py)
+
+    sources maps a table name to a file or lake directory to load instead.
+    """
+    load_options = load_options or LoadOptions()
+    client = client or bigquery.Client()
     dataset_id = f"{client.project}.netflix_analytics"
-    
-    # Load data from JSON files
-    data_files = {
-        'contents': 'data/raw/contents.json',
-        'users': 'data/raw/users.json',
-        'viewing_events': 'data/raw/viewing_events.json'
-    }
-    
-    for table_name, file_path in data_files.items():
+    manifest_dir = manifest_dir or os.path.join(data_dir, 'load_manifest')
+    schemas = load_schemas()
+    table_options = schemas.get('table_options', {})
+    sources = sources or {}
+    quarantine_dir = os.path.join(data_dir, 'quarantine')
+    if load_options.validate:
+        from schema_validation import SchemaValidator
+
+    def make_validator(table_name, quarantine_name):
+        if not load_options.validate:
+            return None
+        return SchemaValidator(table_name, schemas[f'{table_name}_schema'],
+                               os.path.join(quarantine_dir, f'{quarantine_name}.ndjson'))
+
+    def load_table(table_name):
+        file_path = sources.get(table_name) or find_data_file(table_name, data_dir)
         if not os.path.exists(file_path):
-            print(f"Data file {file_path} not found.")
-            continue
-            
+            raise FileNotFoundError(f"Data file {file_path} not found.")
+
         table_id = f"{dataset_id}.{table_name}"
-        
+        options = table_options.get(table_name, {})
+        table_mode, dates = load_options.for_table(options)
+        if table_mode == 'partition-overwrite':
+            return load_partitions(client, table_id, file_path, options, chunk_records, *dates,
+                                   make_validator(table_name, f'{table_name}.pending'),
+                                   os.path.join(quarantine_dir, f'{table_name}.ndjson'))
+
+        append = table_mode == 'append'
+        manifest_name = table_name
+        if append:
+            manifest_name = f"{table_name}.append.{os.path.basename(os.path.normpath(file_path))}"
+            if any(dates):
+                manifest_name += f".{dates[0] or ''}_{dates[1] or ''}"
+        manifest = LoadManifest.load(manifest_dir, manifest_name)
+        validator = make_validator(table_name, manifest_name)
+        source = dict(source_fingerprint(file_path), start_date=dates[0], end_date=dates[1])
+        for entry in manifest.chunks:
+            if entry['status'] == 'pending' and chunk_job_finished(client, entry):
+                manifest.finish_chunk(entry)
+        if manifest.chunk_records != chunk_records or (
+                not append and manifest.loaded_chunks()
+                and not table_matches_manifest(client, table_id, manifest)):
+            if append and manifest.loaded_chunks():
+                raise ValueError(f"{file_path} was appended with --chunk-records {manifest.chunk_records}; "
+                                 f"rerun with that value")
+            manifest.reset()
+        elif manifest.complete and manifest.source == source:
+            # Same file, fully loaded: nothing to read or hash
+            return {'rows': 0, 'chunks_loaded': 0, 'chunks_skipped': len(manifest.chunks)}
+        manifest.chunk_records = chunk_records
+
         try:
-            # Read the JSON data
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-            
-            # Convert to newline-delimited JSON
-            newline_json_path = f"{file_path}.ndjson"
-            with open(newline_json_path, 'w') as f:
-                for item in data:
-                    # Convert arrays to strings for REPEATED fields
-                    if table_name == 'contents' and 'tags' in item:
-                        item['tags'] = list(item['tags'])
-                    if table_name == 'users':
-                        if 'preferred_genres' in item:
-                            item['preferred_genres'] = list(item['preferred_genres'])
-                        if 'preferred_languages' in item:
-                            item['preferred_languages'] = list(item['preferred_languages'])
-                    
-                    f.write(json.dumps(item) + '\n')
-            
-            # Configure job
-            job_config = bigquery.LoadJobConfig(
-                source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
-                write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE
-            )
-            
-            # Load data
-            with open(newline_json_path, 'rb') as f:
-                load_job = client.load_table_from_file(
-                    f,
-                    table_id,
-                    job_config=job_config
-                )
-                result = load_job.result()  # Wait for the job to complete
-            
-            # Clean up temporary file
-            os.remove(newline_json_path)
-            
-            print(f"Loaded {table_name} data to BigQuery successfully.")
-            
-            # Get the row count
-            table = client.get_table(table_id)
-            print(f"Loaded {table.num_rows} rows into {table_id}")
-            
-        except Exception as e:
-            print(f"Error loading data to {table_name}: {e}")
-            if hasattr(e, 'errors'):
-                for error in e.errors:
-                    print(f"Error details: {error}")
+            result = load_chunks(client, table_id, file_path, manifest, chunk_records, options, append, *dates,
+                                 validator)
+        except ChunkChanged as e:
+            if append:
+                # Appended rows can't be taken back out; replacing the file's days does that
+                raise ValueError(f"{file_path}: {e}; load it with mode 'partition-overwrite' instead") from e
+            print(f"{table_name}: {e}; reloading the table from the first chunk")
+            manifest.reset()
+            manifest.chunk_records = chunk_records
+            result = load_chunks(client, table_id, file_path, manifest, chunk_records, options, False, *dates,
+                                 validator)
+
+        manifest.source = source
+        manifest.complete = True
+        manifest.save()
+        return result
+
+    results = run_table_tasks(load_table, tables or TABLE_NAMES, max_workers)
+    print_table_results("Loaded", results)
+    return results
 
 if __name__ == "__main__":
-    print("Setting up BigQuery dataset and tables...")
-    create_dataset_and_tables()
-    
-    print("\nLoading data to BigQuery...")
-    load_data_to_bigquery()
+    parser = argparse.ArgumentParser(description="Create the BigQuery tables and load the generated data")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip the table migration step and only load missing or changed chunks")
+    parser.add_argument('--recreate', action='store_true',
+                        help="Drop and recreate every table instead of migrating it in place")
+    parser.add_argument('--data-dir', default='data/raw')
+    parser.add_argument('--chunk-records', type=int, default=100000, help="Records per load job")
+    parser.add_argument('--mode', choices=LOAD_MODES, default='truncate',
+                        help="How partitioned tables (viewing_events) are loaded")
+    parser.add_argument('--tables', help="Comma-separated tables to load (default: all)")
+    parser.add_argument('--events-file', help="viewing_events file or lake directory to load, e.g. one incremental window")
+    parser.add_argument('--start-date', help="First day (YYYY-MM-DD) of viewing_events to load")
+    parser.add_argument('--end-date', help="Last day (YYYY-MM-DD) of viewing_events to load")
+    parser.add_argument('--no-validate', action='store_true',
+                        help="Upload rows without checking them against the schema first")
+    parser.add_argument('--wide', action='store_true',
+                        help="Refresh the denormalized viewing_events_wide table after loading")
+    parser.add_argument('--summaries', action='store_true',
+                        help="Refresh the daily summary tables behind the dashboard views after loading")
+    args = parser.parse_args()
+
+    # Imported here since query_backend builds on this module
+    from query_backend import get_client, is_local, load_local
+
+    client = get_client()
+
+    if is_local(client):
+        # The local database is rebuilt from data_dir; the load options above are BigQuery's
+        print("Loading data into the local database...")
+        load_local(client, data_dir=args.data_dir, chunk_records=args.chunk_records,
+                   start_date=args.start_date, end_date=args.end_date)
+    else:
+        if not args.resume:
+            print("Setting up BigQuery dataset and tables...")
+            create_dataset_and_tables(client, recreate=args.recreate)
+
+        print("\nLoading data to BigQuery...")
+        load_data_to_bigquery(client, data_dir=args.data_dir, chunk_records=args.chunk_records,
+                              tables=args.tables.split(',') if args.tables else None,
+                              sources={'viewing_events': args.events_file} if args.events_file else None,
+                              load_options=LoadOptions(args.mode, args.start_date, args.end_date,
+                                                       validate=not args.no_validate))
+
+    if args.wide:
+        # Imported here since wide_events builds on this module
+        from wide_events import refresh_wide_events
+
+        print("\nRefreshing viewing_events_wide...")
+        refresh_wide_events(client)
+
+    if args.summaries:
+        from summary_tables import refresh_summaries
+
+        print("\nRefreshing summary tables...")
+        refresh_summaries(client)
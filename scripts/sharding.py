@@ -0,0 +1,48 @@
+"""Helpers for splitting data generation across a process pool.
+
+Every shard gets its own seed derived from the run seed, so the same seed and
+shard count always reproduce the same output regardless of scheduling.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+def shard_seeds(seed, num_shards):
+    """Derive one independent, reproducible SeedSequence per shard"""
+    return np.random.SeedSequence(seed).spawn(num_shards)
+
+def python_seed(seed_sequence):
+    """Turn a SeedSequence into an integer seed for random.Random"""
+    return int(seed_sequence.generate_state(2, dtype=np.uint64)[0])
+
+def split_evenly(total, num_shards):
+    """Split total items into num_shards contiguous (start, count) ranges"""
+    base, remainder = divmod(total, num_shards)
+    ranges = []
+    start = 0
+    for i in range(num_shards):
+        count = base + (1 if i < remainder else 0)
+        ranges.append((start, count))
+        start += count
+    return ranges
+
+def split_proportionally(total, weights):
+    """Split total items across shards in proportion to integer weights"""
+    weight_total = sum(weights)
+    counts = []
+    assigned = 0
+    cumulative = 0
+    for weight in weights:
+        cumulative += weight
+        boundary = total * cumulative // weight_total if weight_total else 0
+        counts.append(boundary - assigned)
+        assigned = boundary
+    return counts
+
+def run_shards(worker, tasks, processes=None):
+    """Run worker over tasks in a process pool, returning results in task order"""
+    if len(tasks) == 1:
+        return [worker(tasks[0])]
+    processes = processes or min(len(tasks), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(worker, tasks))
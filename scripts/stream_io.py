@@ -0,0 +1,355 @@
+"""Streaming I/O helpers for large generated datasets.
+
+Records are written as compact newline-delimited JSON (NDJSON) one batch at a
+time, so memory stays bounded by the batch size instead of the dataset size.
+Pretty-printed JSON arrays can be read back item by item the same way.
+NDJSON can be gzip- or zstd-compressed (.ndjson.gz, .ndjson.zst). gzip files
+are written one member per batch, so they can be split into load chunks
+without decompressing and recompressing them.
+"""
+import codecs
+import gzip
+import io
+import json
+import os
+import re
+import time
+import zlib
+
+_encoder = json.JSONEncoder(separators=(',', ':'))
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# NDJSON compression name -> file name suffix
+COMPRESSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+
+# gzip level for written NDJSON; level 1 compresses generated events several
+# times over while keeping up with the event engine
+GZIP_LEVEL = 1
+ZSTD_LEVEL = 3
+
+class ProgressReporter:
+    """Print periodic progress and throughput for a long-running stream"""
+
+    def __init__(self, label, total=None, interval=2.0, quiet=False):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.quiet = quiet
+        self.count = 0
+        self.bytes_written = 0
+        self.start_time = time.perf_counter()
+        self._last_report = self.start_time
+
+    def update(self, count, bytes_written=0):
+        self.count += count
+        self.bytes_written += bytes_written
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self._report(now, "progress")
+
+    def _report(self, now, status):
+        if self.quiet:
+            return
+        elapsed = max(now - self.start_time, 1e-9)
+        progress = f"{self.count:,}"
+        if self.total:
+            progress += f"/{self.total:,} ({self.count / self.total:.1%})"
+        print(f"[{self.label}] {status}: {progress} records, {self.count / elapsed:,.0f} records/sec, "
+              f"{self.bytes_written / 1e6:,.1f} MB in {elapsed:.1f}s")
+
+    def finish(self):
+        """Print the final summary and return the stream statistics"""
+        now = time.perf_counter()
+        self._report(now, "done")
+        elapsed = now - self.start_time
+        return {
+            'records': self.count,
+            'bytes': self.bytes_written,
+            'seconds': elapsed,
+            'records_per_sec': self.count / elapsed if elapsed else 0.0
+        }
+
+def encode_ndjson(records):
+    """Encode a batch of records as compact NDJSON bytes"""
+    return ''.join([_encoder.encode(record) + '\n' for record in records]).encode('utf-8')
+
+def ndjson_path(path, compression=None):
+    """path with the suffix for compression ('gzip', 'zstd' or None) added"""
+    return path + COMPRESSIONS[compression] if compression else path
+
+def compression_of(path):
+    """The compression of an NDJSON file, from its name"""
+    for compression, suffix in COMPRESSIONS.items():
+        if path.endswith(suffix):
+            return compression
+    return None
+
+def is_ndjson(path):
+    return path.endswith('.ndjson') or any(path.endswith('.ndjson' + suffix) for suffix in COMPRESSIONS.values())
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstd-compressed NDJSON needs the zstandard package (pip install zstandard)")
+    return zstandard
+
+def compress_ndjson(chunk, compression):
+    """Compress NDJSON bytes as one standalone gzip member or zstd frame"""
+    if compression == 'gzip':
+        return gzip.compress(chunk, compresslevel=GZIP_LEVEL, mtime=0)
+    if compression == 'zstd':
+        return _zstd().ZstdCompressor(level=ZSTD_LEVEL).compress(chunk)
+    return chunk
+
+def open_ndjson(path):
+    """Open an NDJSON file for reading binary lines, decompressing .gz/.zst transparently"""
+    compression = compression_of(path)
+    if compression == 'gzip':
+        return gzip.open(path, 'rb')
+    if compression == 'zstd':
+        return io.BufferedReader(_zstd().ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True,
+                                                                        read_across_frames=True))
+    return open(path, 'rb')
+
+def write_ndjson(path, batches, total=None, label=None, quiet=False, compression=None):
+    """Stream batches to an NDJSON file and return throughput stats
+
+    Each batch is either a list of records or already-encoded NDJSON bytes.
+    With compression ('gzip' or 'zstd') each batch is written as its own gzip
+    member or zstd frame; bytes in the stats are the compressed bytes.
+    """
+    progress = ProgressReporter(label or path, total=total, quiet=quiet)
+    with open(path, 'wb') as f:
+        for batch in batches:
+            if isinstance(batch, bytes):
+                chunk, count = batch, batch.count(b'\n')
+            else:
+                chunk, count = encode_ndjson(batch), len(batch)
+            chunk = compress_ndjson(chunk, compression)
+            f.write(chunk)
+            progress.update(count, len(chunk))
+    return progress.finish()
+
+def _strip_line_breaks(text):
+    """Drop line breaks and the indentation after them
+
+    Valid JSON never has a raw line break inside a string, so they and the
+    whitespace that follows are formatting only.
+    """
+    return ''.join(map(str.lstrip, text.replace('\r', '').split('\n')))
+
+def iter_json_array(f, chunk_size=1 << 20, raw=False):
+    """Yield the items of a top-level JSON array from a file, one at a time
+
+    The file is read in chunk_size pieces and each item is decoded with
+    JSONDecoder.raw_decode, so memory is bounded by the chunk size plus one
+    item rather than the whole array. Works with text or binary (UTF-8) files.
+    Line breaks and the indentation after them are dropped as each piece is
+    read (valid JSON only has them between tokens), so with raw=True each
+    item's source text is yielded on a single line instead of being decoded.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer, pos, eof, started = '', 0, False, False
+
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+        if pos < len(buffer):
+            char = buffer[pos]
+            if not started:
+                if char != '[':
+                    raise ValueError("Expected a JSON array")
+                started, pos = True, pos + 1
+                continue
+            if char == ']':
+                return
+            if char == ',':
+                pos += 1
+                continue
+            try:
+                item, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = None
+            # A number at the buffer edge may be cut short ("1." of "1.5"), so only
+            # accept an item once the delimiter after it has been read
+            if end is not None and (eof or (end < len(buffer) and buffer[end] in ' \t\n\r,]')):
+                yield buffer[pos:end] if raw else item
+                pos = end
+                continue
+        elif eof:
+            raise ValueError("Unexpected end of JSON array")
+
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        text = chunk if isinstance(chunk, str) else decoder.decode(chunk, final=eof)
+        buffer, pos = buffer[pos:] + text, 0
+        # Hold back trailing whitespace until the next piece, in case a line break's
+        # indentation is split across pieces
+        cut = len(buffer) if eof else len(buffer.rstrip(' \t\r\n'))
+        buffer = _strip_line_breaks(buffer[:cut]) + buffer[cut:]
+
+def iter_ndjson_chunks(records, batch_size=1000):
+    """Encode records to NDJSON bytes, batch_size records per chunk"""
+    records = iter(records)
+    while True:
+        batch = [record for _, record in zip(range(batch_size), records)]
+        if not batch:
+            return
+        yield encode_ndjson(batch)
+
+def json_array_to_ndjson_chunks(f, batch_size=1000):
+    """Convert a (pretty-printed) JSON array file to NDJSON bytes without re-encoding
+
+    Items are validated and delimited by iter_json_array and written as their
+    own single-line source text.
+    """
+    items = iter_json_array(f, raw=True)
+    while True:
+        batch = [item for _, item in zip(range(batch_size), items)]
+        if not batch:
+            return
+        yield ('\n'.join(batch) + '\n').encode('utf-8')
+
+def ndjson_file_chunks(f, batch_size=1000):
+    """Group the lines of a binary NDJSON file into chunks of batch_size records"""
+    while True:
+        batch = [line for _, line in zip(range(batch_size), f)]
+        if not batch:
+            return
+        if not batch[-1].endswith(b'\n'):
+            batch[-1] += b'\n'
+        yield b''.join(batch)
+
+def gzip_member_chunks(f, batch_size=1000, block_size=1 << 20):
+    """Group the members of a gzip NDJSON file into chunks of at least batch_size records
+
+    Each chunk is the original compressed bytes of whole members, itself a
+    valid gzip file, so nothing is recompressed. Members are decompressed
+    only to find where they end and to count their records. A file written
+    as a single member is a single chunk.
+    """
+    chunk, records = bytearray(), 0
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    in_member = False
+    data = b''
+    while True:
+        if not data:
+            data = f.read(block_size)
+            if not data:
+                break
+        in_member = True
+        # Decompress in bounded pieces so a highly compressed block can't blow up memory
+        records += decompressor.decompress(data, block_size).count(b'\n')
+        while decompressor.unconsumed_tail and not decompressor.eof:
+            records += decompressor.decompress(decompressor.unconsumed_tail, block_size).count(b'\n')
+        if decompressor.eof:
+            unused = decompressor.unused_data
+            chunk += data[:len(data) - len(unused)]
+            data = unused
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            in_member = False
+            if records >= batch_size:
+                yield bytes(chunk)
+                chunk, records = bytearray(), 0
+        else:
+            chunk += data
+            data = b''
+    if in_member:
+        raise ValueError("Truncated gzip file")
+    if chunk:
+        yield bytes(chunk)
+
+def ndjson_records(chunk):
+    """Number of records in a chunk of NDJSON bytes, gzip-compressed or not"""
+    if chunk[:2] != b'\x1f\x8b':
+        return chunk.count(b'\n')
+    with gzip.GzipFile(fileobj=io.BytesIO(chunk)) as f:
+        return sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 20), b''))
+
+def find_data_file(table_name, data_dir='data/raw'):
+    """Return the table's data in data_dir: JSON array, (compressed) NDJSON or Parquet file, or lake directory
+
+    A lake directory (data_dir/table_name/ with a _manifest.json, see lake.py)
+    is dated by its manifest. If more than one is there, the most recently
+    written one wins.
+    """
+    extensions = ['json', 'ndjson', *(f'ndjson{suffix}' for suffix in COMPRESSIONS.values()), 'parquet']
+    paths = [os.path.join(data_dir, f'{table_name}.{extension}') for extension in extensions]
+    written = {path: os.path.getmtime(path) for path in paths if os.path.exists(path)}
+    lake_manifest = os.path.join(data_dir, table_name, '_manifest.json')
+    if os.path.exists(lake_manifest):
+        written[os.path.join(data_dir, table_name)] = os.path.getmtime(lake_manifest)
+    if not written:
+        return paths[0]
+    return max(written, key=written.get)
+
+class NDJSONStream:
+    """Read-only binary file object over a stream of NDJSON byte chunks
+
+    Pass it to client.load_table_from_file() to upload data without writing a
+    temporary file; chunks come from iter_ndjson_chunks() or
+    json_array_to_ndjson_chunks() and are only produced as the upload reads.
+    The last block handed out is kept so a resumable upload can seek back and
+    retry it.
+    """
+    mode = 'rb'
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = bytearray()
+        self._previous = b''
+        self._position = 0
+        self._exhausted = False
+        self.records = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def _fill(self, size):
+        while not self._exhausted and (size < 0 or len(self._pending) < size):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._exhausted = True
+                break
+            self._pending += chunk
+            self.records += chunk.count(b'\n')
+
+    def read(self, size=-1):
+        self._fill(size)
+        if size < 0 or size >= len(self._pending):
+            data = bytes(self._pending)
+            self._pending.clear()
+        else:
+            data = bytes(self._pending[:size])
+            del self._pending[:size]
+        self._previous = data
+        self._position += len(data)
+        return data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence not in (os.SEEK_SET, os.SEEK_CUR):
+            raise OSError("NDJSONStream only supports seeking from the start or current position")
+        target = offset if whence == os.SEEK_SET else self._position + offset
+        rewind = self._position - target
+        if not 0 <= rewind <= len(self._previous):
+            raise OSError("NDJSONStream can only seek back within the last block read")
+        if rewind:
+            split = len(self._previous) - rewind
+            self._pending[:0] = self._previous[split:]
+            self._previous = self._previous[:split]
+            self._position = target
+        return self._position
+
+    def close(self):
+        self._chunks = iter(())
+        self._pending.clear()
@@ -0,0 +1,231 @@
+"""Daily summary tables behind the dashboard views, refreshed incrementally with MERGE.
+
+Each dashboard rollup (quality, engagement, ratings, recommendation) is kept
+as a small table of additive per-day aggregates (counts and sums, partitioned
+by day), and the *_view views in create_dashboard_views.py only combine
+those rows, so a dashboard read scans the summaries instead of viewing_events:
+- quality_metrics_daily: per device and connection type;
+- engagement_metrics_daily: per device, connection type and 0.01-wide
+  engagement_score bucket, so the views can rank sessions within a device
+  (to bucket precision) without the events;
+- content_daily_facts: per content (views, watch time, rating and engagement
+  sums and counts), which ratings_analysis_view and content_performance_view
+  are derived from;
+- recommendation_daily: per algorithm and category, plus
+  recommendation_top_daily with each day's ten most engaged sessions per
+  algorithm, from which the overall top ten are picked;
+- metric_sketch_daily: per device and connection type, a quantile sketch
+  (see quantile_sketch.py) of each of SKETCH_METRICS, from which the views'
+  p50/p90/p99 columns are read.
+
+A refresh merges only the days whose viewing_events partitions changed since
+the table's last refresh, or that were dropped from viewing_events (see
+freshness.py): their rows are updated, inserted or deleted. Every refresh is
+recorded in summary_freshness. The local backend has no partition metadata,
+so there every refresh is a full rebuild.
+
+    python scripts/summary_tables.py                 # after each load
+    python scripts/summary_tables.py --full
+"""
+import argparse
+from datetime import datetime, timezone
+from google.cloud import bigquery
+from freshness import (changed_event_days, ensure_freshness_table, read_freshness, save_freshness,
+                       vanished_event_days)
+from quantile_sketch import bucket_sql
+from query_backend import get_client, is_local
+from setup_bigquery import load_schemas, migrate_table, print_table_results, run_table_tasks
+
+# Metrics sketched in metric_sketch_daily -> their viewing_events column
+SKETCH_METRICS = {
+    'startup_time_seconds': 'quality_metrics.startup_time_seconds',
+    'buffering_events': 'quality_metrics.buffering_events',
+    'bandwidth_mbps': 'quality_metrics.bandwidth_mbps',
+    'engagement_score': 'engagement_signals.engagement_score'
+}
+_SKETCH_VALUE = ("CASE metric "
+                 + ' '.join(f"WHEN '{metric}' THEN {column}" for metric, column in SKETCH_METRICS.items())
+                 + " END")
+
+# Summary table -> (merge keys, per-day aggregate query). {events} is the
+# viewing_events table and {day_filter} restricts it to the days refreshed.
+ROLLUPS = {
+    'quality_metrics_daily': (['day', 'device_type', 'connection_type'], """
+        SELECT
+            DATE(timestamp) AS day,
+            device_type,
+            quality_metrics.connection_type AS connection_type,
+            COUNT(*) AS session_count,
+            SUM(quality_metrics.buffering_events) AS buffering_events_sum,
+            SUM(quality_metrics.bandwidth_mbps) AS bandwidth_mbps_sum,
+            SUM(quality_metrics.startup_time_seconds) AS startup_time_seconds_sum,
+            SUM(quality_metrics.frames_dropped_ratio) AS frames_dropped_ratio_sum,
+            SUM(quality_metrics.audio_quality_score) AS audio_quality_score_sum
+        FROM `{events}`
+        WHERE {day_filter}
+        GROUP BY day, device_type, connection_type
+    """),
+    'engagement_metrics_daily': (['day', 'device_type', 'connection_type', 'engagement_bucket'], """
+        SELECT
+            DATE(timestamp) AS day,
+            device_type,
+            quality_metrics.connection_type AS connection_type,
+            CAST(FLOOR(engagement_signals.engagement_score * 100) AS INT64) AS engagement_bucket,
+            COUNT(*) AS session_count,
+            SUM(engagement_signals.engagement_score) AS engagement_score_sum,
+            SUM(engagement_signals.completion_rate) AS completion_rate_sum,
+            SUM(watch_duration_seconds) AS watch_duration_seconds_sum
+        FROM `{events}`
+        WHERE {day_filter}
+        GROUP BY day, device_type, connection_type, engagement_bucket
+    """),
+    'content_daily_facts': (['day', 'content_id'], """
+        SELECT
+            DATE(timestamp) AS day,
+            content_id,
+            COUNT(*) AS view_count,
+            SUM(watch_duration_seconds) AS watch_duration_seconds_sum,
+            COALESCE(SUM(engagement_signals.rating_given), 0) AS rating_given_sum,
+            COUNT(engagement_signals.rating_given) AS rating_given_count,
+            SUM(engagement_signals.engagement_score) AS engagement_score_sum,
+            COUNT(engagement_signals.engagement_score) AS engagement_score_count
+        FROM `{events}`
+        WHERE {day_filter}
+        GROUP BY day, content_id
+    """),
+    'recommendation_daily': (['day', 'algorithm_type', 'recommendation_category'], """
+        SELECT
+            DATE(timestamp) AS day,
+            recommendation_data.algorithm_type AS algorithm_type,
+            recommendation_data.recommendation_category AS recommendation_category,
+            COUNT(*) AS recommendation_count,
+            SUM(recommendation_data.recommendation_score) AS recommendation_score_sum,
+            SUM(engagement_signals.engagement_score) AS engagement_score_sum,
+            COALESCE(SUM(engagement_signals.rating_given), 0) AS rating_given_sum
+        FROM `{events}`
+        WHERE {day_filter}
+        GROUP BY day, algorithm_type, recommendation_category
+    """),
+    'recommendation_top_daily': (['day', 'algorithm_type', 'day_rank'], """
+        SELECT
+            DATE(timestamp) AS day,
+            recommendation_data.algorithm_type AS algorithm_type,
+            ROW_NUMBER() OVER (PARTITION BY DATE(timestamp), recommendation_data.algorithm_type
+                               ORDER BY engagement_signals.engagement_score DESC) AS day_rank,
+            recommendation_data.recommendation_category AS recommendation_category,
+            engagement_signals.engagement_score AS engagement_score
+        FROM `{events}`
+        WHERE {day_filter}
+        QUALIFY day_rank <= 10
+    """),
+    'metric_sketch_daily': (['day', 'device_type', 'connection_type', 'metric', 'bucket'], f"""
+        SELECT
+            DATE(timestamp) AS day,
+            device_type,
+            quality_metrics.connection_type AS connection_type,
+            metric,
+            {bucket_sql(_SKETCH_VALUE)} AS bucket,
+            COUNT(*) AS value_count
+        FROM `{{events}}`
+        CROSS JOIN ({' UNION ALL '.join(f"SELECT '{metric}' AS metric" for metric in SKETCH_METRICS)})
+        WHERE {{day_filter}}
+        GROUP BY day, device_type, connection_type, metric, bucket
+    """)
+}
+
+def merge_sql(dataset_id, table_name, schemas, days=None):
+    """MERGE that recomputes a summary table's rows (for the given days only, if any)"""
+    keys, source = ROLLUPS[table_name]
+    columns = [field_def['name'] for field_def in schemas[f'{table_name}_schema']]
+    values = [column for column in columns if column not in keys]
+    # QUALIFY needs a WHERE clause in BigQuery, so a full refresh filters on TRUE
+    day_filter = "DATE(timestamp) IN UNNEST(@days)" if days is not None else "TRUE"
+    target_filter = " AND t.day IN UNNEST(@days)" if days is not None else ''
+    return f"""
+    MERGE INTO `{dataset_id}.{table_name}` t
+    USING (
+        {source.format(events=f"{dataset_id}.viewing_events", day_filter=day_filter).strip()}
+    ) s
+    ON {' AND '.join(f"t.{key} = s.{key}" for key in keys)}
+    WHEN MATCHED THEN
+        UPDATE SET {', '.join(f"{column} = s.{column}" for column in values)}
+    WHEN NOT MATCHED BY TARGET THEN
+        INSERT ({', '.join(columns)}) VALUES ({', '.join(f"s.{column}" for column in columns)})
+    WHEN NOT MATCHED BY SOURCE{target_filter} THEN
+        DELETE
+    """
+
+def ensure_summary_tables(client, dataset_id, schemas):
+    """Create or migrate the summary and freshness tables; returns the summaries that start out empty"""
+    options = schemas.get('table_options', {})
+    ensure_freshness_table(client, dataset_id, schemas)
+    if is_local(client):
+        # Every local refresh is a full rebuild, so the tables are simply recreated
+        for table_name in ROLLUPS:
+            client.create_table(table_name, schemas[f'{table_name}_schema'])
+        return set(ROLLUPS)
+
+    empty = set()
+    for table_name in ROLLUPS:
+        result = migrate_table(client, f"{dataset_id}.{table_name}", schemas[f'{table_name}_schema'],
+                               options.get(table_name, {}))
+        if result['migration'] in ('create', 'recreate'):
+            empty.add(table_name)
+    return empty
+
+def refresh_summaries(client=None, full=False, max_workers=None):
+    """Bring the summary tables up to date with viewing_events
+
+    Returns {table_name: result} as run_table_tasks does, each with 'mode'
+    ('full', 'incremental' or 'unchanged'), 'days' and 'rows' (DML rows
+    affected).
+    """
+    client = client or get_client()
+    dataset_id = f"{client.project}.netflix_analytics"
+    schemas = load_schemas()
+
+    # Recorded as every table's refreshed_at, so a load that lands while the
+    # MERGEs run is seen as a change by the next refresh
+    started = datetime.now(timezone.utc)
+    empty = ensure_summary_tables(client, dataset_id, schemas)
+    freshness = read_freshness(client, dataset_id)
+
+    # Tables refreshed together share their last refresh time, so look each one up once
+    changed_days = {}
+    def days_to_refresh(table_name):
+        if full or table_name in empty or table_name not in freshness:
+            return None
+        since = freshness[table_name].refreshed_at
+        if since not in changed_days:
+            changed_days[since] = changed_event_days(client, dataset_id, since)
+        if changed_days[since] is None:
+            return None
+        vanished = vanished_event_days(client, dataset_id, table_name)
+        return sorted(set(changed_days[since]) | set(vanished)) if vanished is not None else None
+    plans = {table_name: days_to_refresh(table_name) for table_name in ROLLUPS}
+
+    def refresh(table_name):
+        days = plans[table_name]
+        if days == []:
+            return {'mode': 'unchanged', 'days': [], 'rows': 0}
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ArrayQueryParameter('days', 'DATE', days)
+        ] if days is not None else [])
+        job = client.query(merge_sql(dataset_id, table_name, schemas, days), job_config=job_config)
+        job.result()
+        return {'mode': 'full' if days is None else 'incremental',
+                'days': [day.isoformat() for day in days or []],
+                'rows': job.num_dml_affected_rows or 0}
+
+    results = run_table_tasks(refresh, list(ROLLUPS), max_workers)
+    print_table_results("Refreshed", results)
+    refreshed = {table_name: result for table_name, result in results.items() if result['error'] is None}
+    if refreshed:
+        save_freshness(client, dataset_id, started, refreshed)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the daily summary tables behind the dashboard views")
+    parser.add_argument('--full', action='store_true', help="Recompute every day, not just the changed ones")
+    args = parser.parse_args()
+    refresh_summaries(full=args.full)
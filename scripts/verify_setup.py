@@ -1,9 +1,9 @@
-from google.cloud import bigquery
+from query_backend import get_client
 from tabulate import tabulate
 import sys
 
 def run_verification_queries():
-    client = bigquery.Client()
+    client = get_client()
     
     verification_queries = {
         "Content Overview": """
@@ -0,0 +1,144 @@
+"""Denormalized viewing_events_wide table, refreshed incrementally after loads.
+
+viewing_events_wide has every viewing_events column plus the content and
+user attributes the analyses and dashboards join for (content_genre,
+user_country, ...), so they can read one table instead of shuffling
+viewing_events against contents and users on every query.
+
+The table is kept in sync with MERGE on event_id. Only the days whose
+viewing_events partitions changed since the last refresh (per
+INFORMATION_SCHEMA.PARTITIONS), or were dropped from it, are merged: new
+events are inserted, changed ones updated and events no longer in those days
+deleted (see freshness.py). If contents or users changed, every day is
+merged so the attributes are current. Each refresh is recorded in
+summary_freshness, like the summary tables'.
+
+    python scripts/setup_bigquery.py --resume --mode partition-overwrite --wide
+    python scripts/wide_events.py --full
+"""
+import argparse
+from datetime import datetime, timezone
+from google.cloud import bigquery
+from freshness import (changed_event_days, ensure_freshness_table, read_freshness, save_freshness,
+                       vanished_event_days)
+from query_backend import build_local_wide, get_client, is_local
+from setup_bigquery import load_schemas, migrate_table
+
+WIDE_TABLE = 'viewing_events_wide'
+
+# Dimension table -> (join key, columns copied onto each event); each column
+# is named <prefix><column> in the wide table
+DIMENSIONS = {
+    'contents': ('content_id', 'content_', ['title', 'genre', 'type', 'language', 'rating']),
+    'users': ('user_id', 'user_', ['country', 'subscription_type', 'age_group'])
+}
+
+def wide_schema_fields(schemas=None):
+    """Schema-file field definitions of the wide table
+
+    The events' own fields come first, in order, then the dimension
+    attributes, which are NULLABLE because events without a matching content
+    or user are kept.
+    """
+    schemas = schemas or load_schemas()
+    fields = list(schemas['viewing_events_schema'])
+    for table_name, (_, prefix, columns) in DIMENSIONS.items():
+        dimension_fields = {field_def['name']: field_def for field_def in schemas[f'{table_name}_schema']}
+        for column in columns:
+            fields.append({'name': prefix + column, 'field_type': dimension_fields[column]['field_type'],
+                           'mode': 'NULLABLE'})
+    return fields
+
+def wide_select_sql(dataset_id, schemas, day_filter=''):
+    """SELECT of the events joined with their dimension attributes, in the wide table's column order
+
+    Only the latest row of each event_id is kept, since a MERGE fails on a
+    target row matched by more than one source row.
+    """
+    event_columns = [f"v.{field_def['name']}" for field_def in schemas['viewing_events_schema']]
+    dimension_columns, joins = [], []
+    for alias, (table_name, (key, prefix, columns)) in zip('cu', DIMENSIONS.items()):
+        dimension_columns += [f"{alias}.{column} AS {prefix}{column}" for column in columns]
+        joins.append(f"LEFT JOIN `{dataset_id}.{table_name}` {alias} ON v.{key} = {alias}.{key}")
+    return (f"SELECT {', '.join(event_columns + dimension_columns)}\n"
+            f"        FROM `{dataset_id}.viewing_events` v\n        " + '\n        '.join(joins)
+            # BigQuery requires a WHERE, GROUP BY or HAVING with QUALIFY
+            + f"\n        WHERE {day_filter or 'TRUE'}"
+            + "\n        QUALIFY ROW_NUMBER() OVER (PARTITION BY v.event_id ORDER BY v.timestamp DESC) = 1")
+
+def merge_sql(dataset_id, schemas, days=None):
+    """MERGE that syncs the wide table with the events (of the given days only, if any)"""
+    source_filter = "DATE(v.timestamp) IN UNNEST(@days)" if days is not None else ''
+    target_filter = " AND DATE(w.timestamp) IN UNNEST(@days)" if days is not None else ''
+    columns = [field_def['name'] for field_def in wide_schema_fields(schemas)]
+    return f"""
+    MERGE INTO `{dataset_id}.{WIDE_TABLE}` w
+    USING (
+        {wide_select_sql(dataset_id, schemas, source_filter)}
+    ) s
+    ON w.event_id = s.event_id{target_filter}
+    WHEN MATCHED THEN
+        UPDATE SET {', '.join(f"{column} = s.{column}" for column in columns)}
+    WHEN NOT MATCHED BY TARGET THEN
+        INSERT ({', '.join(columns)}) VALUES ({', '.join(f"s.{column}" for column in columns)})
+    WHEN NOT MATCHED BY SOURCE{target_filter} THEN
+        DELETE
+    """
+
+def dimensions_changed(client, dataset_id, since):
+    """Whether contents or users were modified after since"""
+    return any(client.get_table(f"{dataset_id}.{table_name}").modified > since for table_name in DIMENSIONS)
+
+def refresh_wide_events(client=None, full=False):
+    """Bring viewing_events_wide up to date with viewing_events, contents and users
+
+    Returns {'mode': 'full' | 'incremental' | 'unchanged', 'days': [...],
+    'rows': DML rows affected}.
+    """
+    client = client or get_client()
+    dataset_id = f"{client.project}.netflix_analytics"
+    schemas = load_schemas()
+
+    # Taken before reading anything, so changes made during the refresh are picked up next time
+    started = datetime.now(timezone.utc)
+    ensure_freshness_table(client, dataset_id, schemas)
+    if is_local(client):
+        # The local backend has no partition metadata (and DuckDB can't run this MERGE), so rebuild it
+        result = {'mode': 'full', 'days': [], 'rows': build_local_wide(client)}
+        save_freshness(client, dataset_id, started, {WIDE_TABLE: result}, day_column='DATE(timestamp)')
+        return result
+    freshness = read_freshness(client, dataset_id)
+    # A wide table that had to be (re)created is empty, so it needs a full refresh
+    action = migrate_table(client, f"{dataset_id}.{WIDE_TABLE}", wide_schema_fields(schemas),
+                           schemas.get('table_options', {}).get(WIDE_TABLE, {}))['migration']
+    since = freshness[WIDE_TABLE].refreshed_at if WIDE_TABLE in freshness else None
+
+    days = None
+    if not full and since is not None and action not in ('create', 'recreate') \
+            and not dimensions_changed(client, dataset_id, since):
+        changed = changed_event_days(client, dataset_id, since)
+        vanished = vanished_event_days(client, dataset_id, WIDE_TABLE) if changed is not None else None
+        days = sorted(set(changed) | set(vanished)) if vanished is not None else None
+
+    if days == []:
+        result = {'mode': 'unchanged', 'days': [], 'rows': 0}
+    else:
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ArrayQueryParameter('days', 'DATE', days)
+        ] if days is not None else [])
+        job = client.query(merge_sql(dataset_id, schemas, days), job_config=job_config)
+        job.result()
+        result = {'mode': 'full' if days is None else 'incremental',
+                  'days': [day.isoformat() for day in days or []],
+                  'rows': job.num_dml_affected_rows or 0}
+
+    save_freshness(client, dataset_id, started, {WIDE_TABLE: result}, day_column='DATE(timestamp)')
+    label = f"{len(result['days'])} changed or dropped days" if result['mode'] == 'incremental' else result['mode']
+    print(f"Refreshed {WIDE_TABLE} ({label}), {result['rows']} rows affected")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the denormalized viewing_events_wide table")
+    parser.add_argument('--full', action='store_true', help="Merge every day, not just the changed ones")
+    args = parser.parse_args()
+    refresh_wide_events(full=args.full)